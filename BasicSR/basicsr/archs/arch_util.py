@@ -202,6 +202,115 @@ def pixel_unshuffle(x, scale):
     return x_view.permute(0, 1, 3, 5, 2, 4).reshape(b, out_channel, h, w)
 
 
+def pad_to_window(x, window_size, mode='reflect'):
+    """Pad the bottom and right of a tensor to multiples of the window size.
+
+    Window-based archs (e.g., SwinIR) require the input size to be divisible by the window size.
+
+    Args:
+        x (Tensor): Input with shape (b, c, h, w).
+        window_size (int): Window size. No padding when it is None or 1.
+        mode (str): Padding mode for F.pad. Default: 'reflect'.
+
+    Returns:
+        tuple[Tensor, int, int]: The padded tensor, the padding at the bottom and at the right.
+    """
+    if not window_size or window_size == 1:
+        return x, 0, 0
+    _, _, h, w = x.size()
+    mod_pad_h = (window_size - h % window_size) % window_size
+    mod_pad_w = (window_size - w % window_size) % window_size
+    if mod_pad_h or mod_pad_w:
+        x = F.pad(x, (0, mod_pad_w, 0, mod_pad_h), mode)
+    return x, mod_pad_h, mod_pad_w
+
+
+def _tile_starts(size, tile_size, stride):
+    """Start positions of tiles along one axis. The last tile is aligned to the border."""
+    if size <= tile_size:
+        return [0]
+    starts = list(range(0, size - tile_size, stride))
+    starts.append(size - tile_size)
+    return starts
+
+
+def _blend_ramp(length, overlap, at_start, at_end, blend, device):
+    """1D blending weights of a tile, ramping up/down over the overlap on the sides that have a neighbor."""
+    weight = torch.ones(length, device=device)
+    overlap = min(overlap, length // 2)
+    if overlap <= 0:
+        return weight
+    # strictly positive, so the normalization never divides by zero
+    ramp = (torch.arange(overlap, device=device, dtype=torch.float32) + 0.5) / overlap
+    if blend == 'feather':
+        ramp = 0.5 - 0.5 * torch.cos(ramp * math.pi)
+    elif blend != 'linear':
+        raise ValueError(f'Unsupported blend mode: {blend}. Supported ones are: linear, feather.')
+    if at_start:
+        weight[:overlap] = ramp
+    if at_end:
+        weight[-overlap:] = ramp.flip(0)
+    return weight
+
+
+def tile_forward(net, x, tile_size, tile_overlap=32, scale=None, window_size=None, blend='feather'):
+    """Run a network on overlapping tiles and blend the outputs.
+
+    The peak memory of the network forward is bounded by the tile size instead of the image size, so
+    arbitrarily large images can be processed. Neighboring tiles overlap by ``tile_overlap`` input pixels
+    and their outputs are weighted by a ramp across the overlap to hide the seams.
+
+    It works with any network returning a tensor of shape (b, c', h * scale, w * scale), e.g., the ones
+    created by ``build_network``.
+
+    Args:
+        net (nn.Module): Network.
+        x (Tensor): Input with shape (b, c, h, w).
+        tile_size (int): Tile size (in input pixels).
+        tile_overlap (int): Overlap between neighboring tiles (in input pixels). Default: 32.
+        scale (int | None): Upsampling factor of the network. If None, it is inferred from the first tile.
+            Default: None.
+        window_size (int | None): Pad every tile to multiples of the window size (e.g., for SwinIR).
+            Default: None.
+        blend (str): Blending of overlapping regions. 'linear': linear ramp; 'feather': raised-cosine ramp.
+            Default: 'feather'.
+
+    Returns:
+        Tensor: Output with shape (b, c', h * scale, w * scale).
+    """
+    b, _, h, w = x.size()
+    if tile_overlap >= tile_size:
+        raise ValueError(f'tile_overlap ({tile_overlap}) should be smaller than tile_size ({tile_size}).')
+    stride = tile_size - tile_overlap
+    ys = _tile_starts(h, tile_size, stride)
+    xs = _tile_starts(w, tile_size, stride)
+
+    output = None
+    weight_sum = None
+    for y in ys:
+        for x_ in xs:
+            tile = x[:, :, y:y + tile_size, x_:x_ + tile_size]
+            tile_h, tile_w = tile.size()[-2:]
+            tile, mod_pad_h, mod_pad_w = pad_to_window(tile, window_size)
+            out_tile = net(tile)
+
+            if output is None:
+                if scale is None:
+                    scale = out_tile.size(-1) // tile.size(-1)
+                output = x.new_zeros(b, out_tile.size(1), h * scale, w * scale)
+                weight_sum = x.new_zeros(1, 1, h * scale, w * scale)
+            out_tile = out_tile[:, :, :tile_h * scale, :tile_w * scale]
+
+            weight_y = _blend_ramp(tile_h * scale, tile_overlap * scale, y > 0, y + tile_h < h, blend, x.device)
+            weight_x = _blend_ramp(tile_w * scale, tile_overlap * scale, x_ > 0, x_ + tile_w < w, blend, x.device)
+            weight = (weight_y[:, None] * weight_x[None, :]).to(output.dtype)
+
+            out_y, out_x = y * scale, x_ * scale
+            output[:, :, out_y:out_y + tile_h * scale, out_x:out_x + tile_w * scale] += out_tile * weight
+            weight_sum[:, :, out_y:out_y + tile_h * scale, out_x:out_x + tile_w * scale] += weight
+    return output / weight_sum
+
+
 class DCNv2Pack(ModulatedDeformConvPack):
     """Modulated deformable conv for deformable alignment.
 
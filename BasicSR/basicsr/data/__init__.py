@@ -91,6 +91,7 @@ def build_dataloader(dataset, dataset_opt, num_gpu=1, dist=False, sampler=None,
     else:
         # prefetch_mode=None: Normal dataloader
         # prefetch_mode='cuda': dataloader for CUDAPrefetcher
+        # prefetch_mode='pinned': dataloader for PinnedPrefetcher
         return torch.utils.data.DataLoader(**dataloader_args)
 
 
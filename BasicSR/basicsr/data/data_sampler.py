@@ -46,3 +46,70 @@ class EnlargedSampler(Sampler):
 
     def set_epoch(self, epoch):
         self.epoch = epoch
+
+
+class ClipLocalitySampler(EnlargedSampler):
+    """Sampler that sends neighboring frames of a video clip to the same DataLoader worker.
+
+    The DataLoader hands batches to its workers in a round-robin way: worker
+    `w` loads batches w, w + num_workers, w + 2 * num_workers, ... This
+    sampler splits every clip into chunks of `chunk_size` consecutive frames,
+    shuffles the chunks, and lays them out so that each sample slot of a
+    worker walks through one chunk over the worker's successive batches.
+    Each batch still mixes samples of batch_size different chunks, while
+    every worker reads neighboring frames one after another, which makes its
+    :class:`basicsr.data.data_util.FrameCache` effective.
+
+    The dataset needs a `keys` attribute with keys like 'clip/frame', in the
+    order of the dataset indices (e.g., REDS datasets).
+
+    Args:
+        dataset (torch.utils.data.Dataset): Dataset used for sampling.
+        num_replicas (int | None): Number of processes participating in
+            the training. It is usually the world_size.
+        rank (int | None): Rank of the current process within num_replicas.
+        ratio (int): Enlarging ratio. Default: 1.
+        num_workers (int): Number of DataLoader workers of this process. Default: 1.
+        batch_size (int): Batch size of this process. Default: 1.
+        chunk_size (int): Number of consecutive frames in a chunk. Default: 8.
+    """
+
+    def __init__(self, dataset, num_replicas, rank, ratio=1, num_workers=1, batch_size=1, chunk_size=8):
+        super(ClipLocalitySampler, self).__init__(dataset, num_replicas, rank, ratio)
+        self.num_streams = max(1, num_workers) * batch_size
+        self.chunk_size = chunk_size
+
+        clips = {}
+        for idx, key in enumerate(dataset.keys):
+            clips.setdefault(key.split('/')[0], []).append(idx)
+        # split each clip into chunks of (nearly) the same size of consecutive indices
+        self.chunks = []
+        for indices in clips.values():
+            num_chunks = math.ceil(len(indices) / chunk_size)
+            bounds = [round(i * len(indices) / num_chunks) for i in range(num_chunks + 1)]
+            self.chunks.extend(indices[bounds[i]:bounds[i + 1]] for i in range(num_chunks))
+
+    def __iter__(self):
+        # deterministically shuffle based on epoch
+        g = torch.Generator()
+        g.manual_seed(self.epoch)
+        num_chunks = len(self.chunks)
+        # enough chunks for the enlarged dataset of all the replicas (with one more round as a margin)
+        num_rounds = math.ceil(self.total_size / len(self.dataset)) + 1
+        order = torch.cat([torch.randperm(num_chunks, generator=g) for _ in range(num_rounds)]).tolist()
+        # subsample chunks
+        chunks = [self.chunks[i] for i in order[self.rank::self.num_replicas]]
+
+        indices = []
+        for start in range(0, len(chunks), self.num_streams):
+            group = chunks[start:start + self.num_streams]
+            # sample slot s of the t-th batch of a worker is the t-th frame of its chunk,
+            # shorter chunks (by at most one frame) repeat their first frame
+            for t in range(max(len(chunk) for chunk in group)):
+                indices.extend(chunk[t % len(chunk)] for chunk in group)
+            if len(indices) >= self.num_samples:
+                break
+
+        indices = indices[:self.num_samples]
+        assert len(indices) == self.num_samples
+        return iter(indices)
@@ -1,22 +1,30 @@
 import cv2
 import numpy as np
+import os
 import torch
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from os import path as osp
 from torch.nn import functional as F
 
 from basicsr.data.transforms import mod_crop
-from basicsr.utils import img2tensor, scandir
+from basicsr.utils import scandir, scandir_cached
 
 
-def read_img_seq(path, require_mod_crop=False, scale=1, return_imgname=False):
+def read_img_seq(path, require_mod_crop=False, scale=1, return_imgname=False, num_threads=None):
     """Read a sequence of images from a given folder path.
 
+    The frames are decoded by a thread pool (cv2 releases the GIL) and
+    written directly into a preallocated output tensor.
+
     Args:
         path (list[str] | str): List of image paths or image folder path.
         require_mod_crop (bool): Require mod crop for each image.
             Default: False.
         scale (int): Scale factor for mod_crop. Default: 1.
         return_imgname(bool): Whether return image names. Default False.
+        num_threads (int | None): Number of decoding threads. None for
+            min(8, cpu count). Default: None.
 
     Returns:
         Tensor: size (t, c, h, w), RGB, [0, 1].
@@ -26,12 +34,42 @@ def read_img_seq(path, require_mod_crop=False, scale=1, return_imgname=False):
         img_paths = path
     else:
         img_paths = sorted(list(scandir(path, full_path=True)))
-    imgs = [cv2.imread(v).astype(np.float32) / 255. for v in img_paths]
 
-    if require_mod_crop:
-        imgs = [mod_crop(img, scale) for img in imgs]
-    imgs = img2tensor(imgs, bgr2rgb=True, float32=True)
-    imgs = torch.stack(imgs, dim=0)
+    def read(img_path):
+        img = cv2.imread(img_path)
+        if img is None:
+            raise IOError(f'Failed to read {img_path}')
+        if require_mod_crop:
+            img = mod_crop(img, scale)
+        return img
+
+    first = read(img_paths[0])
+    h, w = first.shape[:2]
+    imgs = torch.empty((len(img_paths), 3, h, w), dtype=torch.float32)
+
+    def load(idx, img=None):
+        if img is None:
+            img = read(img_paths[idx])
+        if img.shape[:2] != (h, w):
+            raise ValueError(f'All the images should have the same size, but {img_paths[idx]} has size '
+                             f'{img.shape[:2]} and {img_paths[0]} has size {(h, w)}.')
+        # HWC BGR uint8 -> CHW RGB float32 in [0, 1]. Copying contiguous
+        # planes is much cheaper than copying a permuted and flipped view.
+        for c, channel in enumerate(reversed(cv2.split(img))):
+            imgs[idx, c].copy_(torch.from_numpy(channel))
+        imgs[idx].div_(255.)
+
+    load(0, first)
+    if num_threads is None:
+        num_threads = min(8, os.cpu_count() or 1)
+    num_threads = min(num_threads, len(img_paths) - 1)
+    if num_threads > 1:
+        with ThreadPoolExecutor(num_threads) as executor:
+            # list() to raise the errors of the workers
+            list(executor.map(load, range(1, len(img_paths))))
+    else:
+        for idx in range(1, len(img_paths)):
+            load(idx)
 
     if return_imgname:
         imgnames = [osp.splitext(osp.basename(path))[0] for path in img_paths]
@@ -92,6 +130,53 @@ def generate_frame_indices(crt_idx, max_frame_num, num_frames, padding='reflecti
     return indices
 
 
+class FrameCache(object):
+    """LRU cache of decoded frames with a byte budget.
+
+    Video datasets with sliding windows read the same frames for neighboring
+    samples. Each DataLoader worker keeps its own cache (it is created lazily
+    in the worker together with the file client), so it works best with
+    :class:`basicsr.data.data_sampler.ClipLocalitySampler`, which sends
+    neighboring samples to the same worker.
+
+    Cached frames must not be modified in place: store uint8 frames and
+    convert them (e.g., to float32) after `get()`, which copies them.
+
+    Args:
+        max_bytes (int): Maximum total size of the cached frames.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+
+    def get(self, key, load_fn):
+        """Get a frame, loading it with `load_fn()` on a miss.
+
+        Args:
+            key (hashable): Frame key, e.g., (client_key, path).
+            load_fn (callable): Returns the decoded frame (ndarray).
+        """
+        img = self._frames.get(key)
+        if img is not None:
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return img
+
+        self.misses += 1
+        img = load_fn()
+        if img.nbytes <= self.max_bytes:
+            self._frames[key] = img
+            self.nbytes += img.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return img
+
+
 def paired_paths_from_lmdb(folders, keys):
     """Generate paired paths from lmdb files.
 
@@ -139,6 +224,42 @@ def paired_paths_from_lmdb(folders, keys):
         raise ValueError(f'{input_key} folder and {gt_key} folder should both in lmdb '
                          f'formats. But received {input_key}: {input_folder}; '
                          f'{gt_key}: {gt_folder}')
+    return _paired_paths_from_meta_info_keys(folders, keys)
+
+
+def paired_paths_from_shards(folders, keys):
+    """Generate paired paths from shard folders.
+
+    The shard folders are made by `scripts/data_preparation/create_shards.py`.
+    Like lmdb, each folder has a meta_info.txt whose lines start with the
+    image name (with extension) and we use the name without extension as the
+    key. Note that we use the same key for the corresponding lq and gt images.
+
+    Args:
+        folders (list[str]): A list of folder path. The order of list should
+            be [input_folder, gt_folder].
+        keys (list[str]): A list of keys identifying folders. The order should
+            be in consistent with folders, e.g., ['lq', 'gt'].
+
+    Returns:
+        list[str]: Returned path list.
+    """
+    assert len(folders) == 2, ('The len of folders should be 2 with [input_folder, gt_folder]. '
+                               f'But got {len(folders)}')
+    assert len(keys) == 2, f'The len of keys should be 2 with [input_key, gt_key]. But got {len(keys)}'
+    input_folder, gt_folder = folders
+    input_key, gt_key = keys
+
+    if not (input_folder.endswith('.shards') and gt_folder.endswith('.shards')):
+        raise ValueError(f'{input_key} folder and {gt_key} folder should both in shards '
+                         f'formats. But received {input_key}: {input_folder}; '
+                         f'{gt_key}: {gt_folder}')
+    return _paired_paths_from_meta_info_keys(folders, keys)
+
+
+def _paired_paths_from_meta_info_keys(folders, keys):
+    input_folder, gt_folder = folders
+    input_key, gt_key = keys
     # ensure that the two meta_info files are the same
     with open(osp.join(input_folder, 'meta_info.txt')) as fin:
         input_lmdb_keys = [line.split('.')[0] for line in fin]
@@ -197,7 +318,7 @@ def paired_paths_from_meta_info_file(folders, keys, meta_info_file, filename_tmp
     return paths
 
 
-def paired_paths_from_folder(folders, keys, filename_tmpl):
+def paired_paths_from_folder(folders, keys, filename_tmpl, index_dir=None):
     """Generate paired paths from folders.
 
     Args:
@@ -208,6 +329,8 @@ def paired_paths_from_folder(folders, keys, filename_tmpl):
         filename_tmpl (str): Template for each filename. Note that the
             template excludes the file extension. Usually the filename_tmpl is
             for files in the input folder.
+        index_dir (str | None): If set, cache the folder scans in this folder
+            with `scandir_cached`. Default: None.
 
     Returns:
         list[str]: Returned path list.
@@ -218,10 +341,15 @@ def paired_paths_from_folder(folders, keys, filename_tmpl):
     input_folder, gt_folder = folders
     input_key, gt_key = keys
 
-    input_paths = list(scandir(input_folder))
-    gt_paths = list(scandir(gt_folder))
+    if index_dir is None:
+        input_paths = list(scandir(input_folder))
+        gt_paths = list(scandir(gt_folder))
+    else:
+        input_paths = scandir_cached(input_folder, index_dir)
+        gt_paths = scandir_cached(gt_folder, index_dir)
     assert len(input_paths) == len(gt_paths), (f'{input_key} and {gt_key} datasets have different number of images: '
                                                f'{len(input_paths)}, {len(gt_paths)}.')
+    input_paths = set(input_paths)
     paths = []
     for gt_path in gt_paths:
         basename, ext = osp.splitext(osp.basename(gt_path))
@@ -233,17 +361,22 @@ def paired_paths_from_folder(folders, keys, filename_tmpl):
     return paths
 
 
-def paths_from_folder(folder):
+def paths_from_folder(folder, index_dir=None):
     """Generate paths from folder.
 
     Args:
         folder (str): Folder path.
+        index_dir (str | None): If set, cache the folder scan in this folder
+            with `scandir_cached`. Default: None.
 
     Returns:
         list[str]: Returned path list.
     """
 
-    paths = list(scandir(folder))
+    if index_dir is None:
+        paths = list(scandir(folder))
+    else:
+        paths = scandir_cached(folder, index_dir)
     paths = [osp.join(folder, path) for path in paths]
     return paths
 
@@ -409,6 +409,165 @@ def circular_lowpass_kernel(cutoff, kernel_size, pad_to=0):
     return kernel
 
 
+# --------------------------- batched kernels (torch) --------------------------- #
+def _kernel_grid_pt(kernel_size, pad_to, device):
+    """Centered grid of size pad_to and the mask of the (kernel_size, kernel_size) kernels inside.
+
+    Args:
+        kernel_size (Tensor): Kernel sizes, with the shape (b, ).
+        pad_to (int): Size of the padded kernels.
+        device (torch.device):
+
+    Returns:
+        xx (Tensor): with the shape (pad_to, pad_to)
+        yy (Tensor): with the shape (pad_to, pad_to)
+        mask (Tensor): with the shape (b, pad_to, pad_to)
+    """
+    ax = torch.arange(-(pad_to // 2), pad_to // 2 + 1, dtype=torch.float64, device=device)
+    # the same layout as np.meshgrid in :func:`mesh_grid`
+    xx, yy = ax.view(1, -1).expand(pad_to, pad_to), ax.view(-1, 1).expand(pad_to, pad_to)
+    radius = (kernel_size.to(device) // 2).view(-1, 1, 1)
+    mask = (xx.abs() <= radius) & (yy.abs() <= radius)
+    return xx, yy, mask
+
+
+def bivariate_kernels_pt(kernel_size, sig_x, sig_y, theta, beta, plateau, pad_to=21):
+    """Generate a batch of Gaussian, generalized Gaussian and plateau kernels.
+
+    It is the batched version of :func:`bivariate_Gaussian`,
+    :func:`bivariate_generalized_Gaussian` and :func:`bivariate_plateau`.
+    All the arguments are tensors with the shape (b, ), on the same device.
+    Isotropic kernels have sig_y = sig_x and theta = 0, and Gaussian kernels
+    have beta = 1.
+
+    Args:
+        kernel_size (Tensor): Odd kernel sizes, no larger than pad_to.
+        sig_x (Tensor):
+        sig_y (Tensor):
+        theta (Tensor): Radian measurement.
+        beta (Tensor): Shape parameter.
+        plateau (Tensor): Bool, plateau kernels instead of (generalized) Gaussian ones.
+        pad_to (int): The kernels are zero-padded to (pad_to, pad_to). Default: 21.
+
+    Returns:
+        Tensor: Normalized kernels, float64, with the shape (b, pad_to, pad_to).
+    """
+    xx, yy, mask = _kernel_grid_pt(kernel_size, pad_to, sig_x.device)
+    sig_x, sig_y, theta, beta = (v.double().view(-1, 1, 1) for v in (sig_x, sig_y, theta, beta))
+    # inverse of the rotated sigma matrix: R diag(1 / sig_x^2, 1 / sig_y^2) R^T
+    cos, sin = torch.cos(theta), torch.sin(theta)
+    inv_x, inv_y = 1 / sig_x**2, 1 / sig_y**2
+    quad = (cos**2 * inv_x + sin**2 * inv_y) * xx**2 + 2 * cos * sin * (inv_x - inv_y) * xx * yy + (
+        sin**2 * inv_x + cos**2 * inv_y) * yy**2
+    quad = torch.pow(quad, beta)
+    kernel = torch.where(plateau.view(-1, 1, 1), torch.reciprocal(quad + 1), torch.exp(-0.5 * quad))
+    kernel = kernel * mask
+    return kernel / kernel.sum(dim=(1, 2), keepdim=True)
+
+
+def _bessel_j1_pt(x):
+    # torch.special is missing before PyTorch 1.9, and bessel_j1 before 1.13
+    bessel_j1 = getattr(getattr(torch, 'special', None), 'bessel_j1', None)
+    if bessel_j1 is not None:
+        return bessel_j1(x)
+    return torch.from_numpy(special.j1(x.cpu().numpy())).to(x)
+
+
+def circular_lowpass_kernel_pt(cutoff, kernel_size, pad_to=21):
+    """Generate a batch of 2D sinc filters, the batched version of :func:`circular_lowpass_kernel`.
+
+    Args:
+        cutoff (Tensor): Cutoff frequencies in radians (pi is max), with the shape (b, ).
+        kernel_size (Tensor): Odd kernel sizes, no larger than pad_to, with the shape (b, ).
+        pad_to (int): The kernels are zero-padded to (pad_to, pad_to). Default: 21.
+
+    Returns:
+        Tensor: Normalized kernels, float64, with the shape (b, pad_to, pad_to).
+    """
+    xx, yy, mask = _kernel_grid_pt(kernel_size, pad_to, cutoff.device)
+    cutoff = cutoff.double().view(-1, 1, 1)
+    radius = torch.sqrt(xx**2 + yy**2)
+    kernel = cutoff * _bessel_j1_pt(cutoff * radius) / (2 * np.pi * radius)
+    kernel = torch.where(radius == 0, cutoff**2 / (4 * np.pi), kernel)
+    kernel = kernel * mask
+    return kernel / kernel.sum(dim=(1, 2), keepdim=True)
+
+
+def _uniform_pt(low, high, size, device):
+    return torch.rand(size, dtype=torch.float64, device=device) * (high - low) + low
+
+
+def random_mixed_kernels_pt(batch_size,
+                            kernel_list,
+                            kernel_prob,
+                            kernel_sizes,
+                            sigma_x_range=(0.6, 5),
+                            sigma_y_range=(0.6, 5),
+                            rotation_range=(-math.pi, math.pi),
+                            betag_range=(0.5, 8),
+                            betap_range=(0.5, 8),
+                            pad_to=21,
+                            device='cpu'):
+    """Randomly generate a batch of mixed kernels in one vectorized call.
+
+    The kernels follow the same distributions as :func:`random_mixed_kernels`
+    (without multiplicative noise), with a kernel size drawn from
+    `kernel_sizes` for each of them.
+
+    Args:
+        batch_size (int):
+        kernel_list (tuple): a list name of kernel types,
+            support ['iso', 'aniso', 'generalized_iso', 'generalized_aniso',
+            'plateau_iso', 'plateau_aniso']
+        kernel_prob (tuple): corresponding kernel probability for each
+            kernel type
+        kernel_sizes (list[int]): Odd kernel sizes to draw from.
+        sigma_x_range (tuple): [0.6, 5]
+        sigma_y_range (tuple): [0.6, 5]
+        rotation range (tuple): [-math.pi, math.pi]
+        betag_range (tuple): [0.5, 8]
+        betap_range (tuple): [0.5, 8]
+        pad_to (int): The kernels are zero-padded to (pad_to, pad_to). Default: 21.
+        device (str | torch.device): Default: 'cpu'.
+
+    Returns:
+        kernel (Tensor): float64, with the shape (batch_size, pad_to, pad_to).
+        kernel_size (Tensor): Kernel sizes, with the shape (batch_size, ).
+    """
+    kernel_types = ['iso', 'aniso', 'generalized_iso', 'generalized_aniso', 'plateau_iso', 'plateau_aniso']
+    for kernel_type in kernel_list:
+        if kernel_type not in kernel_types:
+            raise ValueError(f'Kernel type {kernel_type} is not supported. Supported ones are: {kernel_types}.')
+
+    kernel_sizes = torch.tensor(kernel_sizes, device=device)
+    kernel_size = kernel_sizes[torch.randint(len(kernel_sizes), (batch_size, ), device=device)]
+    idx = torch.multinomial(torch.tensor(kernel_prob, dtype=torch.float64, device=device), batch_size, replacement=True)
+
+    def is_type(names):
+        flags = torch.tensor([name in names for name in kernel_list], device=device)
+        return flags[idx]
+
+    aniso = is_type(['aniso', 'generalized_aniso', 'plateau_aniso'])
+    generalized = is_type(['generalized_iso', 'generalized_aniso'])
+    plateau = is_type(['plateau_iso', 'plateau_aniso'])
+
+    sig_x = _uniform_pt(*sigma_x_range, batch_size, device)
+    sig_y = torch.where(aniso, _uniform_pt(*sigma_y_range, batch_size, device), sig_x)
+    theta = torch.where(aniso, _uniform_pt(*rotation_range, batch_size, device), torch.zeros_like(sig_x))
+    # beta is drawn below or above 1 with the same probability
+    beta_range = torch.where(
+        plateau.view(-1, 1), torch.tensor(betap_range, dtype=torch.float64, device=device),
+        torch.tensor(betag_range, dtype=torch.float64, device=device))
+    below = torch.rand(batch_size, device=device) < 0.5
+    low = torch.where(below, beta_range[:, 0], torch.ones_like(sig_x))
+    high = torch.where(below, torch.ones_like(sig_x), beta_range[:, 1])
+    beta = torch.where(generalized | plateau,
+                       _uniform_pt(0, 1, batch_size, device) * (high - low) + low, torch.ones_like(sig_x))
+
+    kernel = bivariate_kernels_pt(kernel_size, sig_x, sig_y, theta, beta, plateau, pad_to=pad_to)
+    return kernel, kernel_size
+
+
 # ------------------------------------------------------------- #
 # --------------------------- noise --------------------------- #
 # ------------------------------------------------------------- #
@@ -629,22 +788,18 @@ def generate_poisson_noise_pt(img, scale=1.0, gray_noise=0):
     if cal_gray_noise:
         img_gray = rgb_to_grayscale(img, num_output_channels=1)
         # round and clip image for counting vals correctly
-        img_gray = torch.clamp((img_gray * 255.0).round(), 0, 255) / 255.
-        # use for-loop to get the unique values for each sample
-        vals_list = [len(torch.unique(img_gray[i, :, :, :])) for i in range(b)]
-        vals_list = [2**np.ceil(np.log2(vals)) for vals in vals_list]
-        vals = img_gray.new_tensor(vals_list).view(b, 1, 1, 1)
+        img_gray = torch.clamp((img_gray * 255.0).round(), 0, 255)
+        vals = _poisson_vals_pt(img_gray)
+        img_gray = img_gray / 255.
         out = torch.poisson(img_gray * vals) / vals
         noise_gray = out - img_gray
         noise_gray = noise_gray.expand(b, 3, h, w)
 
     # always calculate color noise
     # round and clip image for counting vals correctly
-    img = torch.clamp((img * 255.0).round(), 0, 255) / 255.
-    # use for-loop to get the unique values for each sample
-    vals_list = [len(torch.unique(img[i, :, :, :])) for i in range(b)]
-    vals_list = [2**np.ceil(np.log2(vals)) for vals in vals_list]
-    vals = img.new_tensor(vals_list).view(b, 1, 1, 1)
+    img = torch.clamp((img * 255.0).round(), 0, 255)
+    vals = _poisson_vals_pt(img)
+    img = img / 255.
     out = torch.poisson(img * vals) / vals
     noise = out - img
     if cal_gray_noise:
@@ -654,6 +809,26 @@ def generate_poisson_noise_pt(img, scale=1.0, gray_noise=0):
     return noise * scale
 
 
+def _poisson_vals_pt(img):
+    """Get the number of poisson levels for each sample, i.e., the number of unique values rounded up to a power of 2.
+
+    The unique values are counted with a single bincount over the whole batch, instead of sorting every sample with
+    torch.unique.
+
+    Args:
+        img (Tensor): Rounded and clipped image, shape (b, c, h, w), range [0, 255].
+
+    Returns:
+        (Tensor): Shape (b, 1, 1, 1), with the dtype of img.
+    """
+    b = img.size(0)
+    # offset the values of each sample, so that they fall into separate bins
+    bins = img.long().view(b, -1) + torch.arange(0, b * 256, 256, device=img.device).view(b, 1)
+    num_vals = (torch.bincount(bins.view(-1), minlength=b * 256).view(b, 256) > 0).sum(dim=1)
+    vals = torch.exp2(torch.ceil(torch.log2(num_vals.double())))
+    return vals.to(img.dtype).view(b, 1, 1, 1)
+
+
 def add_poisson_noise_pt(img, scale=1.0, clip=True, rounds=False, gray_noise=0):
     """Add poisson noise to a batch of images (PyTorch version).
 
@@ -1,9 +1,10 @@
 from torch.utils import data as data
 from torchvision.transforms.functional import normalize
 
-from basicsr.data.data_util import paired_paths_from_folder, paired_paths_from_lmdb, paired_paths_from_meta_info_file
+from basicsr.data.data_util import (paired_paths_from_folder, paired_paths_from_lmdb, paired_paths_from_meta_info_file,
+                                    paired_paths_from_shards)
 from basicsr.data.transforms import augment, paired_random_crop
-from basicsr.utils import FileClient, bgr2ycbcr, imfrombytes, img2tensor
+from basicsr.utils import FileClient, bgr2ycbcr, imfrombytes, imfrombytes_for_crop, img2tensor
 from basicsr.utils.registry import DATASET_REGISTRY
 
 
@@ -13,12 +14,13 @@ class PairedImageDataset(data.Dataset):
 
     Read LQ (Low Quality, e.g. LR (Low Resolution), blurry, noisy, etc) and GT image pairs.
 
-    There are three modes:
+    There are four modes:
 
     1. **lmdb**: Use lmdb files. If opt['io_backend'] == lmdb.
-    2. **meta_info_file**: Use meta information file to generate paths. \
+    2. **shards**: Use memory-mapped shards of decoded images. If opt['io_backend'] == shards.
+    3. **meta_info_file**: Use meta information file to generate paths. \
         If opt['io_backend'] != lmdb and opt['meta_info_file'] is not None.
-    3. **folder**: Scan folders to generate paths. The rest.
+    4. **folder**: Scan folders to generate paths. The rest.
 
     Args:
         opt (dict): Config for train datasets. It contains the following keys:
@@ -28,6 +30,8 @@ class PairedImageDataset(data.Dataset):
         io_backend (dict): IO backend type and other kwarg.
         filename_tmpl (str): Template for each filename. Note that the template excludes the file extension.
             Default: '{}'.
+        path_index_dir (str, optional): Folder to cache the scans of the folder mode (see `scandir_cached`), so that
+            the dataset starts without listing the folders again. Default: None.
         gt_size (int): Cropped patched size for gt patches.
         use_hflip (bool): Use horizontal flips.
         use_rot (bool): Use rotation (use vertical flip and transposing h and w for implementation).
@@ -54,11 +58,16 @@ class PairedImageDataset(data.Dataset):
             self.io_backend_opt['db_paths'] = [self.lq_folder, self.gt_folder]
             self.io_backend_opt['client_keys'] = ['lq', 'gt']
             self.paths = paired_paths_from_lmdb([self.lq_folder, self.gt_folder], ['lq', 'gt'])
+        elif self.io_backend_opt['type'] == 'shards':
+            self.io_backend_opt['db_paths'] = [self.lq_folder, self.gt_folder]
+            self.io_backend_opt['client_keys'] = ['lq', 'gt']
+            self.paths = paired_paths_from_shards([self.lq_folder, self.gt_folder], ['lq', 'gt'])
         elif 'meta_info_file' in self.opt and self.opt['meta_info_file'] is not None:
             self.paths = paired_paths_from_meta_info_file([self.lq_folder, self.gt_folder], ['lq', 'gt'],
                                                           self.opt['meta_info_file'], self.filename_tmpl)
         else:
-            self.paths = paired_paths_from_folder([self.lq_folder, self.gt_folder], ['lq', 'gt'], self.filename_tmpl)
+            self.paths = paired_paths_from_folder([self.lq_folder, self.gt_folder], ['lq', 'gt'], self.filename_tmpl,
+                                                  opt.get('path_index_dir'))
 
     def __getitem__(self, index):
         if self.file_client is None:
@@ -69,19 +78,21 @@ class PairedImageDataset(data.Dataset):
         # Load gt and lq images. Dimension order: HWC; channel order: BGR;
         # image range: [0, 1], float32.
         gt_path = self.paths[index]['gt_path']
-        img_bytes = self.file_client.get(gt_path, 'gt')
-        img_gt = imfrombytes(img_bytes, float32=True)
+        gt_bytes = self.file_client.get(gt_path, 'gt')
         lq_path = self.paths[index]['lq_path']
-        img_bytes = self.file_client.get(lq_path, 'lq')
-        img_lq = imfrombytes(img_bytes, float32=True)
+        lq_bytes = self.file_client.get(lq_path, 'lq')
 
         # augmentation for training
         if self.opt['phase'] == 'train':
             gt_size = self.opt['gt_size']
-            # random crop
-            img_gt, img_lq = paired_random_crop(img_gt, img_lq, gt_size, scale, gt_path)
+            # random crop, before the float32 conversion. Decoded images (shards, shm cache) are only read in the crop
+            img_gt, img_lq = paired_random_crop(
+                imfrombytes_for_crop(gt_bytes), imfrombytes_for_crop(lq_bytes), gt_size, scale, gt_path)
+            img_gt, img_lq = imfrombytes(img_gt, float32=True), imfrombytes(img_lq, float32=True)
             # flip, rotation
             img_gt, img_lq = augment([img_gt, img_lq], self.opt['use_hflip'], self.opt['use_rot'])
+        else:
+            img_gt, img_lq = imfrombytes(gt_bytes, float32=True), imfrombytes(lq_bytes, float32=True)
 
         # color space transform
         if 'color' in self.opt and self.opt['color'] == 'y':
@@ -1,5 +1,6 @@
 import queue as Queue
 import threading
+import time
 import torch
 from torch.utils.data import DataLoader
 
@@ -120,3 +121,144 @@ class CUDAPrefetcher():
     def reset(self):
         self.loader = iter(self.ori_loader)
         self.preload()
+
+
+class PinnedPrefetcher():
+    """Pinned-memory prefetcher with several batches in flight.
+
+    A background thread takes the batches from the dataloader, copies their
+    tensors into reusable pinned buffers and, for CUDA devices, starts a
+    non-blocking transfer on a side stream. Up to `num_prefetch_queue`
+    batches are kept ready, so the training loop only waits when the input
+    pipeline is slower than the model. For other devices, the non-blocking
+    transfer is started in `next()`. Pinned memory requires CUDA; without it,
+    plain reusable buffers are used.
+
+    The buffers are reused: a batch returned by `next()` is only valid until
+    the following call of `next()`. Do not set `pin_memory` for the
+    dataloader, as the batches are already copied into pinned memory here.
+
+    `get_stats()` returns the average time `next()` waited for a batch (the
+    data stall) and the average number of ready batches, since its last call.
+
+    Args:
+        loader: Dataloader.
+        opt (dict): Options.
+        num_prefetch_queue (int): Number of batches in flight. Default: 2.
+        device (str | torch.device | None): Target device. None for the
+            device of the models ('cuda' if opt['num_gpu'] != 0 else 'cpu').
+            Default: None.
+    """
+
+    def __init__(self, loader, opt, num_prefetch_queue=2, device=None):
+        self.ori_loader = loader
+        self.num_prefetch_queue = num_prefetch_queue
+        if device is None:
+            device = 'cuda' if opt['num_gpu'] != 0 else 'cpu'
+        self.device = torch.device(device)
+        self.pin_memory = torch.cuda.is_available()
+        if self.device.type == 'cuda':
+            # the worker thread has its own current device, so fix the index now
+            if self.device.index is None:
+                self.device = torch.device('cuda', torch.cuda.current_device())
+            self.stream = torch.cuda.Stream(device=self.device)
+        # one buffer set per batch in flight, plus the one used by the training loop
+        num_slots = num_prefetch_queue + 1
+        self._buffers = [{} for _ in range(num_slots)]
+        self._events = [None] * num_slots
+        self._slot = None
+        self._thread = None
+        self._stall_time = 0
+        self._queue_depth = 0
+        self._count = 0
+
+    def _fill(self, slot, batch):
+        if self._events[slot] is not None:
+            # the previous transfer from these buffers must be done before overwriting them
+            self._events[slot].synchronize()
+        buffers = self._buffers[slot]
+        for k, v in batch.items():
+            if torch.is_tensor(v):
+                buffer = buffers.get(k)
+                if buffer is None or buffer.shape != v.shape or buffer.dtype != v.dtype:
+                    buffer = buffers[k] = torch.empty(v.shape, dtype=v.dtype, pin_memory=self.pin_memory)
+                batch[k] = buffer.copy_(v)
+        if self.device.type == 'cuda':
+            with torch.cuda.stream(self.stream):
+                for k, v in batch.items():
+                    if torch.is_tensor(v):
+                        batch[k] = v.to(self.device, non_blocking=True)
+                event = torch.cuda.Event()
+                event.record(self.stream)
+            self._events[slot] = event
+        return batch
+
+    def _worker(self, loader, free_slots, ready, stop):
+        try:
+            for batch in loader:
+                slot = free_slots.get()
+                if stop.is_set():
+                    return
+                ready.put((slot, self._fill(slot, batch)))
+            ready.put(None)
+        except Exception as error:
+            ready.put(error)
+
+    def next(self):
+        if self._slot is not None:
+            self._free_slots.put(self._slot)
+            self._slot = None
+
+        queue_depth = self._ready.qsize()
+        tic = time.time()
+        item = self._ready.get()
+        self._stall_time += time.time() - tic
+        self._queue_depth += queue_depth
+        self._count += 1
+
+        if item is None:
+            return None
+        if isinstance(item, Exception):
+            raise item
+        self._slot, batch = item
+        if self.device.type == 'cuda':
+            stream = torch.cuda.current_stream(self.device)
+            stream.wait_event(self._events[self._slot])
+            for v in batch.values():
+                if torch.is_tensor(v):
+                    # the tensors were allocated on the side stream
+                    v.record_stream(stream)
+        elif self.device.type != 'cpu':
+            for k, v in batch.items():
+                if torch.is_tensor(v):
+                    batch[k] = v.to(self.device, non_blocking=True)
+        return batch
+
+    def reset(self):
+        self.close()
+        self._slot = None
+        self._free_slots = Queue.Queue()
+        for slot in range(self.num_prefetch_queue + 1):
+            self._free_slots.put(slot)
+        self._ready = Queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._worker, args=(iter(self.ori_loader), self._free_slots, self._ready, self._stop), daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the worker thread of the current epoch."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        # wake the worker up if it waits for a free slot
+        self._free_slots.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def get_stats(self):
+        """Get the average data stall (in seconds) and queue depth since the last call."""
+        count = max(self._count, 1)
+        stats = {'data_stall': self._stall_time / count, 'queue_depth': self._queue_depth / count}
+        self._stall_time = self._queue_depth = self._count = 0
+        return stats
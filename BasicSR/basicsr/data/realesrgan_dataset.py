@@ -1,4 +1,5 @@
 import cv2
+import json
 import math
 import numpy as np
 import os
@@ -8,12 +9,111 @@ import time
 import torch
 from torch.utils import data as data
 
-from basicsr.data.degradations import circular_lowpass_kernel, random_mixed_kernels
+from basicsr.data.degradations import (circular_lowpass_kernel, circular_lowpass_kernel_pt, random_mixed_kernels,
+                                       random_mixed_kernels_pt)
 from basicsr.data.transforms import augment
 from basicsr.utils import FileClient, get_root_logger, imfrombytes, img2tensor
 from basicsr.utils.registry import DATASET_REGISTRY
 
 
+def random_realesrgan_kernels_pt(opt, batch_size, device='cpu'):
+    """Draw the kernels of :class:`RealESRGANDataset` for a whole batch in one vectorized call.
+
+    The kernels follow the same distributions as the ones of
+    `RealESRGANDataset.__getitem__`, but they are generated with PyTorch on
+    `device`, so that the kernel synthesis is no longer done by the
+    dataloader workers.
+
+    Args:
+        opt (dict): Config of the train dataset, with the same kernel options
+            as :class:`RealESRGANDataset`.
+        batch_size (int):
+        device (str | torch.device): Default: 'cpu'.
+
+    Returns:
+        dict: 'kernel1', 'kernel2' and 'sinc_kernel', float32 tensors with
+            the shape (batch_size, 21, 21).
+    """
+    kernel_range = [2 * v + 1 for v in range(3, 11)]  # kernel size ranges from 7 to 21
+
+    def blur_kernels(kernel_list, kernel_prob, blur_sigma, betag_range, betap_range, sinc_prob):
+        kernel, kernel_size = random_mixed_kernels_pt(
+            batch_size,
+            kernel_list,
+            kernel_prob,
+            kernel_range,
+            blur_sigma,
+            blur_sigma, [-math.pi, math.pi],
+            betag_range,
+            betap_range,
+            pad_to=21,
+            device=device)
+        # this sinc filter setting is for kernels ranging from [7, 21]
+        omega_c = torch.rand(batch_size, dtype=torch.float64, device=device)
+        omega_c = torch.where(kernel_size < 13,
+                              omega_c * (np.pi - np.pi / 3) + np.pi / 3,
+                              omega_c * (np.pi - np.pi / 5) + np.pi / 5)
+        sinc = torch.rand(batch_size, device=device) < sinc_prob
+        kernel = torch.where(sinc.view(-1, 1, 1), circular_lowpass_kernel_pt(omega_c, kernel_size, pad_to=21), kernel)
+        return kernel.float()
+
+    kernel1 = blur_kernels(opt['kernel_list'], opt['kernel_prob'], opt['blur_sigma'], opt['betag_range'],
+                           opt['betap_range'], opt['sinc_prob'])
+    kernel2 = blur_kernels(opt['kernel_list2'], opt['kernel_prob2'], opt['blur_sigma2'], opt['betag_range2'],
+                           opt['betap_range2'], opt['sinc_prob2'])
+
+    # the final sinc kernel, or a pulse which brings no blurry effect
+    idx = torch.randint(len(kernel_range), (batch_size, ), device=device)
+    kernel_size = torch.tensor(kernel_range, device=device)[idx]
+    omega_c = torch.rand(batch_size, dtype=torch.float64, device=device) * (np.pi - np.pi / 3) + np.pi / 3
+    pulse = torch.zeros(21, 21, dtype=torch.float64, device=device)
+    pulse[10, 10] = 1
+    sinc = torch.rand(batch_size, device=device) < opt['final_sinc_prob']
+    sinc_kernel = torch.where(sinc.view(-1, 1, 1), circular_lowpass_kernel_pt(omega_c, kernel_size, pad_to=21),
+                              pulse).float()
+    return {'kernel1': kernel1, 'kernel2': kernel2, 'sinc_kernel': sinc_kernel}
+
+
+KERNEL_BANK_KEYS = [
+    'kernel_list', 'kernel_prob', 'blur_sigma', 'betag_range', 'betap_range', 'sinc_prob', 'kernel_list2',
+    'kernel_prob2', 'blur_sigma2', 'betag_range2', 'betap_range2', 'sinc_prob2', 'final_sinc_prob'
+]
+
+
+def make_kernel_bank(opt, bank_path, num_kernels=50000, seed=0, batch_size=4096):
+    """Precompute a seeded bank of the kernels of :class:`RealESRGANDataset`.
+
+    The bank is a float32 array with the shape (num_kernels, 3, 21, 21),
+    holding kernel1, kernel2 and sinc_kernel of each entry, drawn with
+    :func:`random_realesrgan_kernels_pt`. It is saved to `bank_path` (.npy),
+    to be memory-mapped by the dataset. The kernel settings, the seed and
+    the size are saved to `bank_path + '.json'`, to check that an existing
+    bank matches the settings.
+
+    Args:
+        opt (dict): Config of the train dataset, with the kernel options.
+        bank_path (str): Path of the .npy file.
+        num_kernels (int): Number of entries (about 5.3KB each). Default: 50000.
+        seed (int): Random seed. The same settings and seed give the same bank. Default: 0.
+        batch_size (int): Number of entries generated at once. Default: 4096.
+    """
+    tmp_path = f'{bank_path}.{os.getpid()}.tmp'
+    bank = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(num_kernels, 3, 21, 21))
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(seed)
+        for start in range(0, num_kernels, batch_size):
+            kernels = random_realesrgan_kernels_pt(opt, min(batch_size, num_kernels - start))
+            kernels = torch.stack([kernels['kernel1'], kernels['kernel2'], kernels['sinc_kernel']], dim=1)
+            bank[start:start + kernels.size(0)] = kernels.numpy()
+    bank.flush()
+    del bank
+    os.replace(tmp_path, bank_path)
+    meta = {'settings': {k: opt[k] for k in KERNEL_BANK_KEYS}, 'num_kernels': num_kernels, 'seed': seed}
+    with open(f'{bank_path}.json.{os.getpid()}.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(f'{bank_path}.json.{os.getpid()}.tmp', f'{bank_path}.json')
+
+
 @DATASET_REGISTRY.register(suffix='basicsr')
 class RealESRGANDataset(data.Dataset):
     """Dataset used for Real-ESRGAN model:
@@ -30,6 +130,13 @@ class RealESRGANDataset(data.Dataset):
             io_backend (dict): IO backend type and other kwarg.
             use_hflip (bool): Use horizontal flips.
             use_rot (bool): Use rotation (use vertical flip and transposing h and w for implementation).
+            kernels_on_device (bool): Do not generate the kernels here. RealESRGANModel then draws them for the
+                whole batch on the training device, with :func:`random_realesrgan_kernels_pt`. Default: False.
+            kernel_bank (str): Path of a kernel bank (.npy) made by :func:`make_kernel_bank`. The samples then take
+                their kernels from the memory-mapped bank instead of generating them. The bank is built with
+                `kernel_bank_size` (default: 50000) entries and `kernel_bank_seed` (default: 0) if it does not
+                exist yet. An existing bank made with other kernel settings, size or seed raises a ValueError.
+                Default: None.
             Please see more options in the codes.
     """
 
@@ -40,12 +147,13 @@ class RealESRGANDataset(data.Dataset):
         self.io_backend_opt = opt['io_backend']
         self.gt_folder = opt['dataroot_gt']
 
-        # file client (lmdb io backend)
-        if self.io_backend_opt['type'] == 'lmdb':
+        # file client (lmdb or shards io backend)
+        if self.io_backend_opt['type'] in ('lmdb', 'shards'):
             self.io_backend_opt['db_paths'] = [self.gt_folder]
             self.io_backend_opt['client_keys'] = ['gt']
-            if not self.gt_folder.endswith('.lmdb'):
-                raise ValueError(f"'dataroot_gt' should end with '.lmdb', but received {self.gt_folder}")
+            suffix = '.' + self.io_backend_opt['type']
+            if not self.gt_folder.endswith(suffix):
+                raise ValueError(f"'dataroot_gt' should end with '{suffix}', but received {self.gt_folder}")
             with open(osp.join(self.gt_folder, 'meta_info.txt')) as fin:
                 self.paths = [line.split('.')[0] for line in fin]
         else:
@@ -81,6 +189,34 @@ class RealESRGANDataset(data.Dataset):
         self.pulse_tensor = torch.zeros(21, 21).float()  # convolving with pulse tensor brings no blurry effect
         self.pulse_tensor[10, 10] = 1
 
+        # precomputed kernels, memory-mapped lazily in each worker
+        self.kernel_bank_path = opt.get('kernel_bank')
+        self.kernel_bank = None
+        if self.kernel_bank_path is not None:
+            if opt.get('kernels_on_device', False):
+                raise ValueError('kernel_bank and kernels_on_device cannot be used together.')
+            self._check_kernel_bank()
+
+    def _check_kernel_bank(self):
+        """Build the kernel bank if it does not exist, and check that it matches the kernel settings."""
+        meta_path = f'{self.kernel_bank_path}.json'
+        num_kernels = self.opt.get('kernel_bank_size', 50000)
+        seed = self.opt.get('kernel_bank_seed', 0)
+        if not osp.exists(meta_path):
+            logger = get_root_logger()
+            logger.info(f'Build the kernel bank {self.kernel_bank_path}...')
+            make_kernel_bank(self.opt, self.kernel_bank_path, num_kernels=num_kernels, seed=seed)
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        settings = json.loads(json.dumps({k: self.opt[k] for k in KERNEL_BANK_KEYS}))
+        if meta['settings'] != settings:
+            raise ValueError(f'The kernel bank {self.kernel_bank_path} was made with other kernel settings: '
+                             f'{meta["settings"]}. Please remove it or use another path.')
+        if meta['num_kernels'] != num_kernels or meta['seed'] != seed:
+            raise ValueError(f'The kernel bank {self.kernel_bank_path} was made with kernel_bank_size '
+                             f'{meta["num_kernels"]} and kernel_bank_seed {meta["seed"]}, instead of {num_kernels} '
+                             f'and {seed}. Please remove it or use another path.')
+
     def __getitem__(self, index):
         if self.file_client is None:
             self.file_client = FileClient(self.io_backend_opt.pop('type'), **self.io_backend_opt)
@@ -126,6 +262,22 @@ class RealESRGANDataset(data.Dataset):
             left = random.randint(0, w - crop_pad_size)
             img_gt = img_gt[top:top + crop_pad_size, left:left + crop_pad_size, ...]
 
+        if self.opt.get('kernels_on_device', False):
+            # the kernels are drawn by the model for the whole batch
+            img_gt = img2tensor([img_gt], bgr2rgb=True, float32=True)[0]
+            return {'gt': img_gt, 'gt_path': gt_path}
+
+        if self.kernel_bank_path is not None:
+            if self.kernel_bank is None:
+                self.kernel_bank = np.load(self.kernel_bank_path, mmap_mode='r')
+            # independent entries for the three kernels
+            idx = np.random.randint(len(self.kernel_bank), size=3)
+            kernel = torch.from_numpy(np.array(self.kernel_bank[idx[0], 0]))
+            kernel2 = torch.from_numpy(np.array(self.kernel_bank[idx[1], 1]))
+            sinc_kernel = torch.from_numpy(np.array(self.kernel_bank[idx[2], 2]))
+            img_gt = img2tensor([img_gt], bgr2rgb=True, float32=True)[0]
+            return {'gt': img_gt, 'kernel1': kernel, 'kernel2': kernel2, 'sinc_kernel': sinc_kernel, 'gt_path': gt_path}
+
         # ------------------------ Generate kernels (used in the first degradation) ------------------------ #
         kernel_size = random.choice(self.kernel_range)
         if np.random.uniform() < self.opt['sinc_prob']:
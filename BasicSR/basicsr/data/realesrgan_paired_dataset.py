@@ -4,7 +4,7 @@ from torchvision.transforms.functional import normalize
 
 from basicsr.data.data_util import paired_paths_from_folder, paired_paths_from_lmdb
 from basicsr.data.transforms import augment, paired_random_crop
-from basicsr.utils import FileClient, imfrombytes, img2tensor
+from basicsr.utils import FileClient, imfrombytes, imfrombytes_for_crop, img2tensor
 from basicsr.utils.registry import DATASET_REGISTRY
 
 
@@ -29,6 +29,8 @@ class RealESRGANPairedDataset(data.Dataset):
         io_backend (dict): IO backend type and other kwarg.
         filename_tmpl (str): Template for each filename. Note that the template excludes the file extension.
             Default: '{}'.
+        path_index_dir (str, optional): Folder to cache the scans of the folder mode (see `scandir_cached`), so that
+            the dataset starts without listing the folders again. Default: None.
         gt_size (int): Cropped patched size for gt patches.
         use_hflip (bool): Use horizontal flips.
         use_rot (bool): Use rotation (use vertical flip and transposing h and w for implementation).
@@ -68,7 +70,8 @@ class RealESRGANPairedDataset(data.Dataset):
             # disk backend
             # it will scan the whole folder to get meta info
             # it will be time-consuming for folders with too many files. It is recommended using an extra meta txt file
-            self.paths = paired_paths_from_folder([self.lq_folder, self.gt_folder], ['lq', 'gt'], self.filename_tmpl)
+            self.paths = paired_paths_from_folder([self.lq_folder, self.gt_folder], ['lq', 'gt'], self.filename_tmpl,
+                                                  opt.get('path_index_dir'))
 
     def __getitem__(self, index):
         if self.file_client is None:
@@ -79,19 +82,21 @@ class RealESRGANPairedDataset(data.Dataset):
         # Load gt and lq images. Dimension order: HWC; channel order: BGR;
         # image range: [0, 1], float32.
         gt_path = self.paths[index]['gt_path']
-        img_bytes = self.file_client.get(gt_path, 'gt')
-        img_gt = imfrombytes(img_bytes, float32=True)
+        gt_bytes = self.file_client.get(gt_path, 'gt')
         lq_path = self.paths[index]['lq_path']
-        img_bytes = self.file_client.get(lq_path, 'lq')
-        img_lq = imfrombytes(img_bytes, float32=True)
+        lq_bytes = self.file_client.get(lq_path, 'lq')
 
         # augmentation for training
         if self.opt['phase'] == 'train':
             gt_size = self.opt['gt_size']
-            # random crop
-            img_gt, img_lq = paired_random_crop(img_gt, img_lq, gt_size, scale, gt_path)
+            # random crop, before the float32 conversion. Decoded images (shards, shm cache) are only read in the crop
+            img_gt, img_lq = paired_random_crop(
+                imfrombytes_for_crop(gt_bytes), imfrombytes_for_crop(lq_bytes), gt_size, scale, gt_path)
+            img_gt, img_lq = imfrombytes(img_gt, float32=True), imfrombytes(img_lq, float32=True)
             # flip, rotation
             img_gt, img_lq = augment([img_gt, img_lq], self.opt['use_hflip'], self.opt['use_rot'])
+        else:
+            img_gt, img_lq = imfrombytes(gt_bytes, float32=True), imfrombytes(lq_bytes, float32=True)
 
         # BGR to RGB, HWC to CHW, numpy to tensor
         img_gt, img_lq = img2tensor([img_gt, img_lq], bgr2rgb=True, float32=True)
@@ -4,12 +4,21 @@ import torch
 from pathlib import Path
 from torch.utils import data as data
 
+from basicsr.data.data_util import FrameCache
 from basicsr.data.transforms import augment, paired_random_crop
 from basicsr.utils import FileClient, get_root_logger, imfrombytes, img2tensor
 from basicsr.utils.flow_util import dequantize_flow
 from basicsr.utils.registry import DATASET_REGISTRY
 
 
+def read_frame(file_client, path, client_key, frame_cache=None):
+    """Read a frame as float32 in [0, 1], through the decoded-frame cache if there is one."""
+    if frame_cache is None:
+        return imfrombytes(file_client.get(path, client_key), float32=True)
+    img = frame_cache.get((client_key, str(path)), lambda: imfrombytes(file_client.get(path, client_key)))
+    return img.astype(np.float32) / 255.
+
+
 @DATASET_REGISTRY.register()
 class REDSDataset(data.Dataset):
     """REDS dataset for training.
@@ -44,6 +53,9 @@ class REDSDataset(data.Dataset):
         use_hflip (bool): Use horizontal flips.
         use_rot (bool): Use rotation (use vertical flip and transposing h and w for implementation).
         scale (bool): Scale, which will be added automatically.
+        frame_cache_mb (int, optional): Size in MB of the decoded-frame cache of each DataLoader worker.
+            Neighboring samples share most of their frames, see also the `clip_locality` option of
+            the train dataloader. Default: 0 (no cache).
     """
 
     def __init__(self, opt):
@@ -73,6 +85,7 @@ class REDSDataset(data.Dataset):
 
         # file client (io backend)
         self.file_client = None
+        self.frame_cache = None
         self.io_backend_opt = opt['io_backend']
         self.is_lmdb = False
         if self.io_backend_opt['type'] == 'lmdb':
@@ -95,6 +108,8 @@ class REDSDataset(data.Dataset):
     def __getitem__(self, index):
         if self.file_client is None:
             self.file_client = FileClient(self.io_backend_opt.pop('type'), **self.io_backend_opt)
+            if self.opt.get('frame_cache_mb'):
+                self.frame_cache = FrameCache(self.opt['frame_cache_mb'] * 1024**2)
 
         scale = self.opt['scale']
         gt_size = self.opt['gt_size']
@@ -126,8 +141,7 @@ class REDSDataset(data.Dataset):
             img_gt_path = f'{clip_name}/{frame_name}'
         else:
             img_gt_path = self.gt_root / clip_name / f'{frame_name}.png'
-        img_bytes = self.file_client.get(img_gt_path, 'gt')
-        img_gt = imfrombytes(img_bytes, float32=True)
+        img_gt = read_frame(self.file_client, img_gt_path, 'gt', self.frame_cache)
 
         # get the neighboring LQ frames
         img_lqs = []
@@ -136,8 +150,7 @@ class REDSDataset(data.Dataset):
                 img_lq_path = f'{clip_name}/{neighbor:08d}'
             else:
                 img_lq_path = self.lq_root / clip_name / f'{neighbor:08d}.png'
-            img_bytes = self.file_client.get(img_lq_path, 'lq')
-            img_lq = imfrombytes(img_bytes, float32=True)
+            img_lq = read_frame(self.file_client, img_lq_path, 'lq', self.frame_cache)
             img_lqs.append(img_lq)
 
         # get flows
@@ -149,7 +162,7 @@ class REDSDataset(data.Dataset):
                     flow_path = f'{clip_name}/{frame_name}_p{i}'
                 else:
                     flow_path = (self.flow_root / clip_name / f'{frame_name}_p{i}.png')
-                img_bytes = self.file_client.get(flow_path, 'flow')
+                img_bytes = self.file_client.get(flow_path, 'flow', flag='grayscale')
                 cat_flow = imfrombytes(img_bytes, flag='grayscale', float32=False)  # uint8, [0, 255]
                 dx, dy = np.split(cat_flow, 2, axis=0)
                 flow = dequantize_flow(dx, dy, max_val=20, denorm=False)  # we use max_val 20 here.
@@ -160,7 +173,7 @@ class REDSDataset(data.Dataset):
                     flow_path = f'{clip_name}/{frame_name}_n{i}'
                 else:
                     flow_path = (self.flow_root / clip_name / f'{frame_name}_n{i}.png')
-                img_bytes = self.file_client.get(flow_path, 'flow')
+                img_bytes = self.file_client.get(flow_path, 'flow', flag='grayscale')
                 cat_flow = imfrombytes(img_bytes, flag='grayscale', float32=False)  # uint8, [0, 255]
                 dx, dy = np.split(cat_flow, 2, axis=0)
                 flow = dequantize_flow(dx, dy, max_val=20, denorm=False)  # we use max_val 20 here.
@@ -239,6 +252,9 @@ class REDSRecurrentDataset(data.Dataset):
         use_hflip (bool): Use horizontal flips.
         use_rot (bool): Use rotation (use vertical flip and transposing h and w for implementation).
         scale (bool): Scale, which will be added automatically.
+        frame_cache_mb (int, optional): Size in MB of the decoded-frame cache of each DataLoader worker.
+            Neighboring samples share most of their frames, see also the `clip_locality` option of
+            the train dataloader. Default: 0 (no cache).
     """
 
     def __init__(self, opt):
@@ -268,6 +284,7 @@ class REDSRecurrentDataset(data.Dataset):
 
         # file client (io backend)
         self.file_client = None
+        self.frame_cache = None
         self.io_backend_opt = opt['io_backend']
         self.is_lmdb = False
         if self.io_backend_opt['type'] == 'lmdb':
@@ -290,6 +307,8 @@ class REDSRecurrentDataset(data.Dataset):
     def __getitem__(self, index):
         if self.file_client is None:
             self.file_client = FileClient(self.io_backend_opt.pop('type'), **self.io_backend_opt)
+            if self.opt.get('frame_cache_mb'):
+                self.frame_cache = FrameCache(self.opt['frame_cache_mb'] * 1024**2)
 
         scale = self.opt['scale']
         gt_size = self.opt['gt_size']
@@ -323,13 +342,11 @@ class REDSRecurrentDataset(data.Dataset):
                 img_gt_path = self.gt_root / clip_name / f'{neighbor:08d}.png'
 
             # get LQ
-            img_bytes = self.file_client.get(img_lq_path, 'lq')
-            img_lq = imfrombytes(img_bytes, float32=True)
+            img_lq = read_frame(self.file_client, img_lq_path, 'lq', self.frame_cache)
             img_lqs.append(img_lq)
 
             # get GT
-            img_bytes = self.file_client.get(img_gt_path, 'gt')
-            img_gt = imfrombytes(img_bytes, float32=True)
+            img_gt = read_frame(self.file_client, img_gt_path, 'gt', self.frame_cache)
             img_gts.append(img_gt)
 
         # randomly crop
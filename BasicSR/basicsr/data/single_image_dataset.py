@@ -3,7 +3,7 @@ from torch.utils import data as data
 from torchvision.transforms.functional import normalize
 
 from basicsr.data.data_util import paths_from_lmdb
-from basicsr.utils import FileClient, imfrombytes, img2tensor, rgb2ycbcr, scandir
+from basicsr.utils import FileClient, imfrombytes, img2tensor, rgb2ycbcr, scandir, scandir_cached
 from basicsr.utils.registry import DATASET_REGISTRY
 
 
@@ -22,6 +22,8 @@ class SingleImageDataset(data.Dataset):
             dataroot_lq (str): Data root path for lq.
             meta_info_file (str): Path for meta information file.
             io_backend (dict): IO backend type and other kwarg.
+            path_index_dir (str, optional): Folder to cache the scan of the folder mode (see `scandir_cached`).
+                Default: None.
     """
 
     def __init__(self, opt):
@@ -41,6 +43,8 @@ class SingleImageDataset(data.Dataset):
         elif 'meta_info_file' in self.opt:
             with open(self.opt['meta_info_file'], 'r') as fin:
                 self.paths = [osp.join(self.lq_folder, line.rstrip().split(' ')[0]) for line in fin]
+        elif opt.get('path_index_dir') is not None:
+            self.paths = sorted(scandir_cached(self.lq_folder, opt['path_index_dir'], full_path=True))
         else:
             self.paths = sorted(list(scandir(self.lq_folder, full_path=True)))
 
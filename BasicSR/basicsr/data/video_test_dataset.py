@@ -4,10 +4,29 @@ from os import path as osp
 from torch.utils import data as data
 
 from basicsr.data.data_util import duf_downsample, generate_frame_indices, read_img_seq
-from basicsr.utils import get_root_logger, scandir
+from basicsr.utils import get_root_logger, scandir, scandir_cached
 from basicsr.utils.registry import DATASET_REGISTRY
 
 
+def frames_by_subfolder(root, index_dir):
+    """Group the frames of a video dataroot by subfolder, from one cached scan.
+
+    Args:
+        root (str): Dataroot with one subfolder per clip.
+        index_dir (str): Folder to save the index files of `scandir_cached`.
+
+    Returns:
+        dict[str, list[str]]: subfolder name -> sorted frame names.
+    """
+    frames = {}
+    for path in scandir_cached(root, index_dir, recursive=True):
+        subfolder, name = osp.split(path)
+        # only the files directly in the (non-hidden) subfolders, like the glob and scandir of the folder mode
+        if subfolder and osp.dirname(subfolder) == '' and not subfolder.startswith('.'):
+            frames.setdefault(subfolder, []).append(name)
+    return {subfolder: sorted(names) for subfolder, names in frames.items()}
+
+
 @DATASET_REGISTRY.register()
 class VideoTestDataset(data.Dataset):
     """Video test dataset.
@@ -41,6 +60,8 @@ class VideoTestDataset(data.Dataset):
             in the dataroot will be used.
         num_frame (int): Window size for input frames.
         padding (str): Padding mode.
+        path_index_dir (str, optional): Folder to cache the scans of the dataroots (see `scandir_cached`), instead of
+            listing every subfolder. Default: None.
     """
 
     def __init__(self, opt):
@@ -57,11 +78,18 @@ class VideoTestDataset(data.Dataset):
         logger = get_root_logger()
         logger.info(f'Generate data info for VideoTestDataset - {opt["name"]}')
         self.imgs_lq, self.imgs_gt = {}, {}
+        index_dir = opt.get('path_index_dir')
+        if index_dir is not None:
+            frames_lq = frames_by_subfolder(self.lq_root, index_dir)
+            frames_gt = frames_by_subfolder(self.gt_root, index_dir)
         if 'meta_info_file' in opt:
             with open(opt['meta_info_file'], 'r') as fin:
                 subfolders = [line.split(' ')[0] for line in fin]
                 subfolders_lq = [osp.join(self.lq_root, key) for key in subfolders]
                 subfolders_gt = [osp.join(self.gt_root, key) for key in subfolders]
+        elif index_dir is not None:
+            subfolders_lq = sorted(osp.join(self.lq_root, key) for key in frames_lq)
+            subfolders_gt = sorted(osp.join(self.gt_root, key) for key in frames_gt)
         else:
             subfolders_lq = sorted(glob.glob(osp.join(self.lq_root, '*')))
             subfolders_gt = sorted(glob.glob(osp.join(self.gt_root, '*')))
@@ -70,8 +98,18 @@ class VideoTestDataset(data.Dataset):
             for subfolder_lq, subfolder_gt in zip(subfolders_lq, subfolders_gt):
                 # get frame list for lq and gt
                 subfolder_name = osp.basename(subfolder_lq)
-                img_paths_lq = sorted(list(scandir(subfolder_lq, full_path=True)))
-                img_paths_gt = sorted(list(scandir(subfolder_gt, full_path=True)))
+                if index_dir is not None:
+                    img_paths_lq = [
+                        osp.join(subfolder_lq, name)
+                        for name in frames_lq.get(osp.relpath(subfolder_lq, self.lq_root), [])
+                    ]
+                    img_paths_gt = [
+                        osp.join(subfolder_gt, name)
+                        for name in frames_gt.get(osp.relpath(subfolder_gt, self.gt_root), [])
+                    ]
+                else:
+                    img_paths_lq = sorted(list(scandir(subfolder_lq, full_path=True)))
+                    img_paths_gt = sorted(list(scandir(subfolder_gt, full_path=True)))
 
                 max_idx = len(img_paths_lq)
                 assert max_idx == len(img_paths_gt), (f'Different number of images in lq ({max_idx})'
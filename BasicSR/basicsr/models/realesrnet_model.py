@@ -4,9 +4,10 @@ import torch
 from torch.nn import functional as F
 
 from basicsr.data.degradations import random_add_gaussian_noise_pt, random_add_poisson_noise_pt
+from basicsr.data.realesrgan_dataset import random_realesrgan_kernels_pt
 from basicsr.data.transforms import paired_random_crop
 from basicsr.models.sr_model import SRModel
-from basicsr.utils import DiffJPEG, USMSharp
+from basicsr.utils import DiffJPEG, TrainingPairPool, USMSharp
 from basicsr.utils.img_process_util import filter2D
 from basicsr.utils.registry import MODEL_REGISTRY
 
@@ -23,9 +24,10 @@ class RealESRNetModel(SRModel):
 
     def __init__(self, opt):
         super(RealESRNetModel, self).__init__(opt)
-        self.jpeger = DiffJPEG(differentiable=False).cuda()  # simulate JPEG compression artifacts
-        self.usm_sharpener = USMSharp().cuda()  # do usm sharpening
+        self.jpeger = DiffJPEG(differentiable=False).to(self.device)  # simulate JPEG compression artifacts
+        self.usm_sharpener = USMSharp().to(self.device)  # do usm sharpening
         self.queue_size = opt.get('queue_size', 180)
+        self.pair_pool = TrainingPairPool(self.queue_size, pin_memory=opt.get('queue_pin_memory', False))
 
     @torch.no_grad()
     def _dequeue_and_enqueue(self):
@@ -33,36 +35,10 @@ class RealESRNetModel(SRModel):
 
         Batch processing limits the diversity of synthetic degradations in a batch. For example, samples in a
         batch could not have different resize scaling factors. Therefore, we employ this training pair pool
-        to increase the degradation diversity in a batch.
+        to increase the degradation diversity in a batch. The pool lives on the training device, or in pinned
+        host memory with the ``queue_pin_memory`` option.
         """
-        # initialize
-        b, c, h, w = self.lq.size()
-        if not hasattr(self, 'queue_lr'):
-            assert self.queue_size % b == 0, f'queue size {self.queue_size} should be divisible by batch size {b}'
-            self.queue_lr = torch.zeros(self.queue_size, c, h, w).cuda()
-            _, c, h, w = self.gt.size()
-            self.queue_gt = torch.zeros(self.queue_size, c, h, w).cuda()
-            self.queue_ptr = 0
-        if self.queue_ptr == self.queue_size:  # the pool is full
-            # do dequeue and enqueue
-            # shuffle
-            idx = torch.randperm(self.queue_size)
-            self.queue_lr = self.queue_lr[idx]
-            self.queue_gt = self.queue_gt[idx]
-            # get first b samples
-            lq_dequeue = self.queue_lr[0:b, :, :, :].clone()
-            gt_dequeue = self.queue_gt[0:b, :, :, :].clone()
-            # update the queue
-            self.queue_lr[0:b, :, :, :] = self.lq.clone()
-            self.queue_gt[0:b, :, :, :] = self.gt.clone()
-
-            self.lq = lq_dequeue
-            self.gt = gt_dequeue
-        else:
-            # only do enqueue
-            self.queue_lr[self.queue_ptr:self.queue_ptr + b, :, :, :] = self.lq.clone()
-            self.queue_gt[self.queue_ptr:self.queue_ptr + b, :, :, :] = self.gt.clone()
-            self.queue_ptr = self.queue_ptr + b
+        self.lq, self.gt = self.pair_pool.dequeue_and_enqueue(self.lq, self.gt)
 
     @torch.no_grad()
     def feed_data(self, data):
@@ -75,9 +51,16 @@ class RealESRNetModel(SRModel):
             if self.opt['gt_usm'] is True:
                 self.gt = self.usm_sharpener(self.gt)
 
-            self.kernel1 = data['kernel1'].to(self.device)
-            self.kernel2 = data['kernel2'].to(self.device)
-            self.sinc_kernel = data['sinc_kernel'].to(self.device)
+            if 'kernel1' in data:
+                self.kernel1 = data['kernel1'].to(self.device)
+                self.kernel2 = data['kernel2'].to(self.device)
+                self.sinc_kernel = data['sinc_kernel'].to(self.device)
+            else:
+                # kernels_on_device: draw the kernels of the whole batch here instead of in the dataloader workers
+                kernels = random_realesrgan_kernels_pt(self.opt['datasets']['train'], self.gt.size(0), self.device)
+                self.kernel1 = kernels['kernel1']
+                self.kernel2 = kernels['kernel2']
+                self.sinc_kernel = kernels['sinc_kernel']
 
             ori_h, ori_w = self.gt.size()[2:4]
 
@@ -4,6 +4,7 @@ from os import path as osp
 from tqdm import tqdm
 
 from basicsr.archs import build_network
+from basicsr.archs.arch_util import tile_forward
 from basicsr.losses import build_loss
 from basicsr.metrics import calculate_metric
 from basicsr.utils import get_root_logger, imwrite, tensor2img
@@ -118,15 +119,26 @@ class SRModel(BaseModel):
         if self.ema_decay > 0:
             self.model_ema(decay=self.ema_decay)
 
+    def net_forward(self, net, img, **kwargs):
+        """Forward for testing. Use tiled inference when `tile` is set in the val options.
+
+        Tile options: tile_size, tile_overlap (default: 32), blend ('feather' | 'linear', default: 'feather').
+        """
+        tile_opt = self.opt.get('val', {}).get('tile')
+        if tile_opt is None:
+            return net(img)
+        tile_opt = dict(tile_opt, **kwargs)
+        return tile_forward(net, img, scale=self.opt.get('scale'), **tile_opt)
+
     def test(self):
         if hasattr(self, 'net_g_ema'):
             self.net_g_ema.eval()
             with torch.no_grad():
-                self.output = self.net_g_ema(self.lq)
+                self.output = self.net_forward(self.net_g_ema, self.lq)
         else:
             self.net_g.eval()
             with torch.no_grad():
-                self.output = self.net_g(self.lq)
+                self.output = self.net_forward(self.net_g, self.lq)
             self.net_g.train()
 
     def test_selfensemble(self):
@@ -1,6 +1,4 @@
-import torch
-from torch.nn import functional as F
-
+from basicsr.archs.arch_util import pad_to_window
 from basicsr.utils.registry import MODEL_REGISTRY
 from .sr_model import SRModel
 
@@ -8,26 +6,15 @@ from .sr_model import SRModel
 @MODEL_REGISTRY.register()
 class SwinIRModel(SRModel):
 
-    def test(self):
-        # pad to multiplication of window_size
+    def net_forward(self, net, img, **kwargs):
         window_size = self.opt['network_g']['window_size']
-        scale = self.opt.get('scale', 1)
-        mod_pad_h, mod_pad_w = 0, 0
-        _, _, h, w = self.lq.size()
-        if h % window_size != 0:
-            mod_pad_h = window_size - h % window_size
-        if w % window_size != 0:
-            mod_pad_w = window_size - w % window_size
-        img = F.pad(self.lq, (0, mod_pad_w, 0, mod_pad_h), 'reflect')
-        if hasattr(self, 'net_g_ema'):
-            self.net_g_ema.eval()
-            with torch.no_grad():
-                self.output = self.net_g_ema(img)
-        else:
-            self.net_g.eval()
-            with torch.no_grad():
-                self.output = self.net_g(img)
-            self.net_g.train()
+        if self.opt.get('val', {}).get('tile') is not None:
+            # tiled inference pads every tile to multiplication of window_size
+            return super(SwinIRModel, self).net_forward(net, img, window_size=window_size, **kwargs)
 
-        _, _, h, w = self.output.size()
-        self.output = self.output[:, :, 0:h - mod_pad_h * scale, 0:w - mod_pad_w * scale]
+        # pad to multiplication of window_size
+        scale = self.opt.get('scale', 1)
+        img, mod_pad_h, mod_pad_w = pad_to_window(img, window_size)
+        output = net(img)
+        _, _, h, w = output.size()
+        return output[:, :, 0:h - mod_pad_h * scale, 0:w - mod_pad_w * scale]
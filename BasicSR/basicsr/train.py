@@ -6,8 +6,8 @@ import torch
 from os import path as osp
 
 from basicsr.data import build_dataloader, build_dataset
-from basicsr.data.data_sampler import EnlargedSampler
-from basicsr.data.prefetch_dataloader import CPUPrefetcher, CUDAPrefetcher
+from basicsr.data.data_sampler import ClipLocalitySampler, EnlargedSampler
+from basicsr.data.prefetch_dataloader import CPUPrefetcher, CUDAPrefetcher, PinnedPrefetcher
 from basicsr.models import build_model
 from basicsr.utils import (AvgTimer, MessageLogger, check_resume, get_env_info, get_root_logger, get_time_str,
                            init_tb_logger, init_wandb_logger, make_exp_dirs, mkdir_and_rename, scandir)
@@ -33,7 +33,19 @@ def create_train_val_dataloader(opt, logger):
         if phase == 'train':
             dataset_enlarge_ratio = dataset_opt.get('dataset_enlarge_ratio', 1)
             train_set = build_dataset(dataset_opt)
-            train_sampler = EnlargedSampler(train_set, opt['world_size'], opt['rank'], dataset_enlarge_ratio)
+            if dataset_opt.get('clip_locality'):
+                # keep neighboring frames on the same dataloader worker, for the frame cache of video datasets
+                multiplier = 1 if opt['dist'] else max(1, opt['num_gpu'])
+                train_sampler = ClipLocalitySampler(
+                    train_set,
+                    opt['world_size'],
+                    opt['rank'],
+                    dataset_enlarge_ratio,
+                    num_workers=dataset_opt['num_worker_per_gpu'] * multiplier,
+                    batch_size=dataset_opt['batch_size_per_gpu'] * multiplier,
+                    chunk_size=dataset_opt['clip_locality'])
+            else:
+                train_sampler = EnlargedSampler(train_set, opt['world_size'], opt['rank'], dataset_enlarge_ratio)
             train_loader = build_dataloader(
                 train_set,
                 dataset_opt,
@@ -143,8 +155,12 @@ def train_pipeline(root_path):
         logger.info(f'Use {prefetch_mode} prefetch dataloader')
         if opt['datasets']['train'].get('pin_memory') is not True:
             raise ValueError('Please set pin_memory=True for CUDAPrefetcher.')
+    elif prefetch_mode == 'pinned':
+        num_prefetch_queue = opt['datasets']['train'].get('num_prefetch_queue', 2)
+        prefetcher = PinnedPrefetcher(train_loader, opt, num_prefetch_queue=num_prefetch_queue)
+        logger.info(f'Use {prefetch_mode} prefetch dataloader: num_prefetch_queue = {num_prefetch_queue}')
     else:
-        raise ValueError(f"Wrong prefetch_mode {prefetch_mode}. Supported ones are: None, 'cuda', 'cpu'.")
+        raise ValueError(f"Wrong prefetch_mode {prefetch_mode}. Supported ones are: None, 'cuda', 'cpu', 'pinned'.")
 
     # training
     logger.info(f'Start training from epoch: {start_epoch}, iter: {current_iter}')
@@ -177,6 +193,8 @@ def train_pipeline(root_path):
                 log_vars = {'epoch': epoch, 'iter': current_iter}
                 log_vars.update({'lrs': model.get_current_learning_rate()})
                 log_vars.update({'time': iter_timer.get_avg_time(), 'data_time': data_timer.get_avg_time()})
+                if isinstance(prefetcher, PinnedPrefetcher):
+                    log_vars.update(prefetcher.get_stats())
                 log_vars.update(model.get_current_log())
                 msg_logger(log_vars)
 
@@ -198,6 +216,8 @@ def train_pipeline(root_path):
         # end of iter
 
     # end of epoch
+    if isinstance(prefetcher, PinnedPrefetcher):
+        prefetcher.close()
 
     consumed_time = str(datetime.timedelta(seconds=int(time.time() - start_time)))
     logger.info(f'End of training. Time consumed: {consumed_time}')
@@ -1,10 +1,11 @@
 from .color_util import bgr2ycbcr, rgb2ycbcr, rgb2ycbcr_pt, ycbcr2bgr, ycbcr2rgb
 from .diffjpeg import DiffJPEG
 from .file_client import FileClient
-from .img_process_util import USMSharp, usm_sharp
-from .img_util import crop_border, imfrombytes, img2tensor, imwrite, tensor2img
+from .img_process_util import TrainingPairPool, USMSharp, usm_sharp
+from .img_util import crop_border, imfrombytes, imfrombytes_for_crop, img2tensor, imwrite, tensor2img
 from .logger import AvgTimer, MessageLogger, get_env_info, get_root_logger, init_tb_logger, init_wandb_logger
-from .misc import check_resume, get_time_str, make_exp_dirs, mkdir_and_rename, scandir, set_random_seed, sizeof_fmt
+from .misc import (check_resume, get_time_str, make_exp_dirs, mkdir_and_rename, scandir, scandir_cached,
+                   set_random_seed, sizeof_fmt)
 from .options import yaml_load
 
 __all__ = [
@@ -20,6 +21,7 @@ __all__ = [
     'img2tensor',
     'tensor2img',
     'imfrombytes',
+    'imfrombytes_for_crop',
     'imwrite',
     'crop_border',
     # logger.py
@@ -35,6 +37,7 @@ __all__ = [
     'mkdir_and_rename',
     'make_exp_dirs',
     'scandir',
+    'scandir_cached',
     'check_resume',
     'sizeof_fmt',
     # diffjpeg
@@ -42,6 +45,7 @@ __all__ = [
     # img_process_util
     'USMSharp',
     'usm_sharp',
+    'TrainingPairPool',
     # options
     'yaml_load'
 ]
@@ -1,5 +1,11 @@
 # Modified from https://github.com/open-mmlab/mmcv/blob/master/mmcv/fileio/file_client.py  # noqa: E501
+import cv2
+import hashlib
+import numpy as np
+import os
+import time
 from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
 
 
 class BaseStorageBackend(metaclass=ABCMeta):
@@ -85,15 +91,31 @@ class LmdbBackend(BaseStorageBackend):
             disable the OS filesystem readahead mechanism, which may improve
             random read performance when a database is larger than RAM.
             Default: False.
+        persistent_txn (bool, optional): If True, keep one read transaction
+            per lmdb env open for the lifetime of the backend, instead of
+            beginning a new one for every key. Default: False.
+        zero_copy (bool, optional): If True, return `memoryview` objects that
+            point directly into the lmdb memory map instead of copied bytes.
+            It implies `persistent_txn`, since a view is only valid while its
+            transaction is open. Views can be passed to `imfrombytes` as is,
+            but must not be kept after the backend is closed. Default: False.
 
     Attributes:
         db_paths (list): Lmdb database path.
-        _client (list): A list of several lmdb envs.
+        _client (dict): The lmdb envs (one per shard) of each client key.
     """
 
-    def __init__(self, db_paths, client_keys='default', readonly=True, lock=False, readahead=False, **kwargs):
+    def __init__(self,
+                 db_paths,
+                 client_keys='default',
+                 readonly=True,
+                 lock=False,
+                 readahead=False,
+                 persistent_txn=False,
+                 zero_copy=False,
+                 **kwargs):
         try:
-            import lmdb
+            import lmdb  # noqa: F401
         except ImportError:
             raise ImportError('Please install lmdb to enable LmdbBackend.')
 
@@ -107,9 +129,63 @@ class LmdbBackend(BaseStorageBackend):
         assert len(client_keys) == len(self.db_paths), ('client_keys and db_paths should have the same length, '
                                                         f'but received {len(client_keys)} and {len(self.db_paths)}.')
 
+        self.client_keys = client_keys
+        self.persistent_txn = persistent_txn or zero_copy
+        self.zero_copy = zero_copy
+        self._env_kwargs = dict(readonly=readonly, lock=lock, readahead=readahead, **kwargs)
+        self._open()
+
+    def _open(self):
+        """Open the lmdb envs in the current process.
+
+        Lmdb envs and transactions must not be used across fork, so they are
+        reopened lazily when the backend is first used in a new process (e.g.,
+        a DataLoader worker).
+
+        Lmdb made by `make_sharded_lmdb_from_imgs` with several shards have
+        one env per shard.
+        """
+        import lmdb
+        from basicsr.utils.lmdb_util import read_lmdb_shard_info
+        self._pid = os.getpid()
         self._client = {}
-        for client, path in zip(client_keys, self.db_paths):
-            self._client[client] = lmdb.open(path, readonly=readonly, lock=lock, readahead=readahead, **kwargs)
+        self._txns = {}
+        for client, path in zip(self.client_keys, self.db_paths):
+            num_shards = read_lmdb_shard_info(path)
+            if num_shards > 1:
+                shard_paths = [os.path.join(path, f'shard_{i:03d}') for i in range(num_shards)]
+            else:
+                shard_paths = [path]
+            self._client[client] = [lmdb.open(shard_path, **self._env_kwargs) for shard_path in shard_paths]
+
+    def _get_txn(self, client_key, shard):
+        txn = self._txns.get((client_key, shard))
+        if txn is None:
+            txn = self._client[client_key][shard].begin(write=False, buffers=self.zero_copy)
+            self._txns[(client_key, shard)] = txn
+        return txn
+
+    def _get_values(self, keys, client_key):
+        """Read byte keys from one lmdb, in sorted key order within each of its shards."""
+        from basicsr.utils.lmdb_util import lmdb_shard_index
+        if os.getpid() != self._pid:
+            self._open()
+        envs = self._client[client_key]
+        shards = {}
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            shards.setdefault(lmdb_shard_index(keys[i], len(envs)), []).append(i)
+
+        values = [None] * len(keys)
+        for shard, indices in shards.items():
+            if self.persistent_txn:
+                txn = self._get_txn(client_key, shard)
+                for i in indices:
+                    values[i] = txn.get(keys[i])
+            else:
+                with envs[shard].begin(write=False) as txn:
+                    for i in indices:
+                        values[i] = txn.get(keys[i])
+        return values
 
     def get(self, filepath, client_key):
         """Get values according to the filepath from one lmdb named client_key.
@@ -120,15 +196,354 @@ class LmdbBackend(BaseStorageBackend):
         """
         filepath = str(filepath)
         assert client_key in self._client, (f'client_key {client_key} is not in lmdb clients.')
-        client = self._client[client_key]
-        with client.begin(write=False) as txn:
-            value_buf = txn.get(filepath.encode('ascii'))
-        return value_buf
+        return self._get_values([filepath.encode('ascii')], client_key)[0]
+
+    def get_many(self, filepaths, client_key):
+        """Get the values of several keys from one lmdb within a single transaction (per shard).
+
+        Keys are looked up in sorted order, which walks the B-tree (and the
+        memory map) sequentially, but the values are returned in the order of
+        `filepaths`.
+
+        Args:
+            filepaths (list[str | obj:`Path`]): The lmdb keys.
+            client_key (str): Used for distinguishing different lmdb envs.
+
+        Returns:
+            list: The values, None for missing keys.
+        """
+        assert client_key in self._client, (f'client_key {client_key} is not in lmdb clients.')
+        return self._get_values([str(filepath).encode('ascii') for filepath in filepaths], client_key)
+
+    def close(self):
+        """Abort the open read transactions and close the lmdb envs."""
+        for txn in self._txns.values():
+            txn.abort()
+        self._txns = {}
+        for envs in self._client.values():
+            for env in envs:
+                env.close()
+        self._client = {}
+
+    def __getstate__(self):
+        # envs and transactions are process-local, reopen them after unpickling (e.g., spawned DataLoader workers)
+        state = self.__dict__.copy()
+        state['_client'] = None
+        state['_txns'] = None
+        state['_pid'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
 
     def get_text(self, filepath):
         raise NotImplementedError
 
 
+class ShardBackend(BaseStorageBackend):
+    """Memory-mapped shards of decoded images.
+
+    The shards are made by `basicsr.utils.shard_util.make_shards_from_imgs`.
+    `get()` returns a read-only uint8 HWC array that is a view into the
+    memory-mapped shard, so there is neither decoding nor copying. It can be
+    passed to `imfrombytes` like the bytes from the other backends.
+
+    Args:
+        db_paths (str | list[str]): Shard folder paths.
+        client_keys (str | list[str]): Client keys. Default: 'default'.
+    """
+
+    def __init__(self, db_paths, client_keys='default'):
+        from basicsr.utils.shard_util import read_shard_meta_info
+
+        if isinstance(client_keys, str):
+            client_keys = [client_keys]
+        if isinstance(db_paths, str):
+            db_paths = [db_paths]
+        self.db_paths = [str(v) for v in db_paths]
+        assert len(client_keys) == len(self.db_paths), ('client_keys and db_paths should have the same length, '
+                                                        f'but received {len(client_keys)} and {len(self.db_paths)}.')
+
+        self.client_keys = client_keys
+        self._index = {client: read_shard_meta_info(path) for client, path in zip(client_keys, self.db_paths)}
+        self._shards = None
+
+    def _open(self):
+        """Map the shards lazily, so the maps are created in the process using them."""
+        self._pid = os.getpid()
+        self._shards = {}
+        for client, path in zip(self.client_keys, self.db_paths):
+            num_shards = max(shard_idx for shard_idx, _, _ in self._index[client].values()) + 1
+            shard_paths = [os.path.join(path, f'shard_{i:05d}.bin') for i in range(num_shards)]
+            self._shards[client] = [np.memmap(shard_path, dtype=np.uint8, mode='r') for shard_path in shard_paths]
+
+    def get(self, filepath, client_key):
+        """Get the decoded image of a key from the shards named client_key.
+
+        Args:
+            filepath (str | obj:`Path`): Here, filepath is the key.
+            client_key (str): Used for distinguishing different shard folders.
+        """
+        if self._shards is None or os.getpid() != self._pid:
+            self._open()
+        assert client_key in self._index, (f'client_key {client_key} is not in shard clients.')
+        shard_idx, offset, (h, w, c) = self._index[client_key][str(filepath)]
+        return self._shards[client_key][shard_idx][offset:offset + h * w * c].reshape(h, w, c)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shards'] = None
+        return state
+
+    def get_text(self, filepath):
+        raise NotImplementedError
+
+
+class SharedMemoryCacheBackend(BaseStorageBackend):
+    """Node-wide cache of decoded images in shared memory, wrapping another backend.
+
+    Images read from the wrapped backend are decoded once and stored as raw
+    uint8 HWC arrays in a tmpfs folder (POSIX shared memory, `/dev/shm` by
+    default), so all the DataLoader workers (and all the jobs) on a node
+    share one decoded copy. `get()` returns the decoded array as a read-only
+    memory-mapped view, which can be passed to `imfrombytes` like bytes.
+    Images are decoded with the `flag` of the caller (e.g., `cv2.IMREAD_COLOR`
+    applies the EXIF orientation, `cv2.IMREAD_GRAYSCALE` the libpng
+    conversion) and cached separately for each flag, so that they are
+    identical to the uncached ones. Entries are keyed by the mtime and size
+    of their source file (or database), so that a changed file is decoded
+    again. If the shared memory is full, images are returned uncached.
+
+    The cache is bounded by `max_size_mb`. An index of the entries with their
+    size and last access time lives in a memory-mapped file in the same
+    folder, and the least recently used entries are evicted when a new image
+    does not fit. Writers are serialized with a file lock, while readers
+    never lock: entries are renamed into place once complete, and unlinking
+    an entry does not affect a reader that already opened it. If a writer
+    crashed between writing an entry and updating the index, the two are
+    made consistent again when a process opens the cache.
+
+    The cached files outlive the training processes, so that the following
+    epochs and jobs can reuse them. Call `clear()` to remove them.
+
+    Args:
+        backend (:obj:`BaseStorageBackend`): The wrapped backend.
+        max_size_mb (float): Maximum size of the cache in MB. Default: 4096.
+        max_entries (int): Maximum number of images in the cache. Default: 65536.
+        namespace (str): Prefix of the cache files. Jobs using the same
+            namespace share the cache. Default: 'basicsr'.
+        shm_dir (str): A tmpfs folder for the cache files. Default: '/dev/shm'.
+    """
+
+    _index_dtype = [('key', '<u8'), ('nbytes', '<i8'), ('atime', '<f8')]
+
+    def __init__(self, backend, max_size_mb=4096, max_entries=65536, namespace='basicsr', shm_dir='/dev/shm'):
+        try:
+            import fcntl  # noqa: F401
+        except ImportError:
+            raise ImportError('SharedMemoryCacheBackend is only supported on POSIX systems.')
+        if not os.path.isdir(shm_dir):
+            raise ValueError(f'Shared memory folder {shm_dir} does not exist.')
+
+        self.backend = backend
+        self.max_bytes = int(max_size_mb * 1024**2)
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.shm_dir = shm_dir
+        # keys of lmdb and shards are only unique within a database, so prefix them with its path
+        self._roots = {}
+        if hasattr(backend, 'db_paths') and hasattr(backend, 'client_keys'):
+            self._roots = {k: os.path.abspath(v) for k, v in zip(backend.client_keys, backend.db_paths)}
+        # the cache outlives the jobs, so the entries are keyed by the version of their source as well
+        self._root_versions = {k: self._folder_version(v) for k, v in self._roots.items()}
+        self._pid = None
+
+    @staticmethod
+    def _folder_version(folder):
+        """The latest mtime and the total size of the files of a database folder (lmdb, shards)."""
+        stats = [entry.stat() for entry in os.scandir(folder) if entry.is_file()]
+        return f'{max((st.st_mtime_ns for st in stats), default=0)}:{sum(st.st_size for st in stats)}'
+
+    def _open(self):
+        """Open the index in the current process.
+
+        File locks are shared by forked processes, so every process opens its own.
+        """
+        self._pid = os.getpid()
+        index_path = os.path.join(self.shm_dir, f'{self.namespace}_index')
+        self._index_file = open(index_path, 'a+b')
+        itemsize = np.dtype(self._index_dtype).itemsize
+        with self._locked():
+            if os.path.getsize(index_path) == 0:
+                self._index_file.truncate(itemsize * self.max_entries)
+            self._index = np.memmap(index_path, dtype=self._index_dtype, mode='r+')
+            self._remove_orphans()
+
+    def _remove_orphans(self):
+        """Make the entry files and the index agree after a crash between writing a file and updating the index.
+
+        Files that are not in the index are removed, and index entries without a file are dropped. Must be called
+        with the lock held.
+        """
+        names = set(os.listdir(self.shm_dir))
+        keys = set()
+        for slot in np.flatnonzero(self._index['key'] != 0):
+            name = f'{self.namespace}_{int(self._index["key"][slot]):016x}'
+            if name in names:
+                keys.add(name)
+            else:
+                self._index[slot] = (0, 0, 0.)
+        for name in names:
+            if name.startswith(f'{self.namespace}_') and name != f'{self.namespace}_index' and name not in keys:
+                try:
+                    os.remove(os.path.join(self.shm_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    @contextmanager
+    def _locked(self):
+        import fcntl
+        fcntl.flock(self._index_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._index_file, fcntl.LOCK_UN)
+
+    def _entry(self, filepath, client_key, flag):
+        root = self._roots.get(client_key, '')
+        if root:
+            name = f'{root}:{filepath}:{self._root_versions[client_key]}'
+        else:
+            name = os.path.abspath(str(filepath))
+            try:
+                st = os.stat(name)
+                name = f'{name}:{st.st_mtime_ns}:{st.st_size}'
+            except OSError:
+                # not a local file, e.g., a memcached key
+                pass
+        # the images are decoded with the flag of the caller
+        name = f'{name}:{flag}'
+        key = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'little') or 1
+        return key, os.path.join(self.shm_dir, f'{self.namespace}_{key:016x}')
+
+    def _read(self, key, entry_path):
+        try:
+            with open(entry_path, 'rb') as f:
+                h, w, c, _ = np.fromfile(f, np.int32, 4)
+                # mapped rather than read, so that a crop only touches its own pages
+                img = np.memmap(f, dtype=np.uint8, mode='r', offset=16, shape=(h, w, c))
+        except FileNotFoundError:
+            return None
+        slots = np.flatnonzero(self._index['key'] == key)
+        if slots.size > 0:
+            self._index['atime'][slots[0]] = time.time()
+        return img
+
+    def _write(self, key, entry_path, img):
+        nbytes = img.nbytes + 16
+        if nbytes > self.max_bytes:
+            return
+        with self._locked():
+            index = self._index
+            if np.any(index['key'] == key):
+                # another process has just cached it
+                return
+            used = index['key'] != 0
+            total = int(index['nbytes'][used].sum())
+            # evict the least recently used entries until the image fits
+            while total + nbytes > self.max_bytes or used.all():
+                slot = np.flatnonzero(used)[np.argmin(index['atime'][used])]
+                try:
+                    os.remove(os.path.join(self.shm_dir, f'{self.namespace}_{int(index["key"][slot]):016x}'))
+                except FileNotFoundError:
+                    pass
+                total -= int(index['nbytes'][slot])
+                index[slot] = (0, 0, 0.)
+                used[slot] = False
+
+            tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    np.array([*img.shape, 0], dtype=np.int32).tofile(f)
+                    np.ascontiguousarray(img).tofile(f)
+                os.replace(tmp_path, entry_path)
+            except OSError as error:
+                # e.g., the shared memory is full (ENOSPC): leave the image uncached
+                from basicsr.utils.logger import get_root_logger
+                get_root_logger().warning(f'Failed to cache {entry_path} in shared memory: {error}')
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                return
+            index[np.flatnonzero(~used)[0]] = (key, nbytes, time.time())
+
+    def get(self, filepath, client_key=None, flag='color'):
+        """Get the decoded image of a file, from the cache if possible.
+
+        Args:
+            filepath (str | obj:`Path`): The path or the key in the wrapped backend.
+            client_key (str | None): The client_key for lmdb and shards. Default: None.
+            flag (str): The flag the image is passed to `imfrombytes` with.
+                The image is decoded with it, and cached separately for
+                each flag. Default: 'color'.
+        """
+        if self._pid != os.getpid():
+            self._open()
+        key, entry_path = self._entry(filepath, client_key, flag)
+        img = self._read(key, entry_path)
+        if img is not None:
+            return img
+
+        value = self.backend.get(filepath) if client_key is None else self.backend.get(filepath, client_key)
+        if isinstance(value, np.ndarray) and value.ndim == 3:
+            img = value
+        else:
+            imread_flags = {
+                'color': cv2.IMREAD_COLOR,
+                'grayscale': cv2.IMREAD_GRAYSCALE,
+                'unchanged': cv2.IMREAD_UNCHANGED
+            }
+            img = cv2.imdecode(np.frombuffer(value, np.uint8), imread_flags[flag])
+            if img is None or img.dtype != np.uint8:
+                # not an 8-bit image, leave it to the caller
+                return value
+            if img.ndim == 2:
+                img = img[..., None]
+        self._write(key, entry_path, img)
+        return img
+
+    def get_many(self, filepaths, client_key=None, flag='color'):
+        return [self.get(filepath, client_key, flag) for filepath in filepaths]
+
+    def clear(self):
+        """Remove all the cached images of the namespace and the index.
+
+        The cache must not be in use by other processes. It is created again
+        by the next `get()`.
+        """
+        if self._pid != os.getpid():
+            self._open()
+        with self._locked():
+            for name in os.listdir(self.shm_dir):
+                if name.startswith(f'{self.namespace}_'):
+                    os.remove(os.path.join(self.shm_dir, name))
+        del self._index
+        self._index_file.close()
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in ('_index', '_index_file'):
+            state.pop(attr, None)
+        state['_pid'] = None
+        return state
+
+    def get_text(self, filepath):
+        return self.backend.get_text(filepath)
+
+
 class FileClient(object):
     """A general file client to access files in different backend.
 
@@ -136,9 +551,15 @@ class FileClient(object):
     and return it as a binary file. it can also register other backend
     accessor with a given name and backend class.
 
-    Attributes:
+    Args:
         backend (str): The storage backend type. Options are "disk",
-            "memcached" and "lmdb".
+            "memcached", "lmdb" and "shards".
+        shm_cache (dict | bool | None): If set, cache the decoded images in
+            shared memory, see :class:`SharedMemoryCacheBackend` for the
+            options. True uses the default options. Default: None.
+
+    Attributes:
+        backend (str): The storage backend type.
         client (:obj:`BaseStorageBackend`): The backend object.
     """
 
@@ -146,22 +567,42 @@ class FileClient(object):
         'disk': HardDiskBackend,
         'memcached': MemcachedBackend,
         'lmdb': LmdbBackend,
+        'shards': ShardBackend,
     }
 
-    def __init__(self, backend='disk', **kwargs):
+    def __init__(self, backend='disk', shm_cache=None, **kwargs):
         if backend not in self._backends:
             raise ValueError(f'Backend {backend} is not supported. Currently supported ones'
                              f' are {list(self._backends.keys())}')
         self.backend = backend
         self.client = self._backends[backend](**kwargs)
+        self.shm_cache = bool(shm_cache)
+        if shm_cache:
+            self.client = SharedMemoryCacheBackend(self.client, **(shm_cache if isinstance(shm_cache, dict) else {}))
+
+    def get(self, filepath, client_key='default', flag='color'):
+        # client_key is used only for lmdb and shards, where different
+        # fileclients have different lmdb environments / shard folders.
+        # flag is the one the value is passed to imfrombytes with. It is only
+        # used by the shm cache, which decodes the images itself.
+        kwargs = {'flag': flag} if self.shm_cache else {}
+        if self.backend in ('lmdb', 'shards'):
+            return self.client.get(filepath, client_key, **kwargs)
+        else:
+            return self.client.get(filepath, **kwargs)
 
-    def get(self, filepath, client_key='default'):
-        # client_key is used only for lmdb, where different fileclients have
-        # different lmdb environments.
+    def get_many(self, filepaths, client_key='default', flag='color'):
+        """Get the values of several files at once.
+
+        For lmdb, all the keys are read within a single transaction.
+        """
+        kwargs = {'flag': flag} if self.shm_cache else {}
         if self.backend == 'lmdb':
-            return self.client.get(filepath, client_key)
+            return self.client.get_many(filepaths, client_key, **kwargs)
+        elif self.backend == 'shards':
+            return [self.client.get(filepath, client_key, **kwargs) for filepath in filepaths]
         else:
-            return self.client.get(filepath)
+            return [self.client.get(filepath, **kwargs) for filepath in filepaths]
 
     def get_text(self, filepath):
         return self.client.get_text(filepath)
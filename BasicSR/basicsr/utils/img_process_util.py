@@ -4,31 +4,121 @@ import torch
 from torch.nn import functional as F
 
 
-def filter2D(img, kernel):
+def filter2D(img, kernel, mode='auto'):
     """PyTorch version of cv2.filter2D
 
     Args:
         img (Tensor): (b, c, h, w)
         kernel (Tensor): (b, k, k)
+        mode (str): How to compute the filtering. 'direct': grouped convolution with the k x k kernels. 'separable':
+            a vertical and a horizontal 1D pass, only valid for rank-1 kernels. 'fft': multiplication in the
+            frequency domain. 'auto': 'separable' if all the kernels are rank-1 (e.g., isotropic Gaussian kernels),
+            'fft' for large kernels on large CPU images, otherwise 'direct'. Default: 'auto'.
     """
     k = kernel.size(-1)
     b, c, h, w = img.size()
     if k % 2 == 1:
-        img = F.pad(img, (k // 2, k // 2, k // 2, k // 2), mode='reflect')
+        # the padded image keeps the memory format of img, e.g., the channels last output of DiffJPEG on CPU
+        img = F.pad(img.contiguous(), (k // 2, k // 2, k // 2, k // 2), mode='reflect')
     else:
         raise ValueError('Wrong kernel size')
 
-    ph, pw = img.size()[-2:]
+    if mode == 'auto':
+        kernel_1d = _separate_kernel(kernel)
+        if kernel_1d is not None:
+            return _filter2D_separable(img, *kernel_1d).view(b, c, h, w)
+        # FFT is only chosen on CPU, where it is faster than the direct convolution for k >= 21 (and the images are
+        # not small). cuDNN is fast enough for these kernel sizes.
+        mode = 'fft' if img.device.type == 'cpu' and k >= 21 and min(h, w) >= 128 else 'direct'
+
+    if mode == 'direct':
+        return _filter2D_direct(img, kernel).view(b, c, h, w)
+    elif mode == 'separable':
+        kernel_1d = _separate_kernel(kernel)
+        if kernel_1d is None:
+            raise ValueError('The kernels are not separable.')
+        return _filter2D_separable(img, *kernel_1d).view(b, c, h, w)
+    elif mode == 'fft':
+        return _filter2D_fft(img, kernel)
+    else:
+        raise ValueError(f'Unsupported filter2D mode: {mode}.')
+
 
+def _filter2D_direct(img, kernel):
+    """Filter the padded img (b, c, ph, pw) with the kernels (b, k, k) using a grouped convolution."""
+    k = kernel.size(-1)
+    b, c, ph, pw = img.size()
     if kernel.size(0) == 1:
         # apply the same kernel to all batch images
         img = img.view(b * c, 1, ph, pw)
         kernel = kernel.view(1, 1, k, k)
-        return F.conv2d(img, kernel, padding=0).view(b, c, h, w)
+        return F.conv2d(img, kernel, padding=0)
     else:
         img = img.view(1, b * c, ph, pw)
         kernel = kernel.view(b, 1, k, k).repeat(1, c, 1, 1).view(b * c, 1, k, k)
-        return F.conv2d(img, kernel, groups=b * c).view(b, c, h, w)
+        return F.conv2d(img, kernel, groups=b * c)
+
+
+def _filter2D_separable(img, kernel_col, kernel_row):
+    """Filter the padded img (b, c, ph, pw) with the rank-1 kernels outer(kernel_col, kernel_row).
+
+    kernel_col and kernel_row are (b, k) or (1, k). It costs 2k instead of k^2 multiplications per pixel.
+    """
+    k = kernel_col.size(-1)
+    b, c, ph, pw = img.size()
+    if kernel_col.size(0) == 1:
+        # apply the same kernel to all batch images
+        img = F.conv2d(img.view(b * c, 1, ph, pw), kernel_col.view(1, 1, k, 1))
+        return F.conv2d(img, kernel_row.view(1, 1, 1, k))
+    else:
+        img = F.conv2d(
+            img.view(1, b * c, ph, pw), kernel_col.repeat_interleave(c, dim=0).view(b * c, 1, k, 1), groups=b * c)
+        return F.conv2d(img, kernel_row.repeat_interleave(c, dim=0).view(b * c, 1, 1, k), groups=b * c)
+
+
+def _filter2D_fft(img, kernel):
+    """Filter the padded img (b, c, ph, pw) with the kernels (b, k, k) in the frequency domain."""
+    k = kernel.size(-1)
+    ph, pw = img.size()[-2:]
+    # F.conv2d is a cross-correlation, so the kernel is flipped. There is no circular wrap-around in the valid region
+    # as long as the FFT size is not smaller than the padded image.
+    fft_size = (_fast_fft_size(ph), _fast_fft_size(pw))
+    img_f = torch.fft.rfft2(img, s=fft_size)
+    kernel_f = torch.fft.rfft2(kernel.flip(-2, -1).unsqueeze(1), s=fft_size)
+    out = torch.fft.irfft2(img_f * kernel_f, s=fft_size)
+    return out[..., k - 1:ph, k - 1:pw].contiguous()
+
+
+def _fast_fft_size(n):
+    """The smallest size >= n with no prime factors other than 2, 3, 5 and 7."""
+    while True:
+        m = n
+        for p in (2, 3, 5, 7):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+def _separate_kernel(kernel, rtol=1e-5):
+    """Split rank-1 kernels (b, k, k) into a column and a row kernel (b, k).
+
+    A rank-1 kernel equals outer(kernel[:, j], kernel[i, :]) / kernel[i, j] for its largest entry (i, j).
+
+    Returns:
+        tuple[Tensor] | None: The column and row kernels, or None if any kernel is not rank-1.
+    """
+    b, k = kernel.size(0), kernel.size(-1)
+    idx = kernel.abs().view(b, -1).argmax(dim=1)
+    row_idx, col_idx = idx // k, idx % k
+    batch_idx = torch.arange(b, device=kernel.device)
+    kernel_col = kernel[batch_idx, :, col_idx]
+    kernel_row = kernel[batch_idx, row_idx, :] / kernel[batch_idx, row_idx, col_idx].unsqueeze(1)
+    error = (kernel_col.unsqueeze(2) * kernel_row.unsqueeze(1) - kernel).abs().amax(dim=(1, 2))
+    if bool((error <= rtol * kernel.abs().amax(dim=(1, 2))).all()):
+        return kernel_col, kernel_row
+    return None
 
 
 def usm_sharp(img, weight=0.5, radius=50, threshold=10):
@@ -68,16 +158,97 @@ class USMSharp(torch.nn.Module):
             radius += 1
         self.radius = radius
         kernel = cv2.getGaussianKernel(radius, sigma)
+        # the Gaussian kernel is separable, filter with the 1D kernel
+        self.register_buffer('kernel_1d', torch.FloatTensor(kernel).view(1, -1), persistent=False)
         kernel = torch.FloatTensor(np.dot(kernel, kernel.transpose())).unsqueeze_(0)
         self.register_buffer('kernel', kernel)
 
+    def _blur(self, img):
+        pad = self.radius // 2
+        b, c, h, w = img.size()
+        img = F.pad(img.contiguous(), (pad, pad, pad, pad), mode='reflect')
+        return _filter2D_separable(img, self.kernel_1d, self.kernel_1d).view(b, c, h, w)
+
     def forward(self, img, weight=0.5, threshold=10):
-        blur = filter2D(img, self.kernel)
+        blur = self._blur(img)
         residual = img - blur
 
         mask = torch.abs(residual) * 255 > threshold
         mask = mask.float()
-        soft_mask = filter2D(mask, self.kernel)
+        soft_mask = self._blur(mask)
         sharp = img + weight * residual
         sharp = torch.clip(sharp, 0, 1)
         return soft_mask * sharp + (1 - soft_mask) * img
+
+
+class TrainingPairPool():
+    """Training pair pool for increasing the diversity in a batch.
+
+    Batch processing limits the diversity of synthetic degradations in a batch. For example, samples in a batch could
+    not have different resize scaling factors. The pool is preallocated and first filled batch by batch. Once it is
+    full, every new batch is swapped in place with randomly chosen samples of the pool, which are returned instead.
+
+    Args:
+        queue_size (int): Number of samples in the pool. It should be divisible by the batch size.
+        pin_memory (bool): Whether to keep the pool in pinned host memory for CUDA batches, which saves GPU memory for
+            a large queue_size. Otherwise, the pool is on the device of the batches. Default: False.
+    """
+
+    def __init__(self, queue_size, pin_memory=False):
+        self.queue_size = queue_size
+        self.pin_memory = pin_memory
+        self.queues = None
+        self.queue_ptr = 0
+        # recorded after copying the dequeued samples from pinned memory to the GPU
+        self.copy_event = None
+
+    def _init_queues(self, tensors):
+        b = tensors[0].size(0)
+        assert self.queue_size % b == 0, f'queue size {self.queue_size} should be divisible by batch size {b}'
+        self.on_host = self.pin_memory and tensors[0].is_cuda
+        if self.on_host:
+            self.queues = [torch.empty(self.queue_size, *x.size()[1:], dtype=x.dtype, pin_memory=True) for x in tensors]
+            # the dequeued samples are gathered here, so that they can be copied to the GPU asynchronously
+            self.buffers = [torch.empty(b, *x.size()[1:], dtype=x.dtype, pin_memory=True) for x in tensors]
+        else:
+            self.queues = [torch.empty(self.queue_size, *x.size()[1:], dtype=x.dtype, device=x.device) for x in tensors]
+
+    @torch.no_grad()
+    def dequeue_and_enqueue(self, *tensors):
+        """Put a batch into the pool and get the batch to train with.
+
+        Args:
+            tensors (Tensor): Batches of the same size, e.g., lq and gt with shape (b, c, h, w).
+
+        Returns:
+            tuple[Tensor]: The input batches while the pool is being filled, afterwards random samples of the pool.
+        """
+        if self.queues is None:
+            self._init_queues(tensors)
+        b = tensors[0].size(0)
+
+        if self.queue_ptr < self.queue_size:
+            # only do enqueue
+            for queue, x in zip(self.queues, tensors):
+                queue[self.queue_ptr:self.queue_ptr + b].copy_(x)
+            self.queue_ptr = self.queue_ptr + b
+            return tensors
+
+        # the pool is full: swap the batch with b random samples of the pool
+        idx = torch.randperm(self.queue_size)[:b].to(self.queues[0].device)
+        outs = []
+        if self.on_host:
+            if self.copy_event is not None:
+                # the buffers may still be in use by the last copy
+                self.copy_event.synchronize()
+            for queue, buffer, x in zip(self.queues, self.buffers, tensors):
+                torch.index_select(queue, 0, idx, out=buffer)
+                queue.index_copy_(0, idx, x.cpu())
+                outs.append(buffer.to(x.device, non_blocking=True))
+            self.copy_event = torch.cuda.Event()
+            self.copy_event.record()
+        else:
+            for queue, x in zip(self.queues, tensors):
+                outs.append(queue.index_select(0, idx))
+                queue.index_copy_(0, idx, x)
+        return tuple(outs)
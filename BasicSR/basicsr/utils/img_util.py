@@ -115,7 +115,10 @@ def imfrombytes(content, flag='color', float32=False):
     """Read an image from bytes.
 
     Args:
-        content (bytes): Image bytes got from files or other streams.
+        content (bytes | ndarray): Image bytes got from files or other streams.
+            It can also be an already decoded uint8 HWC image (e.g., from the
+            shards backend), which is only converted according to `flag`
+            (the grayscale conversion may differ by 1 from the one of libpng).
         flag (str): Flags specifying the color type of a loaded image,
             candidates are `color`, `grayscale` and `unchanged`.
         float32 (bool): Whether to change to float32., If True, will also norm
@@ -124,14 +127,53 @@ def imfrombytes(content, flag='color', float32=False):
     Returns:
         ndarray: Loaded image array.
     """
-    img_np = np.frombuffer(content, np.uint8)
-    imread_flags = {'color': cv2.IMREAD_COLOR, 'grayscale': cv2.IMREAD_GRAYSCALE, 'unchanged': cv2.IMREAD_UNCHANGED}
-    img = cv2.imdecode(img_np, imread_flags[flag])
+    if isinstance(content, np.ndarray) and content.ndim == 3:
+        img = _convert_decoded(content, flag)
+    else:
+        img_np = np.frombuffer(content, np.uint8)
+        imread_flags = {'color': cv2.IMREAD_COLOR, 'grayscale': cv2.IMREAD_GRAYSCALE, 'unchanged': cv2.IMREAD_UNCHANGED}
+        img = cv2.imdecode(img_np, imread_flags[flag])
     if float32:
         img = img.astype(np.float32) / 255.
     return img
 
 
+def imfrombytes_for_crop(content):
+    """Read an image from bytes, deferring the work that can be done after cropping.
+
+    Encoded images are decoded to uint8 BGR, as with `imfrombytes`, but not
+    converted to float32. Already decoded images (e.g., memory-mapped views
+    from the shards backend) are returned as they are, so the pixels outside
+    of the crop are never read. Pass the cropped result to `imfrombytes` to
+    finish the conversion: the result is identical to cropping the output of
+    `imfrombytes(content, float32=True)`, since the remaining conversions are
+    per pixel.
+
+    Args:
+        content (bytes | ndarray): Image bytes, or a decoded uint8 HWC image.
+
+    Returns:
+        ndarray: uint8 HWC image.
+    """
+    if isinstance(content, np.ndarray) and content.ndim == 3:
+        return content
+    return cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _convert_decoded(img, flag):
+    """Convert a decoded (h, w, c) image to the layout `cv2.imdecode` returns for `flag`."""
+    c = img.shape[2]
+    if flag == 'unchanged':
+        return img[..., 0] if c == 1 else img
+    if flag == 'color':
+        if c == 1:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR) if c == 4 else img
+    if c == 1:
+        return img[..., 0]
+    return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if c == 4 else cv2.COLOR_BGR2GRAY)
+
+
 def imwrite(img, file_path, params=None, auto_mkdir=True):
     """Write image to file.
 
@@ -0,0 +1,190 @@
+import cv2
+import math
+import torch
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from torch.nn import functional as F
+
+
+def get_image_size(path):
+    """Get the (h, w) of an image by only reading its header.
+
+    The size is the one after the EXIF orientation is applied, as `cv2.imread` does. Falls back to a full decode
+    with cv2 if PIL cannot parse the file.
+    """
+    try:
+        with Image.open(path) as img:
+            w, h = img.size
+            # orientations 5-8 are transposed
+            if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                h, w = w, h
+    except Exception:
+        h, w = cv2.imread(path, cv2.IMREAD_COLOR).shape[:2]
+    return h, w
+
+
+def _round_up(size, multiple):
+    return math.ceil(size / multiple) * multiple
+
+
+def bucket_by_shape(paths, batch_size, pad_multiple=1):
+    """Group images with the same (padded) shape into batches.
+
+    Args:
+        paths (list[str]): Image paths.
+        batch_size (int): Maximum number of images in a batch.
+        pad_multiple (int): Image sizes are rounded up to multiples of it, so that images with slightly
+            different sizes can share a batch (e.g., window_size for SwinIR). Default: 1.
+
+    Returns:
+        list[tuple]: (padded_shape, [(path, (h, w)), ...]) of each batch, in the order of first appearance.
+            Unreadable images are reported and left out.
+    """
+    buckets = OrderedDict()
+    for path in paths:
+        try:
+            h, w = get_image_size(path)
+        except Exception as error:
+            # unreadable images are skipped, so that they do not abort the whole folder
+            print('Error', error, path)
+            continue
+        shape = (_round_up(h, pad_multiple), _round_up(w, pad_multiple))
+        buckets.setdefault(shape, []).append((path, (h, w)))
+
+    batches = []
+    for shape, items in buckets.items():
+        for i in range(0, len(items), batch_size):
+            batches.append((shape, items[i:i + batch_size]))
+    return batches
+
+
+def _pad_to(img, h, w):
+    """Pad the bottom and right of a (c, h, w) tensor to the given size."""
+    pad_h, pad_w = h - img.size(-2), w - img.size(-1)
+    assert pad_h >= 0 and pad_w >= 0, f'image size {tuple(img.size()[-2:])} is larger than {(h, w)}'
+    if pad_h == 0 and pad_w == 0:
+        return img
+    # reflect padding requires the padding to be smaller than the image size
+    mode = 'reflect' if pad_h < img.size(-2) and pad_w < img.size(-1) else 'replicate'
+    return F.pad(img.unsqueeze(0), (0, pad_w, 0, pad_h), mode).squeeze(0)
+
+
+def batch_inference(paths,
+                    read_fn,
+                    forward_fn,
+                    write_fn,
+                    device,
+                    batch_size=4,
+                    pad_multiple=1,
+                    num_workers=4,
+                    prefetch=2):
+    """Batched inference over a list of images with background decoding and writing.
+
+    Images are bucketed by (padded) shape and run in batches. While a batch is in the forward pass, the
+    following ``prefetch`` batches are decoded by a thread pool, and the outputs are written by another
+    thread pool (cv2 releases the GIL when decoding and encoding).
+
+    Like the per-image loops of the inference scripts, an image that cannot be read, passed through forward_fn
+    or written is reported and skipped. A batch whose forward pass fails is retried image by image.
+
+    Args:
+        paths (list[str]): Image paths.
+        read_fn (callable): path -> (c, h, w) tensor.
+        forward_fn (callable): (b, c, h, w) tensor -> (b, c', h * scale, w * scale) tensor.
+        write_fn (callable): (output (c', h * scale, w * scale) tensor on cpu, path) -> None.
+        device (torch.device): Device for the forward pass.
+        batch_size (int): Maximum number of images in a batch. Default: 4.
+        pad_multiple (int): See :func:`bucket_by_shape`. Default: 1.
+        num_workers (int): Number of decoding threads and of writing threads. Default: 4.
+        prefetch (int): Number of batches decoded ahead. Default: 2.
+
+    Returns:
+        int: Number of processed images.
+    """
+    batches = bucket_by_shape(paths, batch_size, pad_multiple)
+    # bound the outputs waiting to be written, so a slow disk does not accumulate them in memory
+    max_pending_writes = max(1, num_workers) * batch_size * 2
+    num_images = 0
+
+    with ThreadPoolExecutor(num_workers) as reader, ThreadPoolExecutor(num_workers) as writer:
+        loading = deque()
+        pending_writes = deque()
+        next_batch = 0
+
+        def submit_next():
+            nonlocal next_batch
+            shape, items = batches[next_batch]
+            loading.append((shape, items, [reader.submit(read_fn, path) for path, _ in items]))
+            next_batch += 1
+
+        def run_batch(imgs):
+            """Run the padded images [(img, path, (h, w)), ...] through forward_fn and submit the writes."""
+            try:
+                outputs = [_forward(forward_fn, [img for img, _, _ in imgs], device)]
+                groups = [imgs]
+            except Exception as error:
+                if len(imgs) == 1:
+                    print('Error', error, imgs[0][1])
+                    return 0
+                # fall back to single images, so that only the failing ones are lost
+                outputs, groups = [], []
+                for img, path, size in imgs:
+                    try:
+                        outputs.append(_forward(forward_fn, [img], device))
+                        groups.append([(img, path, size)])
+                    except Exception as error:
+                        print('Error', error, path)
+
+            num_done = 0
+            for group_outputs, group in zip(outputs, groups):
+                scale = group_outputs.size(-1) // group[0][0].size(-1)
+                for output, (_, path, (h, w)) in zip(group_outputs, group):
+                    pending_writes.append((writer.submit(write_fn, output[:, :h * scale, :w * scale], path), path))
+                num_done += len(group)
+            return num_done
+
+        while loading or next_batch < len(batches):
+            while next_batch < len(batches) and len(loading) <= prefetch:
+                submit_next()
+            (pad_h, pad_w), items, futures = loading.popleft()
+
+            imgs, separate = [], []
+            for future, (path, size) in zip(futures, items):
+                try:
+                    img = future.result()
+                except Exception as error:
+                    print('Error', error, path)
+                    continue
+                if tuple(img.size()[-2:]) == size:
+                    imgs.append((_pad_to(img, pad_h, pad_w), path, size))
+                else:
+                    # the decoded size differs from the one of the header (e.g., orientation metadata that PIL
+                    # does not report), so the image does not belong to this batch: run it on its own
+                    h, w = img.size()[-2:]
+                    img = _pad_to(img, _round_up(h, pad_multiple), _round_up(w, pad_multiple))
+                    separate.append([(img, path, (h, w))])
+
+            for group in [imgs] + separate:
+                if group:
+                    num_images += run_batch(group)
+            while len(pending_writes) > max_pending_writes:
+                _wait_write(*pending_writes.popleft())
+
+        for future, path in pending_writes:
+            _wait_write(future, path)
+    return num_images
+
+
+def _forward(forward_fn, imgs, device):
+    """Run forward_fn on a batch of (c, h, w) tensors and return the outputs on cpu."""
+    with torch.no_grad():
+        outputs = forward_fn(torch.stack(imgs).to(device))
+    return outputs.detach().cpu()
+
+
+def _wait_write(future, path):
+    try:
+        future.result()
+    except Exception as error:
+        print('Error', error, path)
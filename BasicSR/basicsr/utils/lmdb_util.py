@@ -1,6 +1,9 @@
 import cv2
 import lmdb
+import os
 import sys
+import zlib
+from collections import deque
 from multiprocessing import Pool
 from os import path as osp
 from tqdm import tqdm
@@ -132,6 +135,172 @@ def make_lmdb_from_imgs(data_path,
     print('\nFinish writing lmdb.')
 
 
+def make_sharded_lmdb_from_imgs(data_path,
+                                lmdb_path,
+                                img_path_list,
+                                keys,
+                                num_shards=1,
+                                batch=5000,
+                                compress_level=1,
+                                n_thread=40,
+                                map_size=None,
+                                resume=True):
+    """Make lmdb from images with a pipelined, resumable builder, optionally split into shards.
+
+    Images are read and encoded by a pool of `n_thread` processes while the
+    main process writes the previous ones, with a bounded number of images in
+    flight, so that memory does not grow with the dataset.
+
+    Every `batch` images, the transactions are committed and the progress is
+    recorded in `progress.txt`. If the building is interrupted, running it
+    again with `resume=True` continues after the last checkpoint instead of
+    starting from zero. `progress.txt` is removed once the lmdb is complete.
+
+    With `num_shards` > 1, the images are split into several lmdb
+    environments, e.g., to keep each of them smaller or on different disks.
+    The file structure is:
+
+    ::
+
+        example.lmdb
+        ├── shard_000
+        │   ├── data.mdb
+        │   ├── lock.mdb
+        ├── shard_001
+        ├── ...
+        ├── meta_info.txt
+        ├── shard_info.txt
+
+    The key of an image decides its shard (see `lmdb_shard_index`), and the
+    meta_info.txt covers all the shards, so `LmdbBackend` and the datasets
+    read sharded lmdb transparently. With `num_shards` = 1, the result is the
+    same as `make_lmdb_from_imgs`.
+
+    Args:
+        data_path (str): Data path for reading images.
+        lmdb_path (str): Lmdb save path.
+        img_path_list (str): Image path list.
+        keys (str): Used for lmdb keys.
+        num_shards (int): Number of lmdb shards. Default: 1.
+        batch (int): After processing batch images, lmdb commits and the
+            progress is saved. Default: 5000.
+        compress_level (int): Compress level when encoding images. Default: 1.
+        n_thread (int): Number of processes for reading and encoding images.
+            Default: 40.
+        map_size (int | None): Map size of each lmdb shard. If None, use the
+            estimated size from images. Default: None
+        resume (bool): Whether to resume an interrupted building. Default: True.
+    """
+    assert len(img_path_list) == len(keys), ('img_path_list and keys should have the same length, '
+                                             f'but got {len(img_path_list)} and {len(keys)}')
+    print(f'Create lmdb for {data_path}, save to {lmdb_path}...')
+    print(f'Total images: {len(img_path_list)}, shards: {num_shards}')
+    if not lmdb_path.endswith('.lmdb'):
+        raise ValueError("lmdb_path must end with '.lmdb'.")
+    progress_path = osp.join(lmdb_path, 'progress.txt')
+    start = 0
+    if osp.exists(lmdb_path):
+        if not (resume and osp.exists(progress_path)):
+            print(f'Folder {lmdb_path} already exists. Exit.')
+            sys.exit(1)
+        with open(progress_path) as fin:
+            start = int(fin.read().split()[0])
+        if read_lmdb_shard_info(lmdb_path) != num_shards:
+            raise ValueError(f'Cannot resume {lmdb_path} with a different number of shards.')
+        print(f'Resume from image {start}.')
+    else:
+        os.makedirs(lmdb_path)
+        with open(progress_path, 'w') as fout:
+            fout.write('0\n')
+        if num_shards > 1:
+            with open(osp.join(lmdb_path, 'shard_info.txt'), 'w') as fout:
+                fout.write(f'num_shards: {num_shards}\n')
+
+    if map_size is None:
+        # obtain data size for one image
+        _, img_byte, _ = read_img_worker(osp.join(data_path, img_path_list[0]), keys[0], compress_level)
+        print('Data size per image is: ', img_byte.nbytes)
+        map_size = img_byte.nbytes * (len(img_path_list) // num_shards + 1) * 10
+
+    if num_shards > 1:
+        envs = [lmdb.open(osp.join(lmdb_path, f'shard_{i:03d}'), map_size=map_size) for i in range(num_shards)]
+    else:
+        envs = [lmdb.open(lmdb_path, map_size=map_size)]
+    txns = [env.begin(write=True) for env in envs]
+
+    # drop the meta information written after the last checkpoint
+    meta_path = osp.join(lmdb_path, 'meta_info.txt')
+    lines = []
+    if start > 0:
+        with open(meta_path) as fin:
+            lines = fin.readlines()[:start]
+    txt_file = open(meta_path, 'w')
+    txt_file.writelines(lines)
+
+    def checkpoint(done):
+        for i, env in enumerate(envs):
+            txns[i].commit()
+            txns[i] = env.begin(write=True)
+        txt_file.flush()
+        os.fsync(txt_file.fileno())
+        with open(progress_path, 'w') as fout:
+            fout.write(f'{done}\n')
+
+    pbar = tqdm(total=len(img_path_list), initial=start, unit='image')
+    done = start
+
+    def write(result):
+        nonlocal done
+        key, img_byte, (h, w, c) = result
+        key_byte = key.encode('ascii')
+        txns[lmdb_shard_index(key_byte, len(envs))].put(key_byte, img_byte)
+        # write meta information
+        txt_file.write(f'{key}.png ({h},{w},{c}) {compress_level}\n')
+        done += 1
+        pbar.update(1)
+        pbar.set_description(f'Write {key}')
+        if done % batch == 0:
+            checkpoint(done)
+
+    pool = Pool(n_thread)
+    pending = deque()
+    # keep the encoding processes busy without reading the whole dataset to memory
+    max_pending = n_thread * 4
+    try:
+        for path, key in zip(img_path_list[start:], keys[start:]):
+            pending.append(pool.apply_async(read_img_worker, args=(osp.join(data_path, path), key, compress_level)))
+            if len(pending) >= max_pending:
+                write(pending.popleft().get())
+        while pending:
+            write(pending.popleft().get())
+        checkpoint(done)
+    finally:
+        # on errors, everything after the last checkpoint is dropped and redone when resuming
+        pool.terminate()
+        pool.join()
+        pbar.close()
+        for txn, env in zip(txns, envs):
+            txn.abort()
+            env.close()
+        txt_file.close()
+    os.remove(progress_path)
+    print('\nFinish writing lmdb.')
+
+
+def lmdb_shard_index(key, num_shards):
+    """Shard of an lmdb key (bytes) in a sharded lmdb."""
+    return zlib.crc32(key) % num_shards if num_shards > 1 else 0
+
+
+def read_lmdb_shard_info(lmdb_path):
+    """Number of shards of an lmdb made by `make_sharded_lmdb_from_imgs` (1 if not sharded)."""
+    shard_info_path = osp.join(lmdb_path, 'shard_info.txt')
+    if not osp.exists(shard_info_path):
+        return 1
+    with open(shard_info_path) as fin:
+        return int(fin.read().split(':')[1])
+
+
 def read_img_worker(path, key, compress_level):
     """Read image worker.
 
@@ -80,6 +80,8 @@ class MessageLogger():
 
                 time (float): Iter time.
                 data_time (float): Data time for each iter.
+                data_stall (float, optional): Time waiting for the prefetcher.
+                queue_depth (float, optional): Number of prefetched batches.
         """
         # epoch, iter, learning rates
         epoch = log_vars.pop('epoch')
@@ -103,6 +105,15 @@ class MessageLogger():
             message += f'[eta: {eta_str}, '
             message += f'time (data): {iter_time:.3f} ({data_time:.3f})] '
 
+        # input pipeline: stall time and queue depth of the prefetcher
+        if 'data_stall' in log_vars.keys():
+            data_stall = log_vars.pop('data_stall')
+            queue_depth = log_vars.pop('queue_depth')
+            message += f'[stall: {data_stall:.3f}, queue: {queue_depth:.1f}] '
+            if self.use_tb_logger and 'debug' not in self.exp_name:
+                self.tb_logger.add_scalar('data/stall_time', data_stall, current_iter)
+                self.tb_logger.add_scalar('data/queue_depth', queue_depth, current_iter)
+
         # other items, especially losses
         for k, v in log_vars.items():
             message += f'{k}: {v:.4e} '
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import numpy as np
 import os
 import random
@@ -91,6 +93,88 @@ def scandir(dir_path, suffix=None, recursive=False, full_path=False):
     return _scandir(dir_path, suffix=suffix, recursive=recursive)
 
 
+def scandir_cached(dir_path, index_dir, suffix=None, recursive=False, full_path=False):
+    """Scan a directory like `scandir`, with an on-disk index of the result.
+
+    The relative paths are saved as a numpy array in index_dir, together with
+    the mtime and size of every scanned directory. Adding, removing or
+    renaming files changes the mtime of their directory, so a later call
+    only needs one stat per directory to validate the index, and then loads
+    the paths with `np.load(mmap_mode='r')` instead of listing the files.
+    This is much faster for folders with millions of files, especially on
+    network filesystems, and all the processes (e.g., DDP ranks) share the
+    same index. The index files are written atomically, so concurrent
+    processes can build them at the same time.
+
+    Args:
+        dir_path (str): Path of the directory.
+        index_dir (str): Folder to save the index files.
+        suffix (str | tuple(str), optional): File suffix that we are
+            interested in. Default: None.
+        recursive (bool, optional): If set to True, recursively scan the
+            directory. Default: False.
+        full_path (bool, optional): If set to True, include the dir_path.
+            Default: False.
+
+    Returns:
+        list[str]: The interested files, in the same order as `scandir`.
+    """
+    if (suffix is not None) and not isinstance(suffix, (str, tuple)):
+        raise TypeError('"suffix" must be a string or tuple of strings')
+
+    # json round trip, so that it compares equal to the saved one (e.g., tuple suffix)
+    scan_args = json.loads(json.dumps([osp.abspath(dir_path), suffix, recursive]))
+    index_name = hashlib.sha1(json.dumps(scan_args).encode()).hexdigest()[:16]
+    meta_path = osp.join(index_dir, f'{index_name}.json')
+    paths_path = osp.join(index_dir, f'{index_name}.npy')
+
+    def _stat(path):
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    paths = None
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta['args'] == scan_args and all(_stat(osp.join(dir_path, d)) == s for d, s in meta['dirs'].items()):
+            paths = np.load(paths_path, mmap_mode='r')
+            if len(paths) != meta['num']:
+                paths = None
+    except (OSError, ValueError, KeyError):
+        paths = None
+
+    if paths is None:
+        # record the stats before listing, so that files added during the scan invalidate the index
+        dirs = {}
+        paths = []
+
+        def _scan(rel_dir):
+            dirs[rel_dir] = _stat(osp.join(dir_path, rel_dir))
+            for entry in os.scandir(osp.join(dir_path, rel_dir)):
+                rel_path = osp.normpath(osp.join(rel_dir, entry.name))
+                if not entry.name.startswith('.') and entry.is_file():
+                    if suffix is None or rel_path.endswith(suffix):
+                        paths.append(rel_path)
+                elif recursive:
+                    _scan(rel_path)
+
+        _scan('.')
+        paths = np.array(paths, dtype=str)
+        os.makedirs(index_dir, exist_ok=True)
+        tmp_suffix = f'.{os.getpid()}.tmp'
+        with open(paths_path + tmp_suffix, 'wb') as f:
+            np.save(f, paths)
+        os.replace(paths_path + tmp_suffix, paths_path)
+        with open(meta_path + tmp_suffix, 'w') as f:
+            json.dump({'args': scan_args, 'num': len(paths), 'dirs': dirs}, f)
+        os.replace(meta_path + tmp_suffix, meta_path)
+
+    paths = paths.tolist()
+    if full_path:
+        paths = [osp.join(dir_path, path) for path in paths]
+    return paths
+
+
 def check_resume(opt, resume_iter):
     """Check resume states and pretrain_network paths.
 
@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+import os
+import sys
+from multiprocessing.pool import ThreadPool
+from os import path as osp
+from tqdm import tqdm
+
+
+def make_shards_from_imgs(data_path, shard_path, img_path_list, keys, shard_size=4 * 1024**3, n_thread=8):
+    """Make memory-mapped shards of decoded images.
+
+    Contents of the shard folder. The file structure is:
+
+    ::
+
+        example.shards
+        ├── shard_00000.bin
+        ├── shard_00001.bin
+        ├── ...
+        ├── meta_info.txt
+
+    Each shard_xxxxx.bin is the raw uint8 HWC (BGR) pixels of its images,
+    stored back to back. They are read with `np.memmap`, so loading an image
+    is a slice of the page cache, without any decoding.
+
+    Each line in meta_info.txt records 1)image name (with extension),
+    2)image shape, 3)shard index and 4)byte offset in the shard, separated
+    by a white space. For example: `0001_s001.png (480,480,3) 0 691200`.
+    The first two fields are the same as in the lmdb meta_info.txt, so the
+    keys can be read in the same way.
+
+    Decoded images are much larger than PNG files, so this format suits
+    datasets of sub-images (see `extract_subimages.py`) on machines where
+    decoding is the bottleneck.
+
+    Args:
+        data_path (str): Data path for reading images.
+        shard_path (str): Shard folder save path.
+        img_path_list (str): Image path list.
+        keys (str): Used for keys.
+        shard_size (int): Maximum size of a shard file in bytes. Default: 4GB.
+        n_thread (int): Number of threads for decoding images. Default: 8.
+    """
+    assert len(img_path_list) == len(keys), ('img_path_list and keys should have the same length, '
+                                             f'but got {len(img_path_list)} and {len(keys)}')
+    print(f'Create shards for {data_path}, save to {shard_path}...')
+    print(f'Total images: {len(img_path_list)}')
+
+    maker = ShardMaker(shard_path, shard_size=shard_size)
+    pbar = tqdm(total=len(img_path_list), unit='image')
+    # cv2 releases the GIL when decoding, and imap keeps the order of the keys
+    with ThreadPool(n_thread) as pool:
+        imgs = pool.imap(lambda path: cv2.imread(osp.join(data_path, path), cv2.IMREAD_UNCHANGED), img_path_list)
+        for path, key, img in zip(img_path_list, keys, imgs):
+            if img is None:
+                raise IOError(f'Failed to read {osp.join(data_path, path)}')
+            maker.put(img, key)
+            pbar.update(1)
+            pbar.set_description(f'Write {key}')
+    pbar.close()
+    maker.close()
+    print('\nFinish writing shards.')
+
+
+class ShardMaker():
+    """Shard Maker.
+
+    Args:
+        shard_path (str): Shard folder save path.
+        shard_size (int): Maximum size of a shard file in bytes. Default: 4GB.
+    """
+
+    def __init__(self, shard_path, shard_size=4 * 1024**3):
+        if not shard_path.endswith('.shards'):
+            raise ValueError("shard_path must end with '.shards'.")
+        if osp.exists(shard_path):
+            print(f'Folder {shard_path} already exists. Exit.')
+            sys.exit(1)
+
+        os.makedirs(shard_path)
+        self.shard_path = shard_path
+        self.shard_size = shard_size
+        self.shard_idx = -1
+        self.shard_file = None
+        self.offset = 0
+        self.txt_file = open(osp.join(shard_path, 'meta_info.txt'), 'w')
+        self._next_shard()
+
+    def _next_shard(self):
+        if self.shard_file is not None:
+            self.shard_file.close()
+        self.shard_idx += 1
+        self.shard_file = open(osp.join(self.shard_path, f'shard_{self.shard_idx:05d}.bin'), 'wb')
+        self.offset = 0
+
+    def put(self, img, key):
+        if img.dtype != np.uint8:
+            raise ValueError(f'Only uint8 images can be stored in shards, but {key} is {img.dtype}.')
+        if img.ndim == 2:
+            img = img[..., None]
+        h, w, c = img.shape
+        if self.offset > 0 and self.offset + img.nbytes > self.shard_size:
+            self._next_shard()
+        self.shard_file.write(np.ascontiguousarray(img).tobytes())
+        # write meta information
+        self.txt_file.write(f'{key}.png ({h},{w},{c}) {self.shard_idx} {self.offset}\n')
+        self.offset += img.nbytes
+
+    def close(self):
+        self.shard_file.close()
+        self.txt_file.close()
+
+
+def read_shard_meta_info(shard_path):
+    """Read the meta_info.txt of a shard folder.
+
+    Returns:
+        dict: key -> (shard index, offset, (h, w, c)).
+    """
+    index = {}
+    with open(osp.join(shard_path, 'meta_info.txt')) as fin:
+        for line in fin:
+            name, shape, shard_idx, offset = line.split()
+            h, w, c = (int(v) for v in shape.strip('()').split(','))
+            index[name[:-len('.png')]] = (int(shard_idx), int(offset), (h, w, c))
+    return index
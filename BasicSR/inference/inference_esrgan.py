@@ -5,7 +5,9 @@ import numpy as np
 import os
 import torch
 
+from basicsr.archs.arch_util import tile_forward
 from basicsr.archs.rrdbnet_arch import RRDBNet
+from basicsr.utils.inference_util import batch_inference
 
 
 def main():
@@ -18,6 +20,10 @@ def main():
     )
     parser.add_argument('--input', type=str, default='datasets/Set14/LRbicx4', help='input test image folder')
     parser.add_argument('--output', type=str, default='results/ESRGAN', help='output folder')
+    parser.add_argument('--tile', type=int, default=0, help='tile size for tiled inference, 0 for no tiling')
+    parser.add_argument('--tile_overlap', type=int, default=32, help='overlap between tiles')
+    parser.add_argument('--batch_size', type=int, default=1, help='number of images with the same size in a batch')
+    parser.add_argument('--num_workers', type=int, default=4, help='number of threads for reading and saving')
     args = parser.parse_args()
 
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -28,25 +34,29 @@ def main():
     model = model.to(device)
 
     os.makedirs(args.output, exist_ok=True)
-    for idx, path in enumerate(sorted(glob.glob(os.path.join(args.input, '*')))):
-        imgname = os.path.splitext(os.path.basename(path))[0]
-        print('Testing', idx, imgname)
-        # read image
+
+    def read_img(path):
         img = cv2.imread(path, cv2.IMREAD_COLOR).astype(np.float32) / 255.
-        img = torch.from_numpy(np.transpose(img[:, :, [2, 1, 0]], (2, 0, 1))).float()
-        img = img.unsqueeze(0).to(device)
-        # inference
-        try:
-            with torch.no_grad():
-                output = model(img)
-        except Exception as error:
-            print('Error', error, imgname)
-        else:
-            # save image
-            output = output.data.squeeze().float().cpu().clamp_(0, 1).numpy()
-            output = np.transpose(output[[2, 1, 0], :, :], (1, 2, 0))
-            output = (output * 255.0).round().astype(np.uint8)
-            cv2.imwrite(os.path.join(args.output, f'{imgname}_ESRGAN.png'), output)
+        return torch.from_numpy(np.transpose(img[:, :, [2, 1, 0]], (2, 0, 1))).float()
+
+    def forward(imgs):
+        if args.tile > 0:
+            return tile_forward(model, imgs, args.tile, args.tile_overlap, scale=4)
+        return model(imgs)
+
+    def write_img(output, path):
+        imgname = os.path.splitext(os.path.basename(path))[0]
+        print('Testing', imgname)
+        # save image
+        output = output.float().clamp_(0, 1).numpy()
+        output = np.transpose(output[[2, 1, 0], :, :], (1, 2, 0))
+        output = (output * 255.0).round().astype(np.uint8)
+        cv2.imwrite(os.path.join(args.output, f'{imgname}_ESRGAN.png'), output)
+
+    # images with the same size are batched; decoding and saving run in background threads
+    paths = sorted(glob.glob(os.path.join(args.input, '*')))
+    batch_inference(
+        paths, read_img, forward, write_img, device, batch_size=args.batch_size, num_workers=args.num_workers)
 
 
 if __name__ == '__main__':
@@ -8,6 +8,7 @@ from tqdm import tqdm
 
 from basicsr.archs.ridnet_arch import RIDNet
 from basicsr.utils.img_util import img2tensor, tensor2img
+from basicsr.utils.inference_util import batch_inference
 
 if __name__ == '__main__':
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -19,6 +20,8 @@ if __name__ == '__main__':
         type=str,
         default=  # noqa: E251
         'experiments/pretrained_models/RIDNet/RIDNet.pth')
+    parser.add_argument('--batch_size', type=int, default=1, help='number of images with the same size in a batch')
+    parser.add_argument('--num_workers', type=int, default=4, help='number of threads for reading and saving')
     args = parser.parse_args()
     if args.test_path.endswith('/'):  # solve when path ends with /
         args.test_path = args.test_path[:-1]
@@ -32,20 +35,23 @@ if __name__ == '__main__':
     net.load_state_dict(checkpoint)
     net.eval()
 
-    # scan all the jpg and png images
-    img_list = sorted(glob.glob(os.path.join(test_root, '*.[jp][pn]g')))
-    pbar = tqdm(total=len(img_list), desc='')
-    for idx, img_path in enumerate(img_list):
-        img_name = os.path.basename(img_path).split('.')[0]
-        pbar.update(1)
-        pbar.set_description(f'{idx}: {img_name}')
-        # read image
+    def read_img(img_path):
         img = cv2.imread(img_path, cv2.IMREAD_COLOR)
-        img = img2tensor(img, bgr2rgb=True, float32=True).unsqueeze(0).to(device)
-        # inference
-        with torch.no_grad():
-            output = net(img)
+        return img2tensor(img, bgr2rgb=True, float32=True)
+
+    def write_img(output, img_path):
+        img_name = os.path.basename(img_path).split('.')[0]
         # save image
         output = tensor2img(output, rgb2bgr=True, out_type=np.uint8, min_max=(0, 255))
         save_img_path = os.path.join(result_root, f'{img_name}_x{args.noise_g}_RIDNet.png')
         cv2.imwrite(save_img_path, output)
+        pbar.update(1)
+        pbar.set_description(img_name)
+
+    # scan all the jpg and png images
+    img_list = sorted(glob.glob(os.path.join(test_root, '*.[jp][pn]g')))
+    pbar = tqdm(total=len(img_list), desc='')
+    # images with the same size are batched; decoding and saving run in background threads
+    batch_inference(
+        img_list, read_img, net, write_img, device, batch_size=args.batch_size, num_workers=args.num_workers)
+    pbar.close()
@@ -5,9 +5,10 @@ import glob
 import numpy as np
 import os
 import torch
-from torch.nn import functional as F
 
+from basicsr.archs.arch_util import tile_forward
 from basicsr.archs.swinir_arch import SwinIR
+from basicsr.utils.inference_util import batch_inference
 
 
 def main():
@@ -30,6 +31,10 @@ def main():
         '--model_path',
         type=str,
         default='experiments/pretrained_models/SwinIR/001_classicalSR_DF2K_s64w8_SwinIR-M_x4.pth')
+    parser.add_argument('--tile', type=int, default=0, help='tile size for tiled inference, 0 for no tiling')
+    parser.add_argument('--tile_overlap', type=int, default=32, help='overlap between tiles')
+    parser.add_argument('--batch_size', type=int, default=1, help='number of images with similar sizes in a batch')
+    parser.add_argument('--num_workers', type=int, default=4, help='number of threads for reading and saving')
     args = parser.parse_args()
 
     os.makedirs(args.output, exist_ok=True)
@@ -44,37 +49,38 @@ def main():
     else:
         window_size = 8
 
-    for idx, path in enumerate(sorted(glob.glob(os.path.join(args.input, '*')))):
-        # read image
-        imgname = os.path.splitext(os.path.basename(path))[0]
-        print('Testing', idx, imgname)
-        # read image
+    def read_img(path):
         img = cv2.imread(path, cv2.IMREAD_COLOR).astype(np.float32) / 255.
-        img = torch.from_numpy(np.transpose(img[:, :, [2, 1, 0]], (2, 0, 1))).float()
-        img = img.unsqueeze(0).to(device)
-
-        # inference
-        with torch.no_grad():
-            # pad input image to be a multiple of window_size
-            mod_pad_h, mod_pad_w = 0, 0
-            _, _, h, w = img.size()
-            if h % window_size != 0:
-                mod_pad_h = window_size - h % window_size
-            if w % window_size != 0:
-                mod_pad_w = window_size - w % window_size
-            img = F.pad(img, (0, mod_pad_w, 0, mod_pad_h), 'reflect')
-
-            output = model(img)
-            _, _, h, w = output.size()
-            output = output[:, :, 0:h - mod_pad_h * args.scale, 0:w - mod_pad_w * args.scale]
+        return torch.from_numpy(np.transpose(img[:, :, [2, 1, 0]], (2, 0, 1))).float()
+
+    def forward(imgs):
+        # batches are already padded to be a multiple of window_size
+        if args.tile > 0:
+            return tile_forward(model, imgs, args.tile, args.tile_overlap, scale=args.scale, window_size=window_size)
+        return model(imgs)
 
+    def write_img(output, path):
+        imgname = os.path.splitext(os.path.basename(path))[0]
+        print('Testing', imgname)
         # save image
-        output = output.data.squeeze().float().cpu().clamp_(0, 1).numpy()
+        output = output.squeeze().float().clamp_(0, 1).numpy()
         if output.ndim == 3:
             output = np.transpose(output[[2, 1, 0], :, :], (1, 2, 0))
         output = (output * 255.0).round().astype(np.uint8)
         cv2.imwrite(os.path.join(args.output, f'{imgname}_SwinIR.png'), output)
 
+    # images padded to the same multiple of window_size are batched; decoding and saving run in background threads
+    paths = sorted(glob.glob(os.path.join(args.input, '*')))
+    batch_inference(
+        paths,
+        read_img,
+        forward,
+        write_img,
+        device,
+        batch_size=args.batch_size,
+        pad_multiple=window_size,
+        num_workers=args.num_workers)
+
 
 def define_model(args):
     # 001 classical image sr
@@ -2,10 +2,10 @@ import argparse
 from os import path as osp
 
 from basicsr.utils import scandir
-from basicsr.utils.lmdb_util import make_lmdb_from_imgs
+from basicsr.utils.lmdb_util import make_sharded_lmdb_from_imgs
 
 
-def create_lmdb_for_div2k():
+def create_lmdb_for_div2k(num_shards=1):
     """Create lmdb files for DIV2K dataset.
 
     Usage:
@@ -18,30 +18,34 @@ def create_lmdb_for_div2k():
             * DIV2K_train_LR_bicubic/X4_sub
 
         Remember to modify opt configurations according to your settings.
+        An interrupted run resumes from its last checkpoint when run again.
+
+    Args:
+        num_shards (int): Number of lmdb shards of each dataset. Default: 1.
     """
     # HR images
     folder_path = 'datasets/DIV2K/DIV2K_train_HR_sub'
     lmdb_path = 'datasets/DIV2K/DIV2K_train_HR_sub.lmdb'
     img_path_list, keys = prepare_keys_div2k(folder_path)
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
     # LRx2 images
     folder_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic/X2_sub'
     lmdb_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic_X2_sub.lmdb'
     img_path_list, keys = prepare_keys_div2k(folder_path)
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
     # LRx3 images
     folder_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic/X3_sub'
     lmdb_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic_X3_sub.lmdb'
     img_path_list, keys = prepare_keys_div2k(folder_path)
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
     # LRx4 images
     folder_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic/X4_sub'
     lmdb_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic_X4_sub.lmdb'
     img_path_list, keys = prepare_keys_div2k(folder_path)
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
 
 def prepare_keys_div2k(folder_path):
@@ -61,7 +65,7 @@ def prepare_keys_div2k(folder_path):
     return img_path_list, keys
 
 
-def create_lmdb_for_reds():
+def create_lmdb_for_reds(num_shards=1):
     """Create lmdb files for REDS dataset.
 
     Usage:
@@ -72,18 +76,22 @@ def create_lmdb_for_reds():
             * train_sharp_bicubic
 
         Remember to modify opt configurations according to your settings.
+        An interrupted run resumes from its last checkpoint when run again.
+
+    Args:
+        num_shards (int): Number of lmdb shards of each dataset. Default: 1.
     """
     # train_sharp
     folder_path = 'datasets/REDS/train_sharp'
     lmdb_path = 'datasets/REDS/train_sharp_with_val.lmdb'
     img_path_list, keys = prepare_keys_reds(folder_path)
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, multiprocessing_read=True)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
     # train_sharp_bicubic
     folder_path = 'datasets/REDS/train_sharp_bicubic'
     lmdb_path = 'datasets/REDS/train_sharp_bicubic_with_val.lmdb'
     img_path_list, keys = prepare_keys_reds(folder_path)
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, multiprocessing_read=True)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
 
 def prepare_keys_reds(folder_path):
@@ -103,25 +111,29 @@ def prepare_keys_reds(folder_path):
     return img_path_list, keys
 
 
-def create_lmdb_for_vimeo90k():
+def create_lmdb_for_vimeo90k(num_shards=1):
     """Create lmdb files for Vimeo90K dataset.
 
     Usage:
         Remember to modify opt configurations according to your settings.
+        An interrupted run resumes from its last checkpoint when run again.
+
+    Args:
+        num_shards (int): Number of lmdb shards of each dataset. Default: 1.
     """
     # GT
     folder_path = 'datasets/vimeo90k/vimeo_septuplet/sequences'
     lmdb_path = 'datasets/vimeo90k/vimeo90k_train_GT_only4th.lmdb'
     train_list_path = 'datasets/vimeo90k/vimeo_septuplet/sep_trainlist.txt'
     img_path_list, keys = prepare_keys_vimeo90k(folder_path, train_list_path, 'gt')
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, multiprocessing_read=True)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
     # LQ
     folder_path = 'datasets/vimeo90k/vimeo_septuplet_matlabLRx4/sequences'
     lmdb_path = 'datasets/vimeo90k/vimeo90k_train_LR7frames.lmdb'
     train_list_path = 'datasets/vimeo90k/vimeo_septuplet/sep_trainlist.txt'
     img_path_list, keys = prepare_keys_vimeo90k(folder_path, train_list_path, 'lq')
-    make_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, multiprocessing_read=True)
+    make_sharded_lmdb_from_imgs(folder_path, lmdb_path, img_path_list, keys, num_shards=num_shards)
 
 
 def prepare_keys_vimeo90k(folder_path, train_list_path, mode):
@@ -162,13 +174,14 @@ if __name__ == '__main__':
         '--dataset',
         type=str,
         help=("Options: 'DIV2K', 'REDS', 'Vimeo90K' You may need to modify the corresponding configurations in codes."))
+    parser.add_argument('--num_shards', type=int, default=1, help='Split each lmdb into several shards.')
     args = parser.parse_args()
     dataset = args.dataset.lower()
     if dataset == 'div2k':
-        create_lmdb_for_div2k()
+        create_lmdb_for_div2k(args.num_shards)
     elif dataset == 'reds':
-        create_lmdb_for_reds()
+        create_lmdb_for_reds(args.num_shards)
     elif dataset == 'vimeo90k':
-        create_lmdb_for_vimeo90k()
+        create_lmdb_for_vimeo90k(args.num_shards)
     else:
         raise ValueError('Wrong dataset.')
@@ -0,0 +1,92 @@
+import argparse
+
+from basicsr.utils import scandir
+from basicsr.utils.shard_util import make_shards_from_imgs
+
+
+def create_shards_for_div2k():
+    """Create memory-mapped shards of decoded images for DIV2K dataset.
+
+    Usage:
+        Before run this script, please run `extract_subimages.py`.
+        Typically, there are four folders to be processed for DIV2K dataset.
+
+            * DIV2K_train_HR_sub
+            * DIV2K_train_LR_bicubic/X2_sub
+            * DIV2K_train_LR_bicubic/X3_sub
+            * DIV2K_train_LR_bicubic/X4_sub
+
+        Decoded sub-images take much more space than PNG files (about 23GB
+        for DIV2K_train_HR_sub), but are read without any decoding.
+        Remember to modify opt configurations according to your settings.
+    """
+    # HR images
+    folder_path = 'datasets/DIV2K/DIV2K_train_HR_sub'
+    shard_path = 'datasets/DIV2K/DIV2K_train_HR_sub.shards'
+    img_path_list, keys = prepare_keys(folder_path, recursive=False)
+    make_shards_from_imgs(folder_path, shard_path, img_path_list, keys)
+
+    # LRx2 images
+    folder_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic/X2_sub'
+    shard_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic_X2_sub.shards'
+    img_path_list, keys = prepare_keys(folder_path, recursive=False)
+    make_shards_from_imgs(folder_path, shard_path, img_path_list, keys)
+
+    # LRx3 images
+    folder_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic/X3_sub'
+    shard_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic_X3_sub.shards'
+    img_path_list, keys = prepare_keys(folder_path, recursive=False)
+    make_shards_from_imgs(folder_path, shard_path, img_path_list, keys)
+
+    # LRx4 images
+    folder_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic/X4_sub'
+    shard_path = 'datasets/DIV2K/DIV2K_train_LR_bicubic_X4_sub.shards'
+    img_path_list, keys = prepare_keys(folder_path, recursive=False)
+    make_shards_from_imgs(folder_path, shard_path, img_path_list, keys)
+
+
+def create_shards_for_folder(folder_path, shard_path):
+    """Create memory-mapped shards for all the png images in a folder (recursively).
+
+    The keys are the relative paths without extension, e.g., 000/00000000 for REDS.
+    """
+    img_path_list, keys = prepare_keys(folder_path, recursive=True)
+    make_shards_from_imgs(folder_path, shard_path, img_path_list, keys)
+
+
+def prepare_keys(folder_path, recursive=False):
+    """Prepare image path list and keys, in the same way as `create_lmdb.py`.
+
+    Args:
+        folder_path (str): Folder path.
+        recursive (bool): Whether to scan sub-folders. Default: False.
+
+    Returns:
+        list[str]: Image path list.
+        list[str]: Key list.
+    """
+    print('Reading image path list ...')
+    img_path_list = sorted(list(scandir(folder_path, suffix='png', recursive=recursive)))
+    keys = [v.split('.png')[0] for v in img_path_list]
+
+    return img_path_list, keys
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--dataset',
+        type=str,
+        default='DIV2K',
+        help=("Options: 'DIV2K', 'folder'. You may need to modify the corresponding configurations in codes."))
+    parser.add_argument('--input', type=str, help='Input folder, for the folder dataset.')
+    parser.add_argument('--output', type=str, help="Output shard folder ending with '.shards', for the folder dataset.")
+    args = parser.parse_args()
+    dataset = args.dataset.lower()
+    if dataset == 'div2k':
+        create_shards_for_div2k()
+    elif dataset == 'folder':
+        create_shards_for_folder(args.input, args.output)
+    else:
+        raise ValueError('Wrong dataset.')
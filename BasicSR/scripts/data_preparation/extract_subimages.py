@@ -1,12 +1,17 @@
 import cv2
 import numpy as np
 import os
+import shutil
 import sys
+from collections import deque
 from multiprocessing import Pool
 from os import path as osp
 from tqdm import tqdm
 
 from basicsr.utils import scandir
+from basicsr.utils.lmdb_util import LmdbMaker
+from basicsr.utils.matlab_functions import imresize
+from basicsr.utils.shard_util import ShardMaker
 
 
 def main():
@@ -36,6 +41,19 @@ def main():
 
         After process, each sub_folder should have the same number of subimages.
 
+        If save_folder ends with '.lmdb' or '.shards', the sub-images are written
+        straight into an lmdb or a shard folder (see `create_lmdb.py` and
+        `create_shards.py`), without the intermediate png files. With
+        opt['scale'], the LR sub-images are generated from the HR images with
+        the MATLAB-like bicubic `imresize`, instead of reading the LR folders.
+        For example:
+
+            opt['input_folder'] = 'datasets/DIV2K/DIV2K_train_HR'
+            opt['save_folder'] = 'datasets/DIV2K/DIV2K_train_LR_bicubic_X4_sub.lmdb'
+            opt['crop_size'] = 480  # in HR pixels
+            opt['step'] = 240
+            opt['scale'] = 4
+
         Remember to modify opt configurations according to your settings.
     """
 
@@ -82,9 +100,13 @@ def extract_subimages(opt):
     Args:
         opt (dict): Configuration dict. It contains:
         input_folder (str): Path to the input folder.
-        save_folder (str): Path to save folder.
+        save_folder (str): Path to save folder. It can also be an lmdb ('.lmdb') or shard ('.shards') path.
         n_thread (int): Thread number.
     """
+    if opt['save_folder'].endswith(('.lmdb', '.shards')) or opt.get('scale'):
+        extract_subimages_to_store(opt)
+        return
+
     input_folder = opt['input_folder']
     save_folder = opt['save_folder']
     if not osp.exists(save_folder):
@@ -106,31 +128,73 @@ def extract_subimages(opt):
     print('All processes done.')
 
 
-def worker(path, opt):
-    """Worker for each process.
+def extract_subimages_to_store(opt):
+    """Crop images to subimages and write them straight into an lmdb or a shard folder.
+
+    The workers read, crop (and downsample) the images and encode the
+    sub-images, while the main process writes them. At most 2 * n_thread
+    images are in flight, so the memory does not grow with the dataset.
 
     Args:
-        path (str): Image path.
         opt (dict): Configuration dict. It contains:
-        crop_size (int): Crop size.
-        step (int): Step for overlapped sliding window.
-        thresh_size (int): Threshold size. Patches whose size is lower than thresh_size will be dropped.
-        save_folder (str): Path to save folder.
-        compression_level (int): for cv2.IMWRITE_PNG_COMPRESSION.
-
-    Returns:
-        process_info (str): Process information displayed in progress bar.
+        input_folder (str): Path to the input folder.
+        save_folder (str): Lmdb ('.lmdb') or shard ('.shards') path.
+        n_thread (int): Thread number.
+        scale (int, optional): Downsample the images by scale with MATLAB-like bicubic
+            before cropping. crop_size, step and thresh_size are then given for the input images.
     """
-    crop_size = opt['crop_size']
-    step = opt['step']
-    thresh_size = opt['thresh_size']
-    img_name, extension = osp.splitext(osp.basename(path))
+    save_folder = opt['save_folder']
+    if save_folder.endswith('.lmdb'):
+        maker = LmdbMaker(save_folder, compress_level=opt['compression_level'])
+    elif save_folder.endswith('.shards'):
+        maker = ShardMaker(save_folder)
+    else:
+        raise ValueError(f"save_folder should end with '.lmdb' or '.shards' with scale, but received {save_folder}")
 
-    # remove the x2, x3, x4 and x8 in the filename for DIV2K
-    img_name = img_name.replace('x2', '').replace('x3', '').replace('x4', '').replace('x8', '')
+    img_list = sorted(scandir(opt['input_folder'], full_path=True))
 
-    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    pbar = tqdm(total=len(img_list), unit='image', desc='Extract')
+    pool = Pool(opt['n_thread'])
+    pending = deque()
+
+    def write(results):
+        for key, content, shape in results:
+            if isinstance(maker, LmdbMaker):
+                maker.put(content, key, shape)
+            else:
+                maker.put(content, key)
+        pbar.update(1)
+
+    completed = False
+    try:
+        for path in img_list:
+            pending.append(pool.apply_async(encode_worker, args=(path, opt)))
+            if len(pending) >= 2 * opt['n_thread']:
+                write(pending.popleft().get())
+        while pending:
+            write(pending.popleft().get())
+        pool.close()
+        pool.join()
+        completed = True
+    finally:
+        pool.terminate()
+        pbar.close()
+        try:
+            maker.close()
+        finally:
+            # A partial folder would make the next run exit because the folder exists
+            if not completed:
+                print(f'Extraction failed. Remove {save_folder}.')
+                shutil.rmtree(save_folder, ignore_errors=True)
+    print('All processes done.')
 
+
+def crop_subimages(img, crop_size, step, thresh_size):
+    """Crop an image with an overlapped sliding window.
+
+    Returns:
+        list[ndarray]: Sub-images, row by row.
+    """
     h, w = img.shape[0:2]
     h_space = np.arange(0, h - crop_size + 1, step)
     if h - (h_space[-1] + crop_size) > thresh_size:
@@ -139,18 +203,77 @@ def worker(path, opt):
     if w - (w_space[-1] + crop_size) > thresh_size:
         w_space = np.append(w_space, w - crop_size)
 
-    index = 0
+    cropped_imgs = []
     for x in h_space:
         for y in w_space:
-            index += 1
             cropped_img = img[x:x + crop_size, y:y + crop_size, ...]
-            cropped_img = np.ascontiguousarray(cropped_img)
-            cv2.imwrite(
-                osp.join(opt['save_folder'], f'{img_name}_s{index:03d}{extension}'), cropped_img,
-                [cv2.IMWRITE_PNG_COMPRESSION, opt['compression_level']])
+            cropped_imgs.append(np.ascontiguousarray(cropped_img))
+    return cropped_imgs
+
+
+def _read_image(path):
+    img_name, extension = osp.splitext(osp.basename(path))
+    # remove the x2, x3, x4 and x8 in the filename for DIV2K
+    img_name = img_name.replace('x2', '').replace('x3', '').replace('x4', '').replace('x8', '')
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    return img, img_name, extension
+
+
+def worker(path, opt):
+    """Worker for each process.
+
+    Args:
+        path (str): Image path.
+        opt (dict): Configuration dict. It contains:
+        crop_size (int): Crop size.
+        step (int): Step for overlapped sliding window.
+        thresh_size (int): Threshold size. Patches whose size is lower than thresh_size will be dropped.
+        save_folder (str): Path to save folder.
+        compression_level (int): for cv2.IMWRITE_PNG_COMPRESSION.
+
+    Returns:
+        process_info (str): Process information displayed in progress bar.
+    """
+    img, img_name, extension = _read_image(path)
+    cropped_imgs = crop_subimages(img, opt['crop_size'], opt['step'], opt['thresh_size'])
+    for index, cropped_img in enumerate(cropped_imgs, 1):
+        cv2.imwrite(
+            osp.join(opt['save_folder'], f'{img_name}_s{index:03d}{extension}'), cropped_img,
+            [cv2.IMWRITE_PNG_COMPRESSION, opt['compression_level']])
     process_info = f'Processing {img_name} ...'
     return process_info
 
 
+def encode_worker(path, opt):
+    """Worker for each process when writing into an lmdb or a shard folder.
+
+    Args:
+        path (str): Image path.
+        opt (dict): Configuration dict, see `extract_subimages_to_store`.
+
+    Returns:
+        list[tuple]: (key, content, shape) of each sub-image. The content is the png bytes
+            for lmdb and the image itself for shards.
+    """
+    img, img_name, _ = _read_image(path)
+    crop_size, step, thresh_size = opt['crop_size'], opt['step'], opt['thresh_size']
+    scale = opt.get('scale')
+    if scale:
+        img = imresize(img / 255., 1 / scale)
+        img = np.clip((img * 255.0).round(), 0, 255).astype(np.uint8)
+        crop_size, step, thresh_size = crop_size // scale, step // scale, thresh_size // scale
+
+    results = []
+    for index, cropped_img in enumerate(crop_subimages(img, crop_size, step, thresh_size), 1):
+        h, w = cropped_img.shape[0:2]
+        c = 1 if cropped_img.ndim == 2 else cropped_img.shape[2]
+        if opt['save_folder'].endswith('.lmdb'):
+            _, content = cv2.imencode('.png', cropped_img, [cv2.IMWRITE_PNG_COMPRESSION, opt['compression_level']])
+        else:
+            content = cropped_img
+        results.append((f'{img_name}_s{index:03d}', content, (h, w, c)))
+    return results
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,76 @@
+import pytest
+import torch
+from torch import nn as nn
+
+from basicsr.archs.arch_util import pad_to_window, tile_forward
+from basicsr.archs.srvgg_arch import SRVGGNetCompact
+
+
+class PointwiseUpsampler(nn.Module):
+    """A network whose receptive field is one pixel, so tiling must not change its output."""
+
+    def __init__(self, window_size=None):
+        super(PointwiseUpsampler, self).__init__()
+        self.conv = nn.Conv2d(3, 3 * 4, 1)
+        self.upsampler = nn.PixelShuffle(2)
+        self.window_size = window_size
+
+    def forward(self, x):
+        if self.window_size is not None:
+            assert x.size(-2) % self.window_size == 0 and x.size(-1) % self.window_size == 0
+        return self.upsampler(self.conv(x))
+
+
+def test_pad_to_window():
+    """Test function: pad_to_window."""
+    img = torch.rand((1, 3, 13, 16), dtype=torch.float32)
+    out, mod_pad_h, mod_pad_w = pad_to_window(img, 8)
+    assert out.shape == (1, 3, 16, 16)
+    assert (mod_pad_h, mod_pad_w) == (3, 0)
+    assert torch.equal(out[:, :, :13, :], img)
+
+    out, mod_pad_h, mod_pad_w = pad_to_window(img, None)
+    assert out is img and mod_pad_h == 0 and mod_pad_w == 0
+
+
+@pytest.mark.parametrize('blend', ['linear', 'feather'])
+def test_tile_forward(blend):
+    """Test function: tile_forward."""
+    net = PointwiseUpsampler().eval()
+    img = torch.rand((2, 3, 37, 50), dtype=torch.float32)
+    with torch.no_grad():
+        expected = net(img)
+        output = tile_forward(net, img, tile_size=16, tile_overlap=4, blend=blend)
+    assert output.shape == (2, 3, 74, 100)
+    assert torch.allclose(output, expected, atol=1e-6)
+
+    # with padding to multiples of the window size
+    net.window_size = 8
+    with torch.no_grad():
+        output = tile_forward(net, img, tile_size=20, tile_overlap=6, scale=2, window_size=8, blend=blend)
+    assert torch.allclose(output, expected, atol=1e-6)
+
+    # image smaller than a tile
+    with torch.no_grad():
+        output = tile_forward(net, img, tile_size=64, tile_overlap=8, window_size=8, blend=blend)
+    assert torch.allclose(output, expected, atol=1e-6)
+
+
+def test_tile_forward_seams():
+    """Test function: tile_forward with a network that has a large receptive field."""
+    net = SRVGGNetCompact(num_in_ch=3, num_out_ch=3, num_feat=4, num_conv=2, upscale=2).eval()
+    img = torch.rand((1, 3, 40, 40), dtype=torch.float32)
+    with torch.no_grad():
+        expected = net(img)
+        output = tile_forward(net, img, tile_size=24, tile_overlap=8)
+        output_no_overlap = tile_forward(net, img, tile_size=24, tile_overlap=0)
+    assert output.shape == expected.shape
+    # blending the overlaps reduces the seam errors caused by the tile borders
+    assert (output - expected).abs().max() < (output_no_overlap - expected).abs().max()
+    # far from the seams, the output is exact
+    assert torch.allclose(output[:, :, :16, :16], expected[:, :, :16, :16], atol=1e-5)
+
+    with pytest.raises(ValueError):
+        tile_forward(net, img, tile_size=8, tile_overlap=8)
+    with pytest.raises(ValueError):
+        tile_forward(net, img, tile_size=24, tile_overlap=8, blend='gaussian')
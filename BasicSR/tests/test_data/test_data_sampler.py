@@ -0,0 +1,54 @@
+import numpy as np
+
+from basicsr.data.data_sampler import ClipLocalitySampler
+from basicsr.data.data_util import FrameCache
+
+
+class ClipDataset(object):
+
+    def __init__(self, num_clips=6, num_frames=20):
+        self.keys = [f'{clip:03d}/{frame:08d}' for clip in range(num_clips) for frame in range(num_frames)]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def test_clip_locality_sampler():
+    """Test sampler: ClipLocalitySampler"""
+    dataset = ClipDataset()
+    num_workers, batch_size = 2, 3
+    sampler = ClipLocalitySampler(dataset, 1, 0, ratio=2, num_workers=num_workers, batch_size=batch_size, chunk_size=6)
+    indices = list(sampler)
+    assert len(indices) == len(sampler) == 240
+    # every sample is drawn twice (up to the repeated frames of the shorter chunks)
+    assert len(set(indices)) >= 110
+
+    # the same slot of the successive batches of a worker reads neighboring frames of the same clip
+    batches = [indices[i:i + batch_size] for i in range(0, 36, batch_size)]
+    for worker in range(num_workers):
+        worker_batches = batches[worker::num_workers]
+        for t in range(1, 5):
+            for slot in range(batch_size):
+                prev, cur = dataset.keys[worker_batches[t - 1][slot]], dataset.keys[worker_batches[t][slot]]
+                assert prev.split('/')[0] == cur.split('/')[0]
+                assert int(cur.split('/')[1]) == int(prev.split('/')[1]) + 1
+
+    # distributed: each replica gets its own samples
+    samplers = [ClipLocalitySampler(dataset, 2, rank, num_workers=2, batch_size=2) for rank in range(2)]
+    assert all(len(list(sampler)) == 60 for sampler in samplers)
+
+
+def test_frame_cache():
+    """Test function: FrameCache"""
+    cache = FrameCache(max_bytes=250)
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return np.zeros(100, dtype=np.uint8)
+
+    for key in [0, 1, 0, 2, 1]:
+        cache.get(key, lambda: load(key))
+    # 1 is the least recently used frame when 2 is added
+    assert loads == [0, 1, 2, 1]
+    assert cache.nbytes == 200 and (cache.hits, cache.misses) == (1, 4)
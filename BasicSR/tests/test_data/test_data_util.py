@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+from os import path as osp
+
+from basicsr.data.data_util import read_img_seq
+from basicsr.data.transforms import mod_crop
+from basicsr.utils import img2tensor
+
+
+@pytest.mark.parametrize('num_threads', [1, 3])
+def test_read_img_seq(tmp_path, num_threads):
+    """Test function: read_img_seq"""
+    rng = np.random.default_rng(0)
+    for idx in range(5):
+        cv2.imwrite(str(tmp_path / f'{idx:08d}.png'), rng.integers(0, 256, (18, 23, 3), dtype=np.uint8))
+    img_paths = sorted(str(path) for path in tmp_path.iterdir())
+
+    # the same result as decoding, cropping and stacking the frames one by one
+    expected = [mod_crop(cv2.imread(path).astype(np.float32) / 255., 4) for path in img_paths]
+    expected = torch.stack(img2tensor(expected, bgr2rgb=True, float32=True), dim=0)
+    imgs, imgnames = read_img_seq(
+        str(tmp_path), require_mod_crop=True, scale=4, return_imgname=True, num_threads=num_threads)
+    assert imgs.shape == (5, 3, 16, 20)
+    assert torch.equal(imgs, expected)
+    assert imgnames == [osp.splitext(osp.basename(path))[0] for path in img_paths]
+
+    # frames of different sizes
+    cv2.imwrite(img_paths[2], np.zeros((8, 8, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        read_img_seq(img_paths, num_threads=num_threads)
@@ -0,0 +1,140 @@
+import cv2
+import math
+import numpy as np
+import pytest
+import torch
+
+from basicsr.data.degradations import (bivariate_Gaussian, bivariate_generalized_Gaussian, bivariate_kernels_pt,
+                                       bivariate_plateau, circular_lowpass_kernel, circular_lowpass_kernel_pt,
+                                       generate_poisson_noise_pt, random_add_poisson_noise_pt, rgb_to_grayscale)
+from basicsr.data.realesrgan_dataset import RealESRGANDataset, make_kernel_bank, random_realesrgan_kernels_pt
+
+
+def _pad(kernel, pad_to=21):
+    pad_size = (pad_to - kernel.shape[0]) // 2
+    return np.pad(kernel, ((pad_size, pad_size), (pad_size, pad_size)))
+
+
+def test_bivariate_kernels_pt():
+    """Test function: bivariate_kernels_pt"""
+    params = [(7, 0.5, 0.5, 0., 1., False), (13, 1.2, 2.2, 0.7, 1., False), (21, 3., 1., -2.5, 0.6, False),
+              (9, 2., 0.7, 1., 1.7, True)]
+    expected = [
+        bivariate_Gaussian(7, 0.5, 0.5, 0., isotropic=True),
+        bivariate_Gaussian(13, 1.2, 2.2, 0.7, isotropic=False),
+        bivariate_generalized_Gaussian(21, 3., 1., -2.5, 0.6, isotropic=False),
+        bivariate_plateau(9, 2., 0.7, 1., 1.7, isotropic=False)
+    ]
+    kernel_size, sig_x, sig_y, theta, beta, plateau = (torch.tensor(v, dtype=torch.float64) for v in zip(*params))
+    kernels = bivariate_kernels_pt(kernel_size.long(), sig_x, sig_y, theta, beta, plateau.bool())
+    assert kernels.shape == (4, 21, 21)
+    for kernel, expected_kernel in zip(kernels.numpy(), expected):
+        np.testing.assert_allclose(kernel, _pad(expected_kernel), atol=1e-12)
+
+    # the Bessel function of PyTorch differs slightly from the one of scipy
+    kernels = circular_lowpass_kernel_pt(torch.tensor([1., 2.5], dtype=torch.float64), torch.tensor([7, 21]))
+    np.testing.assert_allclose(kernels[0].numpy(), _pad(circular_lowpass_kernel(1., 7)), rtol=1e-5, atol=1e-9)
+    np.testing.assert_allclose(kernels[1].numpy(), circular_lowpass_kernel(2.5, 21), rtol=1e-5, atol=1e-9)
+
+
+def test_circular_lowpass_kernel_pt_without_torch_special(monkeypatch):
+    """Test function: circular_lowpass_kernel_pt falls back to scipy without torch.special (PyTorch < 1.9)"""
+    monkeypatch.delattr(torch, 'special')
+    kernels = circular_lowpass_kernel_pt(torch.tensor([1., 2.5], dtype=torch.float64), torch.tensor([7, 21]))
+    np.testing.assert_allclose(kernels[0].numpy(), _pad(circular_lowpass_kernel(1., 7)), atol=1e-12)
+    np.testing.assert_allclose(kernels[1].numpy(), circular_lowpass_kernel(2.5, 21), atol=1e-12)
+
+
+def test_random_realesrgan_kernels_pt():
+    """Test function: random_realesrgan_kernels_pt"""
+    kernel_opt = dict(
+        kernel_list=['iso', 'aniso', 'generalized_iso', 'generalized_aniso', 'plateau_iso', 'plateau_aniso'],
+        kernel_prob=[0.45, 0.25, 0.12, 0.03, 0.12, 0.03],
+        sinc_prob=0.1,
+        blur_sigma=[0.2, 3],
+        betag_range=[0.5, 4],
+        betap_range=[1, 2])
+    opt = dict(kernel_opt, final_sinc_prob=0.8)
+    opt.update({f'{k}2': v for k, v in kernel_opt.items()})
+
+    torch.manual_seed(0)
+    kernels = random_realesrgan_kernels_pt(opt, 64)
+    for key in ['kernel1', 'kernel2', 'sinc_kernel']:
+        assert kernels[key].shape == (64, 21, 21) and kernels[key].dtype == torch.float32
+        assert torch.isfinite(kernels[key]).all()
+        torch.testing.assert_close(kernels[key].sum(dim=(1, 2)), torch.ones(64))
+    # pulse kernels for the samples without a final sinc filter
+    pulse = torch.zeros(21, 21)
+    pulse[10, 10] = 1
+    num_pulse = sum(torch.equal(kernel, pulse) for kernel in kernels['sinc_kernel'])
+    assert 0 < num_pulse < 64
+    assert math.isclose(kernels['kernel1'][:, 10, 10].max().item(), kernels['kernel1'].amax().item())
+
+
+def test_kernel_bank(tmp_path):
+    """Test dataset: RealESRGANDataset with a kernel bank"""
+    cv2.imwrite(str(tmp_path / 'gt.png'), np.zeros((32, 32, 3), dtype=np.uint8))
+    (tmp_path / 'meta_info.txt').write_text('gt.png\n')
+    kernel_opt = dict(
+        kernel_list=['iso', 'aniso', 'generalized_iso', 'generalized_aniso', 'plateau_iso', 'plateau_aniso'],
+        kernel_prob=[0.45, 0.25, 0.12, 0.03, 0.12, 0.03],
+        sinc_prob=0.1,
+        blur_sigma=[0.2, 3],
+        betag_range=[0.5, 4],
+        betap_range=[1, 2],
+        blur_kernel_size=21)
+    opt = dict(
+        kernel_opt,
+        dataroot_gt=str(tmp_path),
+        meta_info=str(tmp_path / 'meta_info.txt'),
+        io_backend={'type': 'disk'},
+        use_hflip=True,
+        use_rot=False,
+        final_sinc_prob=0.8,
+        kernel_bank=str(tmp_path / 'kernel_bank.npy'),
+        kernel_bank_size=100)
+    opt.update({f'{k}2': v for k, v in kernel_opt.items()})
+
+    dataset = RealESRGANDataset(dict(opt))
+    bank = np.load(opt['kernel_bank'])
+    assert bank.shape == (100, 3, 21, 21)
+    # the same seed gives the same bank
+    make_kernel_bank(opt, str(tmp_path / 'kernel_bank2.npy'), num_kernels=100)
+    np.testing.assert_array_equal(np.load(str(tmp_path / 'kernel_bank2.npy')), bank)
+
+    data = dataset[0]
+    for j, key in enumerate(['kernel1', 'kernel2', 'sinc_kernel']):
+        assert any(np.array_equal(data[key].numpy(), kernel) for kernel in bank[:, j])
+
+    # a bank made with other kernel settings, size or seed
+    for changed in [dict(sinc_prob=0.2), dict(kernel_bank_size=200), dict(kernel_bank_seed=1)]:
+        with pytest.raises(ValueError):
+            RealESRGANDataset(dict(opt, io_backend={'type': 'disk'}, **changed))
+
+
+def test_generate_poisson_noise_pt():
+    """Test function: generate_poisson_noise_pt"""
+    torch.manual_seed(0)
+    img = torch.rand(4, 3, 32, 32)
+    # images with few unique values
+    img[1] = torch.randint(0, 5, (3, 32, 32)) / 4.
+    img[2] = 0.5
+    scale = torch.tensor([0.5, 1., 2., 3.])
+    gray_noise = torch.tensor([0., 1., 0., 1.])
+
+    # reference: count the unique values of each sample with torch.unique
+    def _poisson_noise(img):
+        img = torch.clamp((img * 255.0).round(), 0, 255) / 255.
+        vals = img.new_tensor([2**np.ceil(np.log2(len(torch.unique(sample)))) for sample in img]).view(-1, 1, 1, 1)
+        return torch.poisson(img * vals) / vals - img
+
+    torch.manual_seed(1)
+    noise_gray = _poisson_noise(rgb_to_grayscale(img, num_output_channels=1)).expand(4, 3, 32, 32)
+    noise = _poisson_noise(img)
+    gray_noise_ = gray_noise.view(4, 1, 1, 1)
+    expected = (noise * (1 - gray_noise_) + noise_gray * gray_noise_) * scale.view(4, 1, 1, 1)
+    torch.manual_seed(1)
+    torch.testing.assert_close(generate_poisson_noise_pt(img, scale, gray_noise), expected, rtol=0, atol=0)
+
+    out = random_add_poisson_noise_pt(img, scale_range=(0.05, 3), gray_prob=0.4)
+    assert out.shape == img.shape and 0 <= out.min() and out.max() <= 1
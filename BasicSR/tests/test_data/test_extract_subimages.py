@@ -0,0 +1,61 @@
+import cv2
+import importlib.util
+import numpy as np
+import os
+import pytest
+import sys
+
+from basicsr.utils import FileClient, imfrombytes
+
+
+def load_extract_subimages():
+    """The data preparation scripts are not a package, so load the script from its path."""
+    name = 'extract_subimages'
+    if name not in sys.modules:
+        path = os.path.join(os.path.dirname(__file__), '../../scripts/data_preparation/extract_subimages.py')
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        # registered, so that the pool can pickle the workers
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+def make_opt(input_folder, save_folder):
+    return dict(
+        input_folder=input_folder,
+        save_folder=save_folder,
+        n_thread=1,
+        compression_level=3,
+        crop_size=16,
+        step=8,
+        thresh_size=0)
+
+
+@pytest.mark.parametrize('suffix', ['.lmdb', '.shards'])
+def test_extract_subimages_to_store(tmp_path, suffix):
+    """Test function: extract_subimages_to_store, and the cleanup after a failed run."""
+    extract_subimages = load_extract_subimages()
+    input_folder = str(tmp_path / 'gt')
+    os.makedirs(input_folder)
+    img = np.random.RandomState(0).randint(0, 256, (24, 32, 3), dtype=np.uint8)
+    cv2.imwrite(os.path.join(input_folder, '0001.png'), img)
+
+    # an unreadable image fails the run, and the partial folder is removed
+    with open(os.path.join(input_folder, '0002.png'), 'wb') as f:
+        f.write(b'not a png')
+    save_folder = str(tmp_path / f'gt_sub{suffix}')
+    with pytest.raises(Exception):
+        extract_subimages.extract_subimages_to_store(make_opt(input_folder, save_folder))
+    assert not os.path.exists(save_folder)
+
+    os.remove(os.path.join(input_folder, '0002.png'))
+    extract_subimages.extract_subimages_to_store(make_opt(input_folder, save_folder))
+    crops = extract_subimages.crop_subimages(img, 16, 8, 0)
+    assert len(crops) == 6
+    backend = suffix[1:]
+    file_client = FileClient(backend, db_paths=save_folder, client_keys='gt')
+    for index, crop in enumerate(crops, 1):
+        np.testing.assert_array_equal(imfrombytes(file_client.get(f'0001_s{index:03d}', 'gt')), crop)
+    if backend == 'lmdb':
+        file_client.client.close()
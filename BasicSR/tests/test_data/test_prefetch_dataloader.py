@@ -0,0 +1,60 @@
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+from basicsr.data.prefetch_dataloader import PinnedPrefetcher
+
+
+class DictDataset(object):
+
+    def __init__(self, num=10, fail_at=None):
+        self.num = num
+        self.fail_at = fail_at
+
+    def __getitem__(self, index):
+        if index == self.fail_at:
+            raise RuntimeError('failed to load')
+        return {'lq': torch.full((3, 4, 4), float(index)), 'lq_path': f'{index}.png'}
+
+    def __len__(self):
+        return self.num
+
+
+def test_pinned_prefetcher():
+    """Test function: PinnedPrefetcher"""
+    loader = DataLoader(DictDataset(), batch_size=2, shuffle=False)
+    prefetcher = PinnedPrefetcher(loader, {'num_gpu': 0}, num_prefetch_queue=2)
+
+    for _ in range(2):
+        prefetcher.reset()
+        batches, pointers = [], []
+        batch = prefetcher.next()
+        while batch is not None:
+            # copy, since the buffers are reused by the following batches
+            batches.append((batch['lq'].clone(), batch['lq_path']))
+            pointers.append(batch['lq'].data_ptr())
+            batch = prefetcher.next()
+        assert len(batches) == 5
+        for (lq, lq_path), expected in zip(batches, loader):
+            assert torch.equal(lq, expected['lq'])
+            assert lq_path == expected['lq_path']
+        # three buffer sets are enough for two batches in flight
+        assert len(set(pointers)) == 3
+
+    stats = prefetcher.get_stats()
+    assert set(stats.keys()) == {'data_stall', 'queue_depth'}
+    assert 0 <= stats['queue_depth'] <= 2
+    assert prefetcher.get_stats() == {'data_stall': 0, 'queue_depth': 0}
+
+    # stop in the middle of an epoch
+    prefetcher.reset()
+    prefetcher.next()
+    prefetcher.close()
+
+    # errors of the dataloader are raised by next()
+    prefetcher = PinnedPrefetcher(
+        DataLoader(DictDataset(fail_at=3), batch_size=2, shuffle=False), {'num_gpu': 0}, num_prefetch_queue=2)
+    prefetcher.reset()
+    prefetcher.next()
+    with pytest.raises(RuntimeError):
+        prefetcher.next()
@@ -0,0 +1,37 @@
+import lmdb
+import pickle
+import pytest
+
+from basicsr.utils import FileClient, imfrombytes
+
+
+def read_lmdb(keys):
+    env = lmdb.open('tests/data/gt.lmdb', readonly=True, lock=False)
+    with env.begin(write=False) as txn:
+        values = [txn.get(key.encode('ascii')) for key in keys]
+    env.close()
+    return values
+
+
+@pytest.mark.parametrize('read_mode', [{}, {'persistent_txn': True}, {'zero_copy': True}])
+def test_lmdb_backend(read_mode):
+    """Test function: LmdbBackend with the different read modes."""
+    baboon, comic = read_lmdb(['baboon', 'comic'])
+    file_client = FileClient('lmdb', db_paths=['tests/data/gt.lmdb'], client_keys=['gt'], **read_mode)
+
+    value = file_client.get('baboon', 'gt')
+    assert isinstance(value, memoryview if read_mode.get('zero_copy') else bytes)
+    assert bytes(value) == baboon
+    assert imfrombytes(value).shape == (480, 492, 3)
+
+    values = file_client.get_many(['comic', 'missing', 'baboon'], 'gt')
+    assert bytes(values[0]) == comic
+    assert values[1] is None
+    assert bytes(values[2]) == baboon
+
+    # the envs are reopened after unpickling (e.g., in spawned DataLoader workers)
+    state = pickle.dumps(file_client.client)
+    file_client.client.close()
+    restored = pickle.loads(state)
+    assert bytes(restored.get('comic', 'gt')) == comic
+    restored.close()
@@ -0,0 +1,75 @@
+import pytest
+import torch
+
+from basicsr.data.degradations import bivariate_kernels_pt, circular_lowpass_kernel_pt
+from basicsr.utils.img_process_util import TrainingPairPool, USMSharp, filter2D
+
+
+@pytest.mark.parametrize('size', [(17, 23), (140, 128)])
+def test_filter2D(size):
+    """Test function: filter2D"""
+    torch.manual_seed(0)
+    img = torch.rand(4, 3, *size)
+    ones = torch.ones(4)
+    # isotropic and axis-aligned Gaussian kernels are rank-1
+    gaussian = bivariate_kernels_pt(
+        torch.tensor([7, 11, 21, 21]), torch.tensor([0.5, 1., 2., 3.]), torch.tensor([0.5, 1., 1., 3.]), ones * 0, ones,
+        torch.zeros(4, dtype=torch.bool)).float()
+    sinc = circular_lowpass_kernel_pt(torch.tensor([1., 1.5, 2., 3.]), torch.tensor([21, 21, 21, 21])).float()
+    rand = torch.rand(4, 21, 21)
+    rand = rand / rand.sum(dim=(1, 2), keepdim=True)
+
+    for kernel, modes in [(gaussian, ['auto', 'fft', 'separable']), (gaussian[:1], ['auto', 'fft', 'separable']),
+                          (sinc, ['auto', 'fft']), (rand, ['auto', 'fft']), (rand[:1], ['auto', 'fft'])]:
+        expected = filter2D(img, kernel, mode='direct')
+        for mode in modes:
+            torch.testing.assert_close(filter2D(img, kernel, mode=mode), expected, rtol=0, atol=1e-5)
+
+    with pytest.raises(ValueError):
+        filter2D(img, rand, mode='separable')
+
+
+def test_usm_sharp():
+    """Test class: USMSharp"""
+    torch.manual_seed(0)
+    img = torch.rand(2, 3, 64, 64)
+    usm_sharpener = USMSharp()
+    assert 'kernel_1d' not in usm_sharpener.state_dict()
+
+    # the reference implementation with the 2D kernel
+    blur = filter2D(img, usm_sharpener.kernel, mode='direct')
+    residual = img - blur
+    soft_mask = filter2D((torch.abs(residual) * 255 > 10).float(), usm_sharpener.kernel, mode='direct')
+    sharp = torch.clip(img + 0.5 * residual, 0, 1)
+    expected = soft_mask * sharp + (1 - soft_mask) * img
+    torch.testing.assert_close(usm_sharpener(img), expected, rtol=0, atol=1e-5)
+
+
+def test_training_pair_pool():
+    """Test class: TrainingPairPool"""
+    torch.manual_seed(0)
+    pool = TrainingPairPool(queue_size=6, pin_memory=True)
+    # the sample index is stored in the values, so that lq and gt pairs can be checked
+    batches = [(torch.arange(i, i + 2).view(2, 1, 1, 1).expand(2, 3, 4, 4).float(),
+                torch.arange(i, i + 2).view(2, 1, 1, 1).expand(2, 3, 16, 16).float()) for i in range(0, 20, 2)]
+
+    # fill the pool
+    for lq, gt in batches[:3]:
+        lq_out, gt_out = pool.dequeue_and_enqueue(lq, gt)
+        assert lq_out is lq and gt_out is gt
+    # no GPU, so the pool is on the device of the batches
+    assert all(queue.device == lq.device for queue in pool.queues)
+    queue_ptrs = [queue.data_ptr() for queue in pool.queues]
+
+    seen = set(range(6))
+    for lq, gt in batches[3:]:
+        lq_out, gt_out = pool.dequeue_and_enqueue(lq, gt)
+        assert lq_out.shape == lq.shape and gt_out.shape == gt.shape
+        lq_idx, gt_idx = lq_out[:, 0, 0, 0].tolist(), gt_out[:, 0, 0, 0].tolist()
+        assert lq_idx == gt_idx
+        # every sample is dequeued only once
+        assert set(lq_idx) <= seen
+        seen = (seen - set(lq_idx)) | set(lq[:, 0, 0, 0].tolist())
+        assert set(pool.queues[0][:, 0, 0, 0].tolist()) == seen
+    # the samples are swapped in place
+    assert [queue.data_ptr() for queue in pool.queues] == queue_ptrs
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+import random
+
+from basicsr.data.transforms import paired_random_crop
+from basicsr.utils import imfrombytes, imfrombytes_for_crop
+
+
+@pytest.mark.parametrize('channels', [1, 3, 4])
+def test_imfrombytes_for_crop(channels):
+    """Test function: imfrombytes_for_crop"""
+    rng = np.random.default_rng(0)
+    img_gt = rng.integers(0, 256, (64, 48, channels), dtype=np.uint8)
+    img_lq = rng.integers(0, 256, (16, 12, channels), dtype=np.uint8)
+    # encoded images (disk, lmdb) and decoded ones (shards, shm cache)
+    contents = [(cv2.imencode('.png', img_gt)[1].tobytes(), cv2.imencode('.png', img_lq)[1].tobytes()),
+                (img_gt, img_lq)]
+
+    for gt_content, lq_content in contents:
+        random.seed(0)
+        expected = paired_random_crop(
+            imfrombytes(gt_content, float32=True), imfrombytes(lq_content, float32=True), 32, 4)
+        random.seed(0)
+        img_gt_crop, img_lq_crop = paired_random_crop(
+            imfrombytes_for_crop(gt_content), imfrombytes_for_crop(lq_content), 32, 4)
+        for img, expected_img in zip([img_gt_crop, img_lq_crop], expected):
+            img = imfrombytes(img, float32=True)
+            assert img.dtype == np.float32
+            np.testing.assert_array_equal(img, expected_img)
@@ -0,0 +1,143 @@
+import cv2
+import numpy as np
+import os
+import tempfile
+import threading
+import torch
+from PIL import Image
+from torch.nn import functional as F
+
+from basicsr.utils.img_util import img2tensor, tensor2img
+from basicsr.utils.inference_util import batch_inference, bucket_by_shape, get_image_size
+
+
+def _make_images(folder, sizes):
+    paths = []
+    for idx, (h, w) in enumerate(sizes):
+        path = os.path.join(folder, f'{idx:03d}.png')
+        cv2.imwrite(path, np.random.randint(0, 255, (h, w, 3), dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+def test_bucket_by_shape():
+    """Test function: bucket_by_shape"""
+    with tempfile.TemporaryDirectory() as folder:
+        paths = _make_images(folder, [(16, 16), (20, 12), (16, 16), (16, 16), (15, 14)])
+
+        batches = bucket_by_shape(paths, batch_size=2)
+        assert [(shape, [path for path, _ in items]) for shape, items in batches] == [
+            ((16, 16), [paths[0], paths[2]]),
+            ((16, 16), [paths[3]]),
+            ((20, 12), [paths[1]]),
+            ((15, 14), [paths[4]]),
+        ]
+
+        # sizes are rounded up to multiples of pad_multiple
+        batches = bucket_by_shape(paths, batch_size=4, pad_multiple=8)
+        assert [(shape, len(items)) for shape, items in batches] == [((16, 16), 4), ((24, 16), 1)]
+        assert batches[0][1][3] == (paths[4], (15, 14))
+
+
+def test_batch_inference():
+    """Test function: batch_inference"""
+    with tempfile.TemporaryDirectory() as folder:
+        sizes = [(16, 16), (20, 12), (16, 16), (16, 16), (15, 14)]
+        paths = _make_images(folder, sizes)
+        batch_sizes = []
+        results = {}
+        lock = threading.Lock()
+
+        def read_fn(path):
+            return img2tensor(cv2.imread(path), bgr2rgb=True, float32=True) / 255.
+
+        def forward_fn(imgs):
+            assert imgs.size(-2) % 8 == 0 and imgs.size(-1) % 8 == 0
+            batch_sizes.append(imgs.size(0))
+            return F.interpolate(imgs, scale_factor=2, mode='nearest')
+
+        def write_fn(output, path):
+            with lock:
+                results[path] = tensor2img(output)
+
+        num = batch_inference(
+            paths, read_fn, forward_fn, write_fn, torch.device('cpu'), batch_size=3, pad_multiple=8, num_workers=2)
+        assert num == 5
+        assert sorted(batch_sizes) == [1, 1, 3]
+        for path, (h, w) in zip(paths, sizes):
+            expected = cv2.resize(cv2.imread(path), (w * 2, h * 2), interpolation=cv2.INTER_NEAREST)
+            assert results[path].shape == (h * 2, w * 2, 3)
+            np.testing.assert_array_equal(results[path], expected)
+
+
+def test_batch_inference_errors():
+    """Test function: batch_inference with unreadable images and failing forward passes"""
+    with tempfile.TemporaryDirectory() as folder:
+        paths = _make_images(folder, [(16, 16)] * 4)
+        # not an image
+        with open(os.path.join(folder, 'broken.png'), 'wb') as f:
+            f.write(b'not an image')
+        # a valid header, but the image data is truncated
+        with open(paths[0], 'rb') as f:
+            content = f.read()
+        with open(paths[0], 'wb') as f:
+            f.write(content[:len(content) // 2])
+        results = {}
+        lock = threading.Lock()
+
+        def read_fn(path):
+            img = img2tensor(cv2.imread(path), bgr2rgb=True, float32=True) / 255.
+            if path == paths[3]:
+                # mark the image that fails in forward_fn
+                img[0, 0, 0] = -1
+            return img
+
+        def forward_fn(imgs):
+            # fails for the whole batch, and then for the marked image alone
+            if (imgs[:, 0, 0, 0] == -1).any():
+                raise RuntimeError('forward failed')
+            return imgs
+
+        def write_fn(output, path):
+            with lock:
+                results[path] = output
+
+        num = batch_inference(
+            paths + [os.path.join(folder, 'broken.png')],
+            read_fn,
+            forward_fn,
+            write_fn,
+            torch.device('cpu'),
+            batch_size=4,
+            num_workers=2)
+        assert num == 2
+        assert sorted(results.keys()) == paths[1:3]
+
+
+def test_batch_inference_orientation():
+    """Test function: batch_inference with images whose decoded size differs from the one in the header"""
+    with tempfile.TemporaryDirectory() as folder:
+        paths = _make_images(folder, [(30, 40)] * 2)
+        # stored 40 wide and 30 tall, rotated to 30 wide and 40 tall by cv2.imread
+        rotated_path = os.path.join(folder, 'rotated.jpg')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.fromarray(np.random.randint(0, 255, (30, 40, 3), dtype=np.uint8)).save(rotated_path, exif=exif)
+        assert get_image_size(rotated_path) == cv2.imread(rotated_path).shape[:2] == (40, 30)
+        results = {}
+        lock = threading.Lock()
+
+        def read_fn(path):
+            img = img2tensor(cv2.imread(path), bgr2rgb=True, float32=True) / 255.
+            # the decoded size of paths[1] does not match its header
+            return img.transpose(1, 2) if path == paths[1] else img
+
+        def write_fn(output, path):
+            with lock:
+                results[path] = output
+
+        num = batch_inference(
+            paths + [rotated_path], read_fn, lambda imgs: imgs, write_fn, torch.device('cpu'), batch_size=3)
+        assert num == 3
+        for path in paths + [rotated_path]:
+            torch.testing.assert_close(results[path], read_fn(path), rtol=0, atol=0)
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+import os
+import pytest
+
+from basicsr.utils import FileClient
+from basicsr.utils.lmdb_util import make_sharded_lmdb_from_imgs
+
+
+@pytest.mark.parametrize('num_shards', [1, 3])
+def test_make_sharded_lmdb_from_imgs(tmp_path, num_shards):
+    """Test function: make_sharded_lmdb_from_imgs, resuming an interrupted building."""
+    data_path = str(tmp_path / 'imgs')
+    os.makedirs(data_path)
+    rng = np.random.RandomState(0)
+    imgs = [rng.randint(0, 256, (16, 16, 3), dtype=np.uint8) for _ in range(10)]
+    img_paths = [f'{i:02d}.png' for i in range(10)]
+    keys = [f'{i:02d}' for i in range(10)]
+    # the 8th image is missing, so the first building fails after the checkpoint of the first 6 images
+    for img, img_path in zip(imgs, img_paths):
+        if img_path != '07.png':
+            cv2.imwrite(os.path.join(data_path, img_path), img)
+    lmdb_path = str(tmp_path / 'imgs.lmdb')
+    with pytest.raises(Exception):
+        make_sharded_lmdb_from_imgs(data_path, lmdb_path, img_paths, keys, num_shards=num_shards, batch=3, n_thread=2)
+    with open(os.path.join(lmdb_path, 'progress.txt')) as fin:
+        assert fin.read().strip() == '6'
+
+    cv2.imwrite(os.path.join(data_path, '07.png'), imgs[7])
+    make_sharded_lmdb_from_imgs(data_path, lmdb_path, img_paths, keys, num_shards=num_shards, batch=3, n_thread=2)
+    assert not os.path.exists(os.path.join(lmdb_path, 'progress.txt'))
+    assert os.path.exists(os.path.join(lmdb_path, 'shard_002')) == (num_shards == 3)
+    with open(os.path.join(lmdb_path, 'meta_info.txt')) as fin:
+        assert [line.split('.')[0] for line in fin] == keys
+
+    file_client = FileClient('lmdb', db_paths=lmdb_path, client_keys='imgs')
+    for img, key in zip(imgs, keys):
+        img_bytes = file_client.get(key, 'imgs')
+        np.testing.assert_array_equal(cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_UNCHANGED), img)
+    assert len(file_client.get_many(keys, 'imgs')) == 10
+    file_client.client.close()
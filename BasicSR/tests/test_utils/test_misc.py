@@ -0,0 +1,34 @@
+import os
+import time
+
+from basicsr.data.video_test_dataset import frames_by_subfolder
+from basicsr.utils import scandir, scandir_cached
+
+
+def test_scandir_cached(tmp_path):
+    """Test function: scandir_cached"""
+    root = tmp_path / 'data'
+    for clip in ['000', '001']:
+        (root / clip).mkdir(parents=True)
+        for idx in range(3):
+            (root / clip / f'{idx:08d}.png').write_bytes(b'')
+    (root / 'meta_info.txt').write_bytes(b'')
+    index_dir = str(tmp_path / 'index')
+
+    for recursive in [False, True]:
+        for suffix in [None, ('png', 'jpg')]:
+            expected = list(scandir(str(root), suffix=suffix, recursive=recursive, full_path=True))
+            assert scandir_cached(str(root), index_dir, suffix=suffix, recursive=recursive, full_path=True) == expected
+            # loaded from the index
+            assert scandir_cached(str(root), index_dir, suffix=suffix, recursive=recursive, full_path=True) == expected
+    assert len(os.listdir(index_dir)) == 8
+
+    # the index is rebuilt when a subfolder changes
+    time.sleep(0.01)
+    (root / '001' / '00000003.png').write_bytes(b'')
+    paths = scandir_cached(str(root), index_dir, recursive=True)
+    assert sorted(paths) == sorted(scandir(str(root), recursive=True))
+    assert os.path.join('001', '00000003.png') in paths
+
+    frames = frames_by_subfolder(str(root), index_dir)
+    assert frames == {'000': [f'{i:08d}.png' for i in range(3)], '001': [f'{i:08d}.png' for i in range(4)]}
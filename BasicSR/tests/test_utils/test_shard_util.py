@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import os
+
+from basicsr.data.paired_image_dataset import PairedImageDataset
+from basicsr.utils import FileClient, imfrombytes
+from basicsr.utils.shard_util import make_shards_from_imgs
+
+
+def write_images(folder, shapes):
+    os.makedirs(folder)
+    rng = np.random.RandomState(0)
+    for i, shape in enumerate(shapes):
+        cv2.imwrite(os.path.join(folder, f'{i:04d}.png'), rng.randint(0, 256, shape, dtype=np.uint8))
+    return sorted(os.listdir(folder))
+
+
+def test_make_shards_from_imgs(tmp_path):
+    """Test function: make_shards_from_imgs and the shards backend."""
+    folder = str(tmp_path / 'gt')
+    img_paths = write_images(folder, [(32, 40, 3), (16, 16, 3), (20, 24), (24, 24, 3)])
+    keys = [v.split('.png')[0] for v in img_paths]
+    shard_path = str(tmp_path / 'gt.shards')
+    # small shards, so that the images are spread over several files
+    make_shards_from_imgs(folder, shard_path, img_paths, keys, shard_size=4000, n_thread=2)
+    assert os.path.exists(os.path.join(shard_path, 'shard_00001.bin'))
+
+    file_client = FileClient('shards', db_paths=shard_path, client_keys='gt')
+    for img_path, key in zip(img_paths, keys):
+        with open(os.path.join(folder, img_path), 'rb') as f:
+            img_bytes = f.read()
+        img = file_client.get(key, 'gt')
+        assert img.ndim == 3 and img.dtype == np.uint8
+        for flag in ['color', 'unchanged']:
+            np.testing.assert_array_equal(imfrombytes(img, flag), imfrombytes(img_bytes, flag))
+        # libpng rounds differently when converting to grayscale
+        diff = imfrombytes(img, 'grayscale').astype(int) - imfrombytes(img_bytes, 'grayscale')
+        assert np.abs(diff).max() <= 1
+        np.testing.assert_array_equal(imfrombytes(img, float32=True), imfrombytes(img_bytes, float32=True))
+
+
+def test_paired_image_dataset_with_shards(tmp_path):
+    """Test dataset: PairedImageDataset with the shards backend."""
+    for name, size in [('gt', 32), ('lq', 8)]:
+        folder = str(tmp_path / name)
+        img_paths = write_images(folder, [(size, size, 3)] * 3)
+        make_shards_from_imgs(folder, f'{folder}.shards', img_paths, [v.split('.png')[0] for v in img_paths])
+
+    opt = dict(
+        dataroot_gt=str(tmp_path / 'gt.shards'),
+        dataroot_lq=str(tmp_path / 'lq.shards'),
+        io_backend=dict(type='shards'),
+        scale=4,
+        gt_size=16,
+        use_hflip=True,
+        use_rot=True,
+        phase='train')
+    dataset = PairedImageDataset(opt)
+    assert len(dataset) == 3
+    result = dataset[0]
+    assert result['gt'].shape == (3, 16, 16)
+    assert result['lq'].shape == (3, 4, 4)
+    assert result['gt_path'] == '0000'
@@ -0,0 +1,146 @@
+import cv2
+import multiprocessing
+import numpy as np
+import os
+import pytest
+from PIL import Image
+
+from basicsr.utils import FileClient, imfrombytes
+from basicsr.utils.file_client import HardDiskBackend, SharedMemoryCacheBackend
+
+
+class CountingBackend(HardDiskBackend):
+
+    def __init__(self):
+        self.num_reads = 0
+
+    def get(self, filepath):
+        self.num_reads += 1
+        return super(CountingBackend, self).get(filepath)
+
+
+def _read_in_worker(cache, paths, queue):
+    queue.put([cache.get(path).sum() for path in paths] + [cache.backend.num_reads])
+
+
+@pytest.fixture
+def img_paths(tmp_path):
+    paths = []
+    for i in range(4):
+        path = str(tmp_path / f'{i}.png')
+        cv2.imwrite(path, np.random.randint(0, 256, (32, 32, 3), dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+def test_shm_cache(tmp_path, img_paths):
+    """Test function: SharedMemoryCacheBackend."""
+    shm_dir = str(tmp_path / 'shm')
+    os.makedirs(shm_dir)
+    # room for 3 of the 4 images
+    cache = SharedMemoryCacheBackend(CountingBackend(), max_size_mb=3.5 * (32 * 32 * 3 + 16) / 1024**2, shm_dir=shm_dir)
+
+    for path in img_paths[:3]:
+        img = cache.get(path)
+        np.testing.assert_array_equal(imfrombytes(img), cv2.imread(path))
+    for path in img_paths[:3]:
+        cache.get(path)
+    assert cache.backend.num_reads == 3
+
+    # the least recently used image is evicted
+    cache.get(img_paths[1])
+    cache.get(img_paths[2])
+    cache.get(img_paths[3])
+    assert len([name for name in os.listdir(shm_dir) if name != 'basicsr_index']) == 3
+    cache.get(img_paths[0])
+    assert cache.backend.num_reads == 5
+
+    # other processes share the cached images
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_read_in_worker, args=(cache, img_paths[2:], queue))
+    process.start()
+    result = queue.get(timeout=30)
+    process.join()
+    assert result[:2] == [cv2.imread(path).sum() for path in img_paths[2:]]
+    assert result[2] == 5
+
+    cache.clear()
+    assert os.listdir(shm_dir) == []
+
+    # after a crashed writer, files without an index entry are removed when the cache is opened, and index entries
+    # without a file are dropped
+    cache.get(img_paths[0])
+    cache.get(img_paths[1])
+    os.remove(cache._entry(img_paths[1], None, 'color')[1])
+    for name in ['basicsr_0123456789abcdef', 'basicsr_0123456789abcdef.123.tmp']:
+        with open(os.path.join(shm_dir, name), 'wb') as f:
+            f.write(b'orphan')
+    cache = SharedMemoryCacheBackend(CountingBackend(), shm_dir=shm_dir)
+    np.testing.assert_array_equal(imfrombytes(cache.get(img_paths[0])), cv2.imread(img_paths[0]))
+    assert cache.backend.num_reads == 0
+    assert len(os.listdir(shm_dir)) == 2
+    # the image is cached again
+    cache.get(img_paths[1])
+    cache.get(img_paths[1])
+    assert cache.backend.num_reads == 1
+    assert len(os.listdir(shm_dir)) == 3
+    cache.clear()
+
+
+def test_file_client_with_shm_cache(tmp_path, img_paths):
+    """Test function: FileClient with the shm_cache option."""
+    shm_cache = dict(namespace='test', shm_dir=str(tmp_path))
+    file_client = FileClient('disk', shm_cache=shm_cache)
+    for _ in range(2):
+        # the second time from the cache; grayscale images are cached on their own
+        for flag in ['color', 'grayscale', 'unchanged']:
+            expected = imfrombytes(file_client.client.backend.get(img_paths[0]), flag, float32=True)
+            np.testing.assert_array_equal(
+                imfrombytes(file_client.get(img_paths[0], flag=flag), flag, float32=True), expected)
+    # one entry per flag, and the index
+    assert len([name for name in os.listdir(str(tmp_path)) if name.startswith('test_')]) == 4
+    file_client.client.clear()
+
+    file_client = FileClient(
+        'lmdb', db_paths=['tests/data/gt.lmdb'], client_keys=['gt'], zero_copy=True, shm_cache=shm_cache)
+    img = file_client.get('baboon', 'gt')
+    assert img.shape == (480, 492, 3)
+    np.testing.assert_array_equal(file_client.get_many(['baboon'], 'gt')[0], img)
+    file_client.client.clear()
+    file_client.client.backend.close()
+
+
+def test_shm_cache_sources(tmp_path, img_paths, monkeypatch):
+    """Test function: SharedMemoryCacheBackend with rotated and changed sources, and a full shared memory."""
+    shm_dir = str(tmp_path / 'shm')
+    os.makedirs(shm_dir)
+    cache = SharedMemoryCacheBackend(CountingBackend(), shm_dir=shm_dir)
+
+    # stored 40 wide and 30 tall, rotated by the EXIF orientation
+    rotated_path = str(tmp_path / 'rotated.jpg')
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.fromarray(np.random.randint(0, 255, (30, 40, 3), dtype=np.uint8)).save(rotated_path, exif=exif)
+    for _ in range(2):
+        img = imfrombytes(cache.get(rotated_path), 'color')
+        assert img.shape == (40, 30, 3)
+        np.testing.assert_array_equal(img, cv2.imread(rotated_path))
+
+    # a changed file is decoded again
+    np.testing.assert_array_equal(cache.get(img_paths[0]), cv2.imread(img_paths[0]))
+    cv2.imwrite(img_paths[0], np.zeros((24, 32, 3), dtype=np.uint8))
+    np.testing.assert_array_equal(cache.get(img_paths[0]), cv2.imread(img_paths[0]))
+    assert cache.backend.num_reads == 3
+
+    # the image is returned uncached if it cannot be written
+    def replace(src, dst):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(os, 'replace', replace)
+    np.testing.assert_array_equal(cache.get(img_paths[1]), cv2.imread(img_paths[1]))
+    assert not any(name.endswith('.tmp') for name in os.listdir(shm_dir))
+    monkeypatch.undo()
+    cache.get(img_paths[1])
+    assert cache.backend.num_reads == 5
+    cache.clear()
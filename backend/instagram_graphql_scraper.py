@@ -2,14 +2,19 @@ import json
 import httpx
 import asyncio
 import logging
+import random
+import re
 import sys
+import time
 from urllib.parse import quote
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterable, Tuple
 from pathlib import Path
 import os
 from datetime import datetime
 from dotenv import load_dotenv
 
+from rate_limit import AsyncRateLimiter
+
 # Load environment variables
 load_dotenv()
 
@@ -22,13 +27,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SHORTCODE_PATTERN = re.compile(r'instagram\.com/(?:[^/?#]+/)?(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)')
+
+def extract_shortcode(post_url: str) -> str:
+    """Get the shortcode from a post, reel or tv URL"""
+    match = SHORTCODE_PATTERN.search(post_url)
+    if not match:
+        raise Exception(f"Could not extract shortcode from URL: {post_url}")
+    return match.group(1)
+
+class PostCache:
+    """On-disk TTL cache of shortcode -> post metadata, shared by every scraper process"""
+
+    def __init__(self, folder: Path, ttl: float):
+        self.folder = folder
+        self.ttl = ttl
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def get(self, shortcode: str) -> Optional[Dict[str, Any]]:
+        path = self.folder / f"{shortcode}.json"
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, shortcode: str, media: Dict[str, Any]):
+        path = self.folder / f"{shortcode}.json"
+        tmp_path = self.folder / f"{shortcode}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(media, f, ensure_ascii=False)
+        # Atomic, so concurrent readers never see a partial file
+        os.replace(tmp_path, path)
+        # Occasionally drop expired entries so the folder doesn't grow forever
+        if random.random() < 0.05:
+            self.prune()
+
+    def prune(self):
+        now = time.time()
+        for path in self.folder.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime > self.ttl:
+                    path.unlink()
+            except OSError:
+                pass
+
 class InstagramGraphQLScraper:
     INSTAGRAM_ACCOUNT_DOCUMENT_ID = "9310670392322965"
+    INSTAGRAM_POST_DOCUMENT_ID = "8845758582119845"
     
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[AsyncRateLimiter] = None, debug_dump: Optional[bool] = None,
+                 post_cache: Optional[PostCache] = None):
         self.upload_folder = Path(__file__).parent.parent / 'uploads'
         self.upload_folder.mkdir(parents=True, exist_ok=True)
+        self.post_cache = post_cache or PostCache(
+            Path(__file__).parent.parent / 'cache' / 'posts', float(os.getenv('POST_CACHE_TTL', 3600)))
         self.instagram_cookies = os.getenv('INSTAGRAM_COOKIES', '')
+        # One limiter for every request of this scraper, so fanning out over many users keeps the global rate
+        self.rate_limiter = rate_limiter or AsyncRateLimiter(
+            float(os.getenv('GRAPHQL_REQUEST_INTERVAL', 1.0)), jitter=0.5)
+        # Raw responses are only written to disk when asked for
+        self.debug_dump = debug_dump if debug_dump is not None else os.getenv('INSTAGRAM_DEBUG_DUMP') == '1'
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': '*/*',
@@ -46,11 +107,14 @@ class InstagramGraphQLScraper:
         if self.instagram_cookies:
             self.headers['Cookie'] = self.instagram_cookies
 
-    async def _make_request(self, session: httpx.AsyncClient, variables: Dict[str, Any]) -> Dict[str, Any]:
+    async def _make_request(self, session: httpx.AsyncClient, variables: Dict[str, Any],
+                            doc_id: Optional[str] = None) -> Dict[str, Any]:
         """Make a GraphQL request to Instagram"""
         base_url = "https://www.instagram.com/graphql/query"
-        body = f"variables={quote(json.dumps(variables, separators=(',', ':')))}&doc_id={self.INSTAGRAM_ACCOUNT_DOCUMENT_ID}"
+        doc_id = doc_id or self.INSTAGRAM_ACCOUNT_DOCUMENT_ID
+        body = f"variables={quote(json.dumps(variables, separators=(',', ':')))}&doc_id={doc_id}"
         
+        await self.rate_limiter.wait('graphql')
         try:
             response = await session.post(
                 base_url,
@@ -64,8 +128,21 @@ class InstagramGraphQLScraper:
             logger.error(f"Error making request: {str(e)}")
             raise
 
-    async def scrape_user_posts(self, username: str, page_size: int = 12, max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Scrape all posts of an Instagram user given the username"""
+    def _dump_debug(self, username: str, data: Dict[str, Any]):
+        """Save a raw response for debugging"""
+        debug_file = self.upload_folder / f"debug_{username}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+        with open(debug_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    async def iter_user_posts(self, username: str, page_size: int = 12, max_pages: Optional[int] = None,
+                              session: Optional[httpx.AsyncClient] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the posts of an Instagram user as pages arrive, without keeping them in memory"""
+        if session is None:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as session:
+                async for post in self.iter_user_posts(username, page_size, max_pages, session):
+                    yield post
+            return
+
         variables = {
             "after": None,
             "before": None,
@@ -85,92 +162,142 @@ class InstagramGraphQLScraper:
 
         prev_cursor = None
         _page_number = 1
-        all_posts = []
 
-        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as session:
-            while True:
-                try:
-                    data = await self._make_request(session, variables)
-                    
-                    # Save raw response for debugging
-                    debug_file = self.upload_folder / f"debug_{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                    with open(debug_file, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=2, ensure_ascii=False)
+        while True:
+            try:
+                data = await self._make_request(session, variables)
+
+                if self.debug_dump:
+                    self._dump_debug(username, data)
 
-                    posts = data.get("data", {}).get("xdt_api__v1__feed__user_timeline_graphql_connection", {})
-                    if not posts:
-                        logger.error(f"No posts found in response: {data}")
-                        break
+                posts = data.get("data", {}).get("xdt_api__v1__feed__user_timeline_graphql_connection", {})
+                if not posts:
+                    logger.error(f"No posts found in response: {data}")
+                    break
+
+                for post in posts.get("edges", []):
+                    yield post["node"]
+
+                page_info = posts.get("page_info", {})
+                if not page_info.get("has_next_page"):
+                    logger.info(f"Reached last page ({_page_number})")
+                    break
+
+                if page_info.get("end_cursor") == prev_cursor:
+                    logger.info("No new posts found, breaking")
+                    break
 
-                    for post in posts.get("edges", []):
-                        all_posts.append(post["node"])
+                prev_cursor = page_info["end_cursor"]
+                variables["after"] = page_info["end_cursor"]
+                _page_number += 1
 
-                    page_info = posts.get("page_info", {})
-                    if not page_info.get("has_next_page"):
-                        logger.info(f"Reached last page ({_page_number})")
-                        break
+                if max_pages and _page_number > max_pages:
+                    logger.info(f"Reached maximum page limit ({max_pages})")
+                    break
 
-                    if page_info.get("end_cursor") == prev_cursor:
-                        logger.info("No new posts found, breaking")
-                        break
+            except Exception as e:
+                logger.error(f"Error scraping page {_page_number}: {str(e)}")
+                break
 
-                    prev_cursor = page_info["end_cursor"]
-                    variables["after"] = page_info["end_cursor"]
-                    _page_number += 1
+    async def scrape_user_posts(self, username: str, page_size: int = 12, max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Scrape all posts of an Instagram user given the username"""
+        return [post async for post in self.iter_user_posts(username, page_size, max_pages)]
 
-                    if max_pages and _page_number > max_pages:
-                        logger.info(f"Reached maximum page limit ({max_pages})")
-                        break
+    async def iter_many_users_posts(self, usernames: Iterable[str], page_size: int = 12, max_pages: Optional[int] = None,
+                                    concurrency: int = 4) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Scrape several users concurrently and yield (username, post) pairs as soon as they arrive"""
+        # Bounded, so producers wait for a slow consumer instead of buffering whole accounts
+        results = asyncio.Queue(maxsize=page_size * concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        finished = object()
 
-                    # Add delay between requests
-                    await asyncio.sleep(2)
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as session:
 
+            async def produce(username):
+                try:
+                    async with semaphore:
+                        async for post in self.iter_user_posts(username, page_size, max_pages, session):
+                            await results.put((username, post))
                 except Exception as e:
-                    logger.error(f"Error scraping page {_page_number}: {str(e)}")
-                    break
+                    logger.error(f"Error scraping user {username}: {str(e)}")
+                await results.put((username, finished))
 
-        return all_posts
+            tasks = [asyncio.create_task(produce(username)) for username in usernames]
+            try:
+                remaining = len(tasks)
+                while remaining:
+                    username, post = await results.get()
+                    if post is finished:
+                        remaining -= 1
+                        continue
+                    yield username, post
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def fetch_post_by_shortcode(self, session: httpx.AsyncClient, shortcode: str) -> Dict[str, Any]:
+        """Resolve a single post directly from its shortcode"""
+        variables = {
+            "shortcode": shortcode,
+            "fetch_tagged_user_count": None,
+            "hoisted_comment_id": None,
+            "hoisted_reply_id": None
+        }
+        data = await self._make_request(session, variables, self.INSTAGRAM_POST_DOCUMENT_ID)
+
+        if self.debug_dump:
+            self._dump_debug(shortcode, data)
+
+        media = (data.get("data") or {}).get("xdt_shortcode_media")
+        if not media:
+            raise Exception(f"Post {shortcode} not found")
+        return media
 
     async def scrape_post(self, post_url: str) -> Dict[str, Any]:
         """Scrape a single post using its URL"""
         try:
-            # Extract username and post ID from URL
             # Example URL: https://www.instagram.com/p/ABC123/
-            post_id = post_url.split('/p/')[1].split('/')[0]
-            
+            shortcode = extract_shortcode(post_url)
+
+            media = self.post_cache.get(shortcode)
+            if media is not None:
+                logger.info(f"Serving post {shortcode} from cache")
+                return media
+
             async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as session:
-                # First, get the post page to extract the username
-                response = await session.get(post_url, headers=self.headers)
-                response.raise_for_status()
-                
-                # Extract username from the page
-                # This is a simplified version - you might need to adjust based on actual page structure
-                username = None
-                if 'og:title' in response.text:
-                    username = response.text.split('og:title" content="')[1].split(' on Instagram')[0]
-                
-                if not username:
-                    raise Exception("Could not extract username from post URL")
-                
-                # Now scrape the user's posts to find the specific post
-                posts = await self.scrape_user_posts(username, max_pages=1)
-                
-                # Find the specific post
-                for post in posts:
-                    if post.get('shortcode') == post_id:
-                        return post
-                
-                raise Exception(f"Post {post_id} not found in user's posts")
+                media = await self.fetch_post_by_shortcode(session, shortcode)
+
+            self.post_cache.set(shortcode, media)
+            return media
                 
         except Exception as e:
             logger.error(f"Error scraping post: {str(e)}")
             raise
 
+async def stream_users(usernames: List[str], max_pages: Optional[int] = None):
+    """Print one JSON line per post as soon as it is scraped"""
+    scraper = InstagramGraphQLScraper()
+    concurrency = int(os.getenv('GRAPHQL_CONCURRENCY', 4))
+    async for username, post in scraper.iter_many_users_posts(usernames, max_pages=max_pages, concurrency=concurrency):
+        print(json.dumps({"username": username, "post": post}), flush=True)
+
 async def main():
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No URL provided"}))
         return
 
+    # Bulk mode: instagram_graphql_scraper.py --users name1 name2 ... [--max-pages N]
+    if sys.argv[1] == "--users":
+        args = sys.argv[2:]
+        max_pages = None
+        if "--max-pages" in args:
+            index = args.index("--max-pages")
+            max_pages = int(args[index + 1])
+            del args[index:index + 2]
+        await stream_users(args, max_pages)
+        return
+
     url = sys.argv[1]
     scraper = InstagramGraphQLScraper()
     
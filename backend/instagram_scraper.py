@@ -1,9 +1,13 @@
 import os
 import time
+import asyncio
+import queue
 import random
+import threading
 import json
 import uuid
 import logging
+from contextlib import contextmanager
 from pathlib import Path
 from urllib.parse import urlparse
 import re
@@ -15,10 +19,12 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from fake_useragent import UserAgent
-import requests
+import httpx
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+from rate_limit import AsyncRateLimiter, backoff_delay
+
 # Load environment variables
 load_dotenv()
 
@@ -29,46 +35,191 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+MEDIA_URL_PATTERN = re.compile(r'https?://[^\s<>"]+?\.(?:jpg|jpeg|png|mp4)')
+
+# Gathers og:* tags, scripts mentioning media files and rendered images in one execute_script call,
+# instead of one WebDriver round-trip per element attribute
+PAGE_MEDIA_SCRIPT = r"""
+const media = {meta: [], scripts: [], images: []};
+document.querySelectorAll('meta[property^="og:"]').forEach(
+    (tag) => media.meta.push([tag.getAttribute('property'), tag.getAttribute('content')]));
+document.querySelectorAll('script').forEach((script) => {
+    const text = script.textContent;
+    if (text && /\.(?:jpg|jpeg|png|mp4)/i.test(text)) {
+        media.scripts.push(text);
+    }
+});
+document.querySelectorAll('img[src*="instagram"]').forEach((img) => media.images.push(img.src));
+return media;
+"""
+
+class BrowserPool:
+    """Pool of warm, cookie-authenticated browser sessions shared across scrapes.
+
+    Browsers are created by `driver_factory` up to `size`, checked for health before being handed out,
+    and recycled after `max_uses` scrapes so long-lived sessions don't accumulate state or leak memory.
+    """
+
+    def __init__(self, driver_factory, size=2, max_uses=25):
+        self.driver_factory = driver_factory
+        self.size = size
+        self.max_uses = max_uses
+        # LIFO, so the most recently used (warmest) browser is handed out first
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create(self):
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver):
+        self._uses.pop(id(driver), None)
+        with self._lock:
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            driver.execute_script('return 1')
+            return bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def warm(self):
+        """Start browsers up to the pool size ahead of the first requests"""
+        drivers = []
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    break
+                self._created += 1
+            try:
+                drivers.append(self._create())
+            except Exception as e:
+                logger.error(f'Error warming up browser pool: {str(e)}')
+                break
+        for driver in drivers:
+            self._idle.put(driver)
+        return len(drivers)
+
+    def _checkout(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    return self._create()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise Exception('Timed out waiting for a browser from the pool')
+                # Poll, since a discarded browser frees a slot without putting anything back in the queue
+                try:
+                    driver = self._idle.get(timeout=1.0 if remaining is None else min(1.0, remaining))
+                except queue.Empty:
+                    continue
+            if self._is_healthy(driver):
+                return driver
+            logger.warning('Discarding unhealthy browser from the pool')
+            self._discard(driver)
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Borrow a browser, which goes back to the pool (or is recycled) afterwards"""
+        if self._closed:
+            raise Exception('Browser pool is closed')
+        driver = self._checkout(timeout)
+        try:
+            yield driver
+        finally:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            if self._closed or self._uses[id(driver)] >= self.max_uses or not self._is_healthy(driver):
+                self._discard(driver)
+            else:
+                self._idle.put(driver)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+
 class InstagramScraper:
-    def __init__(self):
+    def __init__(self, browser_pool=None):
         self.upload_folder = Path(__file__).parent.parent / 'uploads'
         self.upload_folder.mkdir(parents=True, exist_ok=True)
         self.proxy_url = os.getenv('PROXY_URL')
         self.instagram_cookies = os.getenv('INSTAGRAM_COOKIES', '')
         self.ua = UserAgent()
+        self.browser_pool = browser_pool
         self.driver = None
         self.wait_time = random.uniform(2, 4)
+        self.download_concurrency = int(os.getenv('DOWNLOAD_CONCURRENCY', 8))
+        self.download_retries = 3
+        # Minimum spacing between requests to the same CDN host, replaces the fixed sleep before each download
+        self.download_host_interval = float(os.getenv('DOWNLOAD_HOST_INTERVAL', 0.05))
+        # Built by _download_all, since asyncio locks are bound to the event loop of each scrape_media call
+        self.rate_limiter = None
+        self.download_semaphore = None
+
+    def create_driver(self):
+        """Launch an undetected-chromedriver Chrome with anti-detection measures and apply cookies"""
+        options = uc.ChromeOptions()
+        # Remove headless mode for better reliability
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-notifications')
+        options.add_argument('--disable-popup-blocking')
+        options.add_argument(f'user-agent={self.ua.random}')
+        
+        if self.proxy_url:
+            options.add_argument(f'--proxy-server={self.proxy_url}')
+        
+        driver = uc.Chrome(options=options)
+        driver.set_window_size(1920, 1080)
+        
+        if self.instagram_cookies:
+            self._add_cookies(driver)
+        
+        return driver
 
     def _setup_driver(self):
-        """Initialize undetected-chromedriver with anti-detection measures"""
+        """Initialize a dedicated browser for this scraper"""
         try:
-            options = uc.ChromeOptions()
-            # Remove headless mode for better reliability
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--disable-notifications')
-            options.add_argument('--disable-popup-blocking')
-            options.add_argument(f'user-agent={self.ua.random}')
-            
-            if self.proxy_url:
-                options.add_argument(f'--proxy-server={self.proxy_url}')
-            
-            self.driver = uc.Chrome(options=options)
-            self.driver.set_window_size(1920, 1080)
-            
-            if self.instagram_cookies:
-                self._add_cookies()
-            
+            self.driver = self.create_driver()
             return True
         except Exception as e:
             logger.error(f'Error setting up driver: {str(e)}')
             return False
 
-    def _add_cookies(self):
+    def _add_cookies(self, driver):
         """Add Instagram cookies to the browser session"""
         try:
-            self.driver.get('https://www.instagram.com')
+            driver.get('https://www.instagram.com')
             time.sleep(self.wait_time)
             
             # Parse cookies string into individual cookies
@@ -85,12 +236,12 @@ class InstagramScraper:
             # Add each cookie individually
             for cookie in cookies:
                 try:
-                    self.driver.add_cookie(cookie)
+                    driver.add_cookie(cookie)
                 except Exception as e:
                     logger.warning(f'Failed to add cookie {cookie["name"]}: {str(e)}')
             
             # Refresh page to apply cookies
-            self.driver.refresh()
+            driver.refresh()
             time.sleep(self.wait_time)
             
         except Exception as e:
@@ -115,64 +266,52 @@ class InstagramScraper:
         except Exception as e:
             logger.warning(f'Error during scrolling: {str(e)}')
 
+    def _collect_page_media(self, media_type):
+        """Collect candidate media URLs with a single WebDriver round-trip and parse them in Python"""
+        page = self.driver.execute_script(PAGE_MEDIA_SCRIPT) or {}
+        media_urls = []
+
+        # Tier 1: Open Graph tags
+        for prop, content in page.get('meta', []):
+            if prop in ('og:image', 'og:video'):
+                media_urls.append(content)
+
+        # Tier 2: URLs in embedded JSON / script tags, which escape slashes and ampersands
+        for script_content in page.get('scripts', []):
+            script_content = script_content.replace('\\/', '/').replace('\\u0026', '&')
+            media_urls.extend(MEDIA_URL_PATTERN.findall(script_content))
+
+        # Tier 3: for posts, carousel items already rendered as img tags
+        if media_type == 'post':
+            media_urls.extend(page.get('images', []))
+
+        # Filter and deduplicate URLs, keeping the page order
+        valid_urls = []
+        for url in media_urls:
+            if url and url.startswith('http') and any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.mp4']):
+                valid_urls.append(url)
+        return list(dict.fromkeys(valid_urls))
+
     def _extract_media_urls_from_page(self, url, media_type):
-        """Extract media URLs from the page using multiple methods"""
+        """Extract media URLs from the page, scrolling like a human only if the markup has none"""
         try:
             self.driver.get(url)
-            self._human_like_delay()
-            self._scroll_like_human()
-            
-            media_urls = []
-            
-            # Method 1: Extract from meta tags
-            try:
-                meta_tags = self.driver.find_elements(By.TAG_NAME, 'meta')
-                for tag in meta_tags:
-                    if tag.get_attribute('property') == 'og:image':
-                        media_urls.append(tag.get_attribute('content'))
-                    elif tag.get_attribute('property') == 'og:video':
-                        media_urls.append(tag.get_attribute('content'))
-            except Exception as e:
-                logger.warning(f'Error extracting from meta tags: {str(e)}')
 
-            # Method 2: Extract from script tags
-            try:
-                scripts = self.driver.find_elements(By.TAG_NAME, 'script')
-                for script in scripts:
-                    script_content = script.get_attribute('innerHTML')
-                    if script_content:
-                        # Look for image URLs in the script content
-                        image_urls = re.findall(r'https?://[^\s<>"]+?\.(?:jpg|jpeg|png|mp4)', script_content)
-                        media_urls.extend(image_urls)
-            except Exception as e:
-                logger.warning(f'Error extracting from script tags: {str(e)}')
+            media_urls = self._collect_page_media(media_type)
+            if media_urls:
+                return media_urls
 
-            # Method 3: Extract from img and video tags
-            try:
-                if media_type == 'post':
-                    # For posts, look for carousel items
-                    carousel_items = self.driver.find_elements(By.CSS_SELECTOR, 'img[src*="instagram"]')
-                    for item in carousel_items:
-                        src = item.get_attribute('src')
-                        if src and src not in media_urls:
-                            media_urls.append(src)
-            except Exception as e:
-                logger.warning(f'Error extracting from img/video tags: {str(e)}')
-
-            # Filter and deduplicate URLs
-            valid_urls = []
-            for url in media_urls:
-                if url and url.startswith('http') and any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.mp4']):
-                    valid_urls.append(url)
-            
-            return list(set(valid_urls))
+            # Nothing in the initial markup: behave like a human and let lazy content load
+            logger.info('No media found in page metadata, falling back to scrolling')
+            self._human_like_delay()
+            self._scroll_like_human()
+            return self._collect_page_media(media_type)
 
         except Exception as e:
             logger.error(f'Error extracting media URLs: {str(e)}')
             return []
 
-    def _download_media(self, url, output_path):
-        """Download media with retries and proper headers"""
+    def _download_headers(self):
         headers = {
             'User-Agent': self.ua.random,
             'Referer': 'https://www.instagram.com/',
@@ -182,53 +321,94 @@ class InstagramScraper:
         
         if self.instagram_cookies:
             headers['Cookie'] = self.instagram_cookies
+        return headers
 
-        proxies = {'http': self.proxy_url, 'https': self.proxy_url} if self.proxy_url else None
-
-        for attempt in range(3):
+    async def _download_media(self, client, url, output_path):
+        """Download media with rate limiting, retries and exponential backoff"""
+        host = urlparse(url).netloc
+        for attempt in range(self.download_retries):
             try:
-                time.sleep(random.uniform(1, 2))
-                response = requests.get(url, headers=headers, proxies=proxies, stream=True, timeout=10)
-                if response.status_code == 200:
-                    with open(output_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                    return True
+                async with self.download_semaphore:
+                    await self.rate_limiter.wait(host)
+                    async with client.stream('GET', url) as response:
+                        if response.status_code == 200:
+                            with open(output_path, 'wb') as f:
+                                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                                    f.write(chunk)
+                            return True
+                        # Client errors other than rate limiting won't succeed on retry
+                        if response.status_code != 429 and response.status_code < 500:
+                            logger.error(f'Download of {url} failed with status {response.status_code}')
+                            return False
+                        logger.warning(f'Download attempt {attempt + 1} got status {response.status_code}')
             except Exception as e:
                 logger.error(f'Download attempt {attempt + 1} failed: {str(e)}')
-                if attempt == 2:
+                if output_path.exists():
+                    output_path.unlink()
+                if attempt == self.download_retries - 1:
                     raise e
+            if attempt < self.download_retries - 1:
+                await asyncio.sleep(backoff_delay(attempt))
         return False
 
+    async def _download_all(self, media_urls, output_dir):
+        """Download all media concurrently over a shared connection pool, keeping the input order"""
+        self.rate_limiter = AsyncRateLimiter(self.download_host_interval, jitter=0.05)
+        self.download_semaphore = asyncio.Semaphore(self.download_concurrency)
+        limits = httpx.Limits(
+            max_connections=self.download_concurrency,
+            max_keepalive_connections=self.download_concurrency)
+        async with httpx.AsyncClient(
+                headers=self._download_headers(),
+                proxy=self.proxy_url,
+                limits=limits,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                follow_redirects=True) as client:
+            tasks = []
+            for i, media_url in enumerate(media_urls):
+                ext = 'mp4' if media_url.endswith('.mp4') else 'jpg'
+                output_path = output_dir / f'media_{i + 1}.{ext}'
+                tasks.append(self._download_media(client, media_url, output_path))
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        downloaded_files = []
+        for i, (media_url, result) in enumerate(zip(media_urls, results)):
+            ext = 'mp4' if media_url.endswith('.mp4') else 'jpg'
+            output_path = output_dir / f'media_{i + 1}.{ext}'
+            if isinstance(result, Exception):
+                logger.error(f'Failed to download {media_url}: {str(result)}')
+                continue
+            if result and output_path.stat().st_size > 0:
+                relative_path = f'/uploads/{output_dir.name}/media_{i + 1}.{ext}'
+                downloaded_files.append({
+                    'url': relative_path,
+                    'filename': f'media_{i + 1}.{ext}',
+                    'type': 'video' if ext == 'mp4' else 'image'
+                })
+        return downloaded_files
+
     def scrape_media(self, url, media_type):
         """Main method to scrape media from Instagram"""
         try:
-            if not self._setup_driver():
-                raise Exception('Failed to setup Chrome driver')
-
-            media_urls = self._extract_media_urls_from_page(url, media_type)
+            if self.browser_pool is not None:
+                # Only hold a pooled browser while reading the page, downloads don't need it
+                with self.browser_pool.acquire() as driver:
+                    self.driver = driver
+                    try:
+                        media_urls = self._extract_media_urls_from_page(url, media_type)
+                    finally:
+                        self.driver = None
+            else:
+                if not self._setup_driver():
+                    raise Exception('Failed to setup Chrome driver')
+                media_urls = self._extract_media_urls_from_page(url, media_type)
 
             if not media_urls:
                 raise Exception(f'No media found for {media_type}')
 
             output_dir = self.upload_folder / f'{media_type}_{uuid.uuid4()}'
             output_dir.mkdir(parents=True, exist_ok=True)
-            downloaded_files = []
-
-            for i, media_url in enumerate(media_urls):
-                ext = 'mp4' if media_url.endswith('.mp4') else 'jpg'
-                output_path = output_dir / f'media_{i + 1}.{ext}'
-                
-                if self._download_media(media_url, output_path):
-                    file_stats = output_path.stat()
-                    if file_stats.st_size > 0:
-                        relative_path = f'/uploads/{output_dir.name}/media_{i + 1}.{ext}'
-                        downloaded_files.append({
-                            'url': relative_path,
-                            'filename': f'media_{i + 1}.{ext}',
-                            'type': 'video' if ext == 'mp4' else 'image'
-                        })
+            downloaded_files = asyncio.run(self._download_all(media_urls, output_dir))
 
             if not downloaded_files:
                 output_dir.rmdir()
@@ -246,6 +426,7 @@ class InstagramScraper:
                     self.driver.quit()
                 except:
                     pass
+                self.driver = None
 
     def __del__(self):
         """Cleanup when the object is destroyed"""
@@ -0,0 +1,211 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+// Pool of long-lived Python worker processes (e.g. scripts/upscale_worker.py,
+// scraper_worker.py). Jobs are sent as one JSON object per line on the
+// worker's stdin and the worker answers with one JSON line per job on stdout,
+// so libraries, models and browsers stay loaded between requests. A worker can
+// run up to `concurrency` jobs at once; responses are matched by job id.
+// A worker that exits before becoming ready is restarted with exponential
+// backoff, up to `maxRestarts` times in a row; once no worker can start, the
+// pool gives up and rejects the queued and new jobs.
+class PythonWorkerPool {
+  constructor(options = {}) {
+    this.name = options.name || 'python';
+    this.pythonPath = options.pythonPath || 'python';
+    this.scriptPath = options.scriptPath;
+    this.size = Math.max(1, options.size || 1);
+    this.concurrency = Math.max(1, options.concurrency || 1);
+    this.jobTimeout = options.jobTimeout || 5 * 60 * 1000;
+    this.restartDelay = options.restartDelay || 1000;
+    this.maxRestartDelay = options.maxRestartDelay || 30 * 1000;
+    this.maxRestarts = options.maxRestarts === undefined ? 5 : options.maxRestarts;
+    this.env = options.env || {};
+    this.workers = [];
+    // Consecutive exits before becoming ready, per worker index
+    this.failedStarts = [];
+    this.queue = [];
+    this.nextJobId = 1;
+    this.closed = false;
+    this.failed = false;
+  }
+
+  start() {
+    for (let i = 0; i < this.size; i++) {
+      this.failedStarts.push(0);
+      this.workers.push(this._spawnWorker(i));
+    }
+    return this;
+  }
+
+  _spawnWorker(index) {
+    const label = `${this.name} worker ${index}`;
+    const proc = spawn(this.pythonPath, ['-u', this.scriptPath], {
+      cwd: path.dirname(this.scriptPath),
+      env: { ...process.env, ...this.env },
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+    const worker = { index, label, proc, ready: false, dead: false, jobs: new Map() };
+
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+      let message;
+      try {
+        message = JSON.parse(line);
+      } catch (error) {
+        console.error(`${label} sent invalid output:`, line);
+        return;
+      }
+      this._onMessage(worker, message);
+    });
+
+    proc.stderr.on('data', (data) => {
+      console.log(`[${label}]`, data.toString().trimEnd());
+    });
+
+    let exited = false;
+    const onExit = (code, signal) => {
+      if (exited) {
+        return;
+      }
+      exited = true;
+      const wasReady = worker.ready;
+      worker.ready = false;
+      for (const job of [...worker.jobs.values()]) {
+        this._finishJob(worker, job, new Error(`${label} exited (code ${code}, signal ${signal})`));
+      }
+      if (this.closed) {
+        return;
+      }
+      const attempt = wasReady ? 0 : this.failedStarts[index]++;
+      if (attempt >= this.maxRestarts) {
+        console.error(`${label} exited (code ${code}, signal ${signal}) ${attempt + 1} times before becoming ready, giving up`);
+        worker.dead = true;
+        if (this.workers.every((w) => w.dead)) {
+          this._giveUp();
+        }
+        return;
+      }
+      const delay = Math.min(this.restartDelay * 2 ** attempt, this.maxRestartDelay);
+      console.error(`${label} exited (code ${code}, signal ${signal}), restarting in ${delay} ms...`);
+      setTimeout(() => {
+        if (!this.closed) {
+          this.workers[index] = this._spawnWorker(index);
+        }
+      }, delay);
+    };
+
+    proc.on('error', (error) => {
+      console.error(`${label} failed to start:`, error);
+      // 'exit' is not always emitted when the process could not be spawned
+      if (proc.pid === undefined) {
+        onExit(null, null);
+      }
+    });
+
+    proc.on('exit', onExit);
+
+    return worker;
+  }
+
+  _onMessage(worker, message) {
+    if (message.type === 'ready') {
+      worker.ready = true;
+      this.failedStarts[worker.index] = 0;
+      console.log(`${worker.label} ready (pid ${message.pid})`);
+      this._dispatch();
+      return;
+    }
+    if (message.type === 'error') {
+      console.error(`${worker.label} error:`, message.error);
+      return;
+    }
+    const job = worker.jobs.get(message.id);
+    if (!job) {
+      console.error(`${worker.label} sent an unexpected response:`, message);
+      return;
+    }
+    if (message.ok) {
+      this._finishJob(worker, job, null, message);
+    } else {
+      this._finishJob(worker, job, new Error(message.error || 'Job failed'));
+    }
+  }
+
+  _finishJob(worker, job, error, result) {
+    worker.jobs.delete(job.id);
+    clearTimeout(job.timer);
+    if (error) {
+      job.reject(error);
+    } else {
+      job.resolve(result);
+    }
+    this._dispatch();
+  }
+
+  _dispatch() {
+    for (const worker of this.workers) {
+      while (this.queue.length > 0 && worker.ready && worker.jobs.size < this.concurrency) {
+        const job = this.queue.shift();
+        clearTimeout(job.timer);
+        worker.jobs.set(job.id, job);
+        job.timer = setTimeout(() => {
+          // A stuck worker is killed; the exit handler rejects its jobs and respawns it
+          console.error(`${this.name} job ${job.id} timed out, killing ${worker.label}`);
+          worker.proc.kill();
+        }, this.jobTimeout);
+        worker.proc.stdin.write(JSON.stringify({ id: job.id, ...job.payload }) + '\n');
+      }
+      if (this.queue.length === 0) {
+        return;
+      }
+    }
+  }
+
+  _giveUp() {
+    this.failed = true;
+    for (const job of this.queue.splice(0)) {
+      clearTimeout(job.timer);
+      job.reject(new Error(`${this.name} workers failed to start`));
+    }
+  }
+
+  run(payload) {
+    if (this.closed) {
+      return Promise.reject(new Error(`${this.name} worker pool is closed`));
+    }
+    if (this.failed) {
+      return Promise.reject(new Error(`${this.name} workers failed to start`));
+    }
+    return new Promise((resolve, reject) => {
+      const job = { id: this.nextJobId++, payload, resolve, reject, timer: null };
+      // Jobs waiting for a worker time out as well, e.g. while the workers keep failing to start
+      job.timer = setTimeout(() => {
+        const position = this.queue.indexOf(job);
+        if (position !== -1) {
+          this.queue.splice(position, 1);
+          reject(new Error(`${this.name} job ${job.id} timed out waiting for a worker`));
+        }
+      }, this.jobTimeout);
+      this.queue.push(job);
+      this._dispatch();
+    });
+  }
+
+  close() {
+    this.closed = true;
+    for (const job of this.queue.splice(0)) {
+      clearTimeout(job.timer);
+      job.reject(new Error(`${this.name} worker pool is closed`));
+    }
+    for (const worker of this.workers) {
+      try {
+        worker.proc.stdin.end(JSON.stringify({ type: 'shutdown' }) + '\n');
+      } catch (error) {
+        worker.proc.kill();
+      }
+    }
+  }
+}
+
+module.exports = { PythonWorkerPool };
@@ -0,0 +1,30 @@
+import asyncio
+import random
+import time
+
+
+class AsyncRateLimiter:
+    """Space out requests so that at most one starts every `min_interval` seconds per key (e.g. per host).
+
+    Unlike a fixed sleep before every request, callers only wait when they are actually ahead of the
+    allowed rate, and independent keys never wait for each other.
+    """
+
+    def __init__(self, min_interval: float, jitter: float = 0.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._next_allowed = {}
+        self._locks = {}
+
+    async def wait(self, key: str = 'default'):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            delay = self._next_allowed.get(key, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_allowed[key] = time.monotonic() + self.min_interval + random.uniform(0, self.jitter)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 10.0) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
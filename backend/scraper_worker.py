@@ -0,0 +1,67 @@
+"""Long-lived Selenium scraping worker.
+
+Keeps a BrowserPool of warm, cookie-authenticated Chrome sessions and serves
+scrape jobs from the Node server over stdin/stdout, one JSON object per line:
+
+    request:  {"id": 1, "url": "https://www.instagram.com/stories/...", "media_type": "story"}
+    response: {"id": 1, "ok": true, "media": [{"url": ..., "filename": ..., "type": ...}]}
+              {"id": 1, "ok": false, "error": "No media found for story"}
+
+Up to SCRAPER_BROWSERS jobs run concurrently, one per pooled browser, so
+responses may arrive out of order. Browsers are recycled after
+SCRAPER_BROWSER_MAX_USES scrapes.
+"""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from instagram_scraper import BrowserPool, InstagramScraper, logger
+
+POOL_SIZE = int(os.getenv('SCRAPER_BROWSERS', 2))
+MAX_USES = int(os.getenv('SCRAPER_BROWSER_MAX_USES', 25))
+
+
+def main():
+    # Keep the real stdout for the protocol and route every other print to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            protocol_out.write(json.dumps(message) + '\n')
+            protocol_out.flush()
+
+    pool = BrowserPool(InstagramScraper().create_driver, size=POOL_SIZE, max_uses=MAX_USES)
+    logger.info(f'Warmed up {pool.warm()} browser(s)')
+    send({'type': 'ready', 'pid': os.getpid()})
+
+    def handle_request(request):
+        try:
+            scraper = InstagramScraper(browser_pool=pool)
+            media = scraper.scrape_media(request['url'], request.get('media_type', 'post'))
+            send({'id': request.get('id'), 'ok': True, 'media': media})
+        except Exception as e:
+            send({'id': request.get('id'), 'ok': False, 'error': str(e)})
+
+    with ThreadPoolExecutor(max_workers=POOL_SIZE) as executor:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                send({'id': None, 'ok': False, 'error': f'Invalid request: {str(e)}'})
+                continue
+            if request.get('type') == 'shutdown':
+                break
+            executor.submit(handle_request, request)
+
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,83 +1,218 @@
 import sys
 import os
+import time
+import argparse
 import traceback
 import cv2
 import numpy as np
 
-def check_dependencies():
+ENGINES = ('lanczos', 'srvgg', 'rrdbnet')
+
+# Pretrained Real-ESRGAN weights for the BasicSR architectures, looked up in UPSCALE_MODEL_DIR
+MODEL_SPECS = {
+    'srvgg': {
+        'filename': 'realesr-general-x4v3.pth',
+        'scale': 4,
+    },
+    'rrdbnet': {
+        'filename': 'RealESRGAN_x4plus.pth',
+        'scale': 4,
+    },
+}
+DEFAULT_MODEL_DIR = os.environ.get(
+    'UPSCALE_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models'))
+
+# Loaded models keyed by (engine, model_path), so a long-lived worker only pays the load cost once
+_MODEL_CACHE = {}
+
+
+def check_dependencies(engine='lanczos'):
     try:
         import cv2
         print(f"OpenCV version: {cv2.__version__}")
         print(f"NumPy version: {np.__version__}")
+        if engine != 'lanczos':
+            import torch
+            import basicsr  # noqa: F401
+            print(f"PyTorch version: {torch.__version__}")
         return True
     except ImportError as e:
         print(f"Error importing dependencies: {str(e)}")
-        print("Please run: pip install opencv-python numpy")
+        print("Please run: pip install opencv-python numpy (and torch basicsr for the SR engines)")
         return False
 
-def upscale_image(input_path, output_path):
+
+def configure_threads(num_threads=None):
+    """Pin the intra-op thread pool used for CPU inference."""
+    import torch
+    num_threads = num_threads or int(os.environ.get('UPSCALE_THREADS', 0)) or os.cpu_count() or 1
+    if torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+    return num_threads
+
+
+def _build_network(engine):
+    if engine == 'srvgg':
+        from basicsr.archs.srvgg_arch import SRVGGNetCompact
+        return SRVGGNetCompact(num_in_ch=3, num_out_ch=3, num_feat=64, num_conv=32, upscale=4, act_type='prelu')
+    if engine == 'rrdbnet':
+        from basicsr.archs.rrdbnet_arch import RRDBNet
+        return RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=4)
+    raise ValueError(f"Unknown model engine: {engine}")
+
+
+def load_model(engine, model_path=None, num_threads=None):
+    """Build and load an SR network once, then serve it from the cache."""
+    import torch
+
+    if model_path is None:
+        model_path = os.path.join(DEFAULT_MODEL_DIR, MODEL_SPECS[engine]['filename'])
+    key = (engine, os.path.abspath(model_path))
+    if key in _MODEL_CACHE:
+        return _MODEL_CACHE[key]
+
+    if not os.path.isfile(model_path):
+        raise Exception(f"Model weights not found for engine '{engine}': {model_path}")
+
+    configure_threads(num_threads)
+    print(f"Loading {engine} model from: {model_path}")
+    model = _build_network(engine)
+    state_dict = torch.load(model_path, map_location='cpu')
+    if 'params_ema' in state_dict:
+        state_dict = state_dict['params_ema']
+    elif 'params' in state_dict:
+        state_dict = state_dict['params']
+    model.load_state_dict(state_dict, strict=True)
+    model.eval()
+    model = model.to(memory_format=torch.channels_last)
+    for param in model.parameters():
+        param.requires_grad_(False)
+
+    _MODEL_CACHE[key] = model
+    return model
+
+
+def _upscale_lanczos(img, scale):
+    height, width = img.shape[:2]
+    upscaled = cv2.resize(img, (width * scale, height * scale), interpolation=cv2.INTER_LANCZOS4)
+    kernel = np.array([[-1, -1, -1],
+                       [-1, 9, -1],
+                       [-1, -1, -1]])
+    return cv2.filter2D(upscaled, -1, kernel)
+
+
+def _upscale_model(img, model, timings):
+    import torch
+
+    with torch.inference_mode():
+        start = time.perf_counter()
+        tensor = torch.from_numpy(np.ascontiguousarray(img[:, :, ::-1].transpose(2, 0, 1))).float().div_(255.)
+        tensor = tensor.unsqueeze(0).contiguous(memory_format=torch.channels_last)
+        timings['preprocess'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        output = model(tensor)
+        timings['inference'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        output = output.squeeze(0).clamp_(0, 1).mul_(255.).round_().byte().permute(1, 2, 0).numpy()
+        output = np.ascontiguousarray(output[:, :, ::-1])
+        timings['postprocess'] = time.perf_counter() - start
+    return output
+
+
+def upscale_image(input_path, output_path, engine='lanczos', scale=2, model_path=None, quality=95,
+                  num_threads=None, timings=None):
+    """Upscale an image with the selected engine.
+
+    ``timings``, when given, is filled with the duration in seconds of each stage.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', choose from: {', '.join(ENGINES)}")
+    timings = {} if timings is None else timings
     try:
+        # Load the model first so its (one-off) cost is reported separately
+        if engine != 'lanczos':
+            start = time.perf_counter()
+            model = load_model(engine, model_path, num_threads)
+            timings['load_model'] = time.perf_counter() - start
+
         print(f"Reading image from: {input_path}")
-        # Read the image
-        img = cv2.imread(input_path)
+        start = time.perf_counter()
+        img = cv2.imread(input_path, cv2.IMREAD_COLOR)
+        timings['read'] = time.perf_counter() - start
         if img is None:
             raise Exception(f"Failed to read image: {input_path}")
 
-        # Get original dimensions
         height, width = img.shape[:2]
         print(f"Original image size: {width}x{height}")
-        
-        # Calculate new dimensions (2x upscale)
-        new_width = width * 2
-        new_height = height * 2
-        print(f"New image size: {new_width}x{new_height}")
-        
-        # Upscale using INTER_LANCZOS4 (highest quality)
-        print("Upscaling image...")
-        upscaled = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-        
-        # Apply sharpening
-        print("Applying sharpening...")
-        kernel = np.array([[-1,-1,-1],
-                         [-1, 9,-1],
-                         [-1,-1,-1]])
-        sharpened = cv2.filter2D(upscaled, -1, kernel)
-        
+        print(f"New image size: {width * scale}x{height * scale}")
+
+        print(f"Upscaling image with {engine}...")
+        if engine == 'lanczos':
+            start = time.perf_counter()
+            upscaled = _upscale_lanczos(img, scale)
+            timings['inference'] = time.perf_counter() - start
+        else:
+            upscaled = _upscale_model(img, model, timings)
+            if upscaled.shape[:2] != (height * scale, width * scale):
+                # The networks have a fixed native scale, resample to the requested one
+                start = time.perf_counter()
+                upscaled = cv2.resize(upscaled, (width * scale, height * scale), interpolation=cv2.INTER_AREA)
+                timings['resize'] = time.perf_counter() - start
+
         # Save with high quality
         print(f"Saving upscaled image to: {output_path}")
-        success = cv2.imwrite(output_path, sharpened, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        start = time.perf_counter()
+        success = cv2.imwrite(output_path, upscaled, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        timings['write'] = time.perf_counter() - start
         if not success:
             raise Exception(f"Failed to save image to: {output_path}")
-        
+
+        print("Stage timings: " + ', '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.items()))
         print("Image upscaling completed successfully")
         return output_path
     except Exception as e:
         print(f"Error during upscaling: {str(e)}")
-        print("Full traceback:")
-        traceback.print_exc()
-        sys.exit(1)
+        # Let the caller decide what to do: the CLI exits, the worker reports the error and keeps serving
+        raise
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Upscale an image')
+    parser.add_argument('input_path', help='input image')
+    parser.add_argument('output_path', help='output image')
+    parser.add_argument('--engine', choices=ENGINES, default=os.environ.get('UPSCALE_ENGINE', 'lanczos'))
+    parser.add_argument('--scale', type=int, default=2, help='output scale factor')
+    parser.add_argument('--model-path', default=None, help='weights for the srvgg/rrdbnet engines')
+    parser.add_argument('--quality', type=int, default=95, help='JPEG quality of the output')
+    parser.add_argument('--threads', type=int, default=None, help='intra-op threads for CPU inference')
+    return parser.parse_args(argv)
+
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("Usage: python upscale.py <input_path> <output_path>")
-        sys.exit(1)
-    
+    args = parse_args()
+
     # Check dependencies first
-    if not check_dependencies():
+    if not check_dependencies(args.engine):
         sys.exit(1)
-    
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
-    
+
     print(f"Starting upscaling process...")
-    print(f"Input path: {input_path}")
-    print(f"Output path: {output_path}")
-    
+    print(f"Input path: {args.input_path}")
+    print(f"Output path: {args.output_path}")
+
     try:
-        upscale_image(input_path, output_path)
-        print(f"Successfully upscaled image to {output_path}")
+        upscale_image(
+            args.input_path,
+            args.output_path,
+            engine=args.engine,
+            scale=args.scale,
+            model_path=args.model_path,
+            quality=args.quality,
+            num_threads=args.threads)
+        print(f"Successfully upscaled image to {args.output_path}")
     except Exception as e:
         print(f"Error upscaling image: {str(e)}")
         print("Full traceback:")
         traceback.print_exc()
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
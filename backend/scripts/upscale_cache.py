@@ -0,0 +1,133 @@
+"""Content-addressed cache of upscaled images.
+
+Results live next to the other uploads as ``upscaled_<key>.jpg`` where the
+key hashes the input bytes together with every parameter that changes the
+output (engine, scale, quality, and the model file's path, mtime and size).
+Uploading the same image twice with
+the same settings therefore maps to the same file, and the worker can return
+it without decoding or running the model again.
+
+The folder is bounded by total size and file count. Hits refresh the file's
+mtime, so eviction drops the least recently used results first.
+"""
+import hashlib
+import os
+
+CACHE_PREFIX = 'upscaled_'
+CACHE_SUFFIX = '.jpg'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(path):
+    """Identify a weights file by its full path, mtime and size.
+
+    Cheaper than hashing the weights on every request, and still changes when
+    the file is replaced or a different folder holds a file of the same name.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return f'{path}:{stat.st_mtime_ns}:{stat.st_size}'
+
+
+class UpscaleCache:
+    """LRU, size-bounded cache of upscale results in a single folder."""
+
+    def __init__(self, folder, max_bytes=1024 ** 3, max_files=2000):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, input_path, engine, scale, quality, model_path=None):
+        params = f'{engine}|{scale}|{quality}|{model_version(model_path) if model_path else ""}'
+        return hashlib.sha256(f'{hash_file(input_path)}|{params}'.encode()).hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.folder, f'{CACHE_PREFIX}{key}{CACHE_SUFFIX}')
+
+    def temp_path(self, key):
+        # Hidden and unique per process, so concurrent workers never clobber or evict each other's writes
+        return os.path.join(self.folder, f'.{CACHE_PREFIX}{key}.{os.getpid()}{CACHE_SUFFIX}')
+
+    def lookup(self, key):
+        """Return the cached result path, or None on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def commit(self, key, temp_path):
+        """Move a finished result into the cache and evict old entries."""
+        path = self.path(key)
+        os.replace(temp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Drop the least recently used entries until the cache fits, never ``keep``."""
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.path == keep:
+                continue
+            if entry.name.startswith(CACHE_PREFIX) and entry.name.endswith(CACHE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # The kept entry still counts towards the limits
+        kept_files, kept_bytes = 0, 0
+        if keep is not None:
+            try:
+                kept_bytes = os.stat(keep).st_size
+                kept_files = 1
+            except OSError:
+                pass
+
+        total_bytes = kept_bytes + sum(size for _, size, _ in entries)
+        num_files = kept_files + len(entries)
+        if total_bytes <= self.max_bytes and num_files <= self.max_files:
+            return 0
+
+        # Oldest first
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes and num_files - removed <= self.max_files:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+        return removed
+
+
+def cache_from_env(default_folder):
+    """Build the cache from UPSCALE_CACHE_DIR / UPSCALE_CACHE_MAX_MB / UPSCALE_CACHE_MAX_FILES.
+
+    The server only serves files under ``default_folder`` (its uploads folder),
+    so UPSCALE_CACHE_DIR must be that folder or one inside it; a relative value
+    is taken relative to ``default_folder``.
+    """
+    root = os.path.realpath(default_folder)
+    folder = os.path.realpath(os.path.join(root, os.environ.get('UPSCALE_CACHE_DIR', root)))
+    if os.path.commonpath([root, folder]) != root:
+        raise ValueError(f'UPSCALE_CACHE_DIR must be inside {root}, got {folder}')
+    return UpscaleCache(
+        folder,
+        max_bytes=int(float(os.environ.get('UPSCALE_CACHE_MAX_MB', 1024)) * 1024 * 1024),
+        max_files=int(os.environ.get('UPSCALE_CACHE_MAX_FILES', 2000)))
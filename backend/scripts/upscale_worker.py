@@ -0,0 +1,132 @@
+"""Long-lived upscaling worker.
+
+The Node server keeps a small pool of these processes alive instead of
+spawning ``upscale.py`` for every request. Each worker imports cv2/numpy and
+checks dependencies once, then serves jobs over stdin/stdout:
+
+    request  (one JSON object per line on stdin):
+        {"id": 1, "input": "/path/in.png", "output": "/path/out.jpg",
+         "engine": "srvgg", "scale": 2, "quality": 95}
+    response (one JSON object per line on stdout):
+        {"id": 1, "ok": true, "output": "/path/out.jpg", "elapsed": 0.21,
+         "timings": {"read": 0.004, "inference": 0.19, ...}}
+        {"id": 1, "ok": false, "error": "Failed to read image: ..."}
+
+Only ``input`` and either ``output`` or ``output_dir`` are required. With
+``output_dir`` the result goes through the content-addressed cache in that
+folder (see ``upscale_cache.py``): the response's ``output`` is the cached
+file and ``cached`` tells whether the upscale was skipped. The default engine
+(``UPSCALE_ENGINE``) is loaded before the worker reports
+``{"type": "ready"}``, so the first request does not pay for it.
+Everything else the upscaler prints goes to stderr so it never corrupts the
+framing on stdout.
+"""
+import json
+import os
+import sys
+import time
+import traceback
+
+from upscale import check_dependencies, load_model, upscale_image
+from upscale_cache import cache_from_env
+
+DEFAULT_ENGINE = os.environ.get('UPSCALE_ENGINE', 'lanczos')
+
+# Result caches keyed by output folder
+_CACHES = {}
+
+
+def _get_cache(output_dir):
+    if output_dir not in _CACHES:
+        _CACHES[output_dir] = cache_from_env(output_dir)
+    return _CACHES[output_dir]
+
+
+def handle_request(request):
+    """Run a single upscaling job and build its response."""
+    start = time.perf_counter()
+    timings = {}
+    try:
+        engine = request.get('engine') or DEFAULT_ENGINE
+        scale = int(request.get('scale', 2))
+        quality = int(request.get('quality', 95))
+        model_path = request.get('model_path')
+        cached = False
+
+        if request.get('output_dir'):
+            cache = _get_cache(request['output_dir'])
+            key_start = time.perf_counter()
+            key = cache.key(request['input'], engine, scale, quality, model_path)
+            timings['hash'] = time.perf_counter() - key_start
+            output_path = cache.lookup(key)
+            cached = output_path is not None
+            if not cached:
+                temp_path = cache.temp_path(key)
+                try:
+                    upscale_image(request['input'], temp_path, engine=engine, scale=scale, model_path=model_path,
+                                  quality=quality, timings=timings)
+                    output_path = cache.commit(key, temp_path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+        else:
+            output_path = upscale_image(
+                request['input'],
+                request['output'],
+                engine=engine,
+                scale=scale,
+                model_path=model_path,
+                quality=quality,
+                timings=timings)
+        return {
+            'id': request.get('id'),
+            'ok': True,
+            'output': output_path,
+            'cached': cached,
+            'elapsed': round(time.perf_counter() - start, 4),
+            'timings': {name: round(seconds, 4) for name, seconds in timings.items()}
+        }
+    except Exception as e:
+        traceback.print_exc()
+        return {'id': request.get('id'), 'ok': False, 'error': str(e)}
+
+
+def main():
+    # Keep the real stdout for the protocol and route every other print to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    def send(message):
+        protocol_out.write(json.dumps(message) + '\n')
+        protocol_out.flush()
+
+    if not check_dependencies():
+        send({'type': 'error', 'error': 'Missing upscaling dependencies'})
+        sys.exit(1)
+
+    if DEFAULT_ENGINE != 'lanczos':
+        try:
+            load_model(DEFAULT_ENGINE)
+        except Exception as e:
+            # Keep serving: lanczos jobs still work and the error is reported per request
+            traceback.print_exc()
+            send({'type': 'error', 'error': f'Failed to preload {DEFAULT_ENGINE} model: {str(e)}'})
+
+    send({'type': 'ready', 'pid': os.getpid()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            send({'id': None, 'ok': False, 'error': f'Invalid request: {str(e)}'})
+            continue
+        if request.get('type') == 'shutdown':
+            break
+        send(handle_request(request))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,8 @@ const path = require('path');
 const fs = require('fs');
 const { PythonShell } = require('python-shell');
 const YTDlpWrap = require('yt-dlp-wrap').default; 
+const os = require('os');
+const { PythonWorkerPool } = require('./pythonWorkerPool');
 
 
 const app = express();
@@ -69,6 +71,39 @@ function findPythonPath() {
 
 const ytDlp = new YTDlpWrap();
 
+// Warm Python workers for /api/upscale, started once instead of per request
+const upscaleWorkers = parseInt(process.env.UPSCALE_WORKERS, 10) || Math.min(2, os.cpus().length);
+const upscalePool = new PythonWorkerPool({
+  name: 'upscale',
+  pythonPath: findPythonPath(),
+  scriptPath: path.join(__dirname, 'scripts', 'upscale_worker.py'),
+  size: upscaleWorkers,
+  jobTimeout: parseInt(process.env.UPSCALE_TIMEOUT_MS, 10) || undefined,
+  // Split the cores between workers so their torch thread pools don't oversubscribe the CPU
+  env: {
+    UPSCALE_THREADS: process.env.UPSCALE_THREADS || String(Math.max(1, Math.floor(os.cpus().length / upscaleWorkers)))
+  }
+}).start();
+
+// Selenium scraper with a pool of warm browsers, shared by all story requests
+const scraperBrowsers = parseInt(process.env.SCRAPER_BROWSERS, 10) || 2;
+const scraperPool = new PythonWorkerPool({
+  name: 'scraper',
+  pythonPath: findPythonPath(),
+  scriptPath: path.join(__dirname, 'scraper_worker.py'),
+  concurrency: scraperBrowsers,
+  env: { SCRAPER_BROWSERS: String(scraperBrowsers) }
+}).start();
+
+const UPSCALE_ENGINES = ['lanczos', 'srvgg', 'rrdbnet'];
+
+// Helper function to upscale an image through the worker pool.
+// Pass options.output_dir instead of outputPath to go through the worker's result cache.
+async function upscaleImage(inputPath, outputPath, options = {}) {
+  const result = await upscalePool.run({ input: inputPath, output: outputPath, ...options });
+  return result;
+}
+
 // Helper function to determine media type
 function getMediaType(url) {
   if (url.includes('/reel/')) return 'reel';
@@ -278,32 +313,16 @@ app.post('/api/fetch-story', async (req, res) => {
 
     console.log('Fetching story from URL:', url);
     
-    const options = {
-      mode: 'text',
-      pythonPath: findPythonPath(),
-      scriptPath: __dirname,
-      args: [url, 'story']
-    };
-
-    PythonShell.run('instagram_scraper.py', options).then(results => {
-      if (results && results.length > 0) {
-        try {
-          const mediaFiles = JSON.parse(results[0]);
-          if (mediaFiles && mediaFiles.length > 0) {
-            res.json({
-              mediaUrl: mediaFiles[0].url,
-              filename: mediaFiles[0].filename,
-              type: mediaFiles[0].type
-            });
-          } else {
-            res.status(500).json({ error: 'No story media found' });
-          }
-        } catch (error) {
-          console.error('Error parsing Python results:', error);
-          res.status(500).json({ error: 'Failed to parse media results' });
-        }
+    scraperPool.run({ url, media_type: 'story' }).then(result => {
+      const mediaFiles = result.media;
+      if (mediaFiles && mediaFiles.length > 0) {
+        res.json({
+          mediaUrl: mediaFiles[0].url,
+          filename: mediaFiles[0].filename,
+          type: mediaFiles[0].type
+        });
       } else {
-        res.status(500).json({ error: 'No results from Python scraper' });
+        res.status(500).json({ error: 'No story media found' });
       }
     }).catch(error => {
       console.error('Error running Python scraper:', error);
@@ -321,31 +340,40 @@ app.post('/api/upscale', upload.single('image'), async (req, res) => {
     return res.status(400).json({ error: 'No image file provided' });
   }
 
+  const { engine } = req.body;
+  if (engine && !UPSCALE_ENGINES.includes(engine)) {
+    fs.unlink(req.file.path, () => {});
+    return res.status(400).json({ error: `Unknown engine, choose from: ${UPSCALE_ENGINES.join(', ')}` });
+  }
+  const scale = req.body.scale ? parseInt(req.body.scale, 10) : undefined;
+  if (scale !== undefined && !(scale >= 1 && scale <= 4)) {
+    fs.unlink(req.file.path, () => {});
+    return res.status(400).json({ error: 'Scale must be an integer between 1 and 4' });
+  }
+
   const inputPath = req.file.path;
-  const outputPath = path.join(uploadsDir, `upscaled_${Date.now()}.jpg`);
 
   try {
     console.log('Starting upscaling process...');
     console.log('Input path:', inputPath);
-    console.log('Output path:', outputPath);
 
-    const result = await upscaleImage(inputPath, outputPath);
+    // The worker names the result after a hash of the image and settings, so repeated uploads reuse it
+    const result = await upscaleImage(inputPath, null, { output_dir: uploadsDir, engine, scale });
     console.log('Upscaling completed:', result);
 
     // Return the URL to the upscaled image
-    const imageUrl = `/uploads/${path.basename(outputPath)}`;
-    res.json({ upscaledImageUrl: imageUrl });
+    // The cache folder may be a subfolder of uploads (UPSCALE_CACHE_DIR)
+    const relativeOutput = path.relative(fs.realpathSync(uploadsDir), fs.realpathSync(result.output));
+    const imageUrl = `/uploads/${relativeOutput.split(path.sep).map(encodeURIComponent).join('/')}`;
+    res.json({ upscaledImageUrl: imageUrl, cached: result.cached, timings: result.timings });
 
     // Clean up the input file after sending response
     fs.unlink(inputPath, () => {});
   } catch (error) {
     console.error('Error in upscale endpoint:', error);
     res.status(500).json({ error: 'Error processing image' });
-    // Clean up the temporary files
+    // Clean up the temporary file
     fs.unlink(inputPath, () => {});
-    if (fs.existsSync(outputPath)) {
-      fs.unlink(outputPath, () => {});
-    }
   }
 });
 
@@ -362,4 +390,13 @@ if (process.env.NODE_ENV === 'production') {
 app.listen(port, () => {
   console.log(`Server running on port ${port}`);
   console.log('Uploads directory:', uploadsDir);
+});
+
+// Stop the upscale workers together with the server
+['SIGINT', 'SIGTERM'].forEach((signal) => {
+  process.on(signal, () => {
+    upscalePool.close();
+    scraperPool.close();
+    process.exit(0);
+  });
 }); 
\ No newline at end of file
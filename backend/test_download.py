@@ -0,0 +1,27 @@
+import functools
+
+import httpx
+
+import instagram_scraper
+from instagram_scraper import InstagramScraper
+
+
+def test_scrape_media_twice(tmp_path, monkeypatch):
+    """Downloads of a second scrape_media call on the same scraper run on a new event loop"""
+    media_urls = [f'https://cdn.example.com/media_{i}.jpg' for i in range(4)]
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=b'data'))
+    monkeypatch.setattr(instagram_scraper.httpx, 'AsyncClient',
+                        functools.partial(httpx.AsyncClient, transport=transport))
+
+    scraper = InstagramScraper()
+    scraper.upload_folder = tmp_path
+    # All downloads go to the same host, so they contend for the rate limiter lock
+    scraper.download_host_interval = 0.01
+    # Retries would hide a failed first attempt
+    scraper.download_retries = 1
+    monkeypatch.setattr(scraper, '_setup_driver', lambda: True)
+    monkeypatch.setattr(scraper, '_extract_media_urls_from_page', lambda url, media_type: media_urls)
+
+    for _ in range(2):
+        downloaded_files = scraper.scrape_media('https://www.instagram.com/p/abc/', 'post')
+        assert [f['filename'] for f in downloaded_files] == [f'media_{i + 1}.jpg' for i in range(4)]